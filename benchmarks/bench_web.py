@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Web 接口性能基准
+
+用 Flask test client 逐个请求 web/app.py 的全部路由，统计每个路由的 p50/p95/p99 耗时、Python 堆峰值
+和 RSS 增长（每个路由在单独的子进程里测），结果可保存为基线（benchmarks/baselines/<名称>.json），在不同提交之间对比。
+
+用法:
+    python benchmarks/bench_web.py --db /tmp/big.db --save big
+    python benchmarks/bench_web.py --db /tmp/big.db --compare big
+
+POST 接口会真实写库（原值写回、新建后删除），--db 必须指定，请使用 benchmarks/generate_catalog.py
+生成的测试库而不是 data/transformers.db。
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(BASE_DIR, 'benchmarks', 'baselines')
+sys.path.insert(0, BASE_DIR)
+from config import DATABASE_PATH
+from database.db import get_connection
+from database.migrations import migrate
+from web import app as web_app
+
+# 对比基线时 p95 超过基线多少倍算回退
+REGRESSION_RATIO = 1.2
+
+# 已知不可用的路由（不计入未覆盖提醒）：路由 -> 原因
+SKIPPED_ROUTES = {
+    '/test': '模板 test_complete.html 不存在',
+    '/debug': '模板 index_debug.html 不存在',
+}
+
+
+def percentile(sorted_values, pct):
+    """最近秩百分位"""
+    if not sorted_values:
+        return None
+    index = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def sample_ids(conn):
+    """取测试用的商品 id / 总表 id（尽量取有价格记录的）"""
+    ids = {}
+    for platform in ('jd', 'tmall'):
+        row = conn.execute(f'SELECT MAX(product_id) FROM {platform}_price_history').fetchone()
+        ids[platform] = row[0] or conn.execute(f'SELECT MAX(id) FROM {platform}_products').fetchone()[0] or 1
+        ids[f'{platform}_batch'] = [r[0] for r in conn.execute(f'SELECT id FROM {platform}_products ORDER BY id DESC LIMIT 50')]
+    row = conn.execute('SELECT id, product_name, product_type, jd_product_id, tmall_product_id FROM products_summary ORDER BY id LIMIT 1').fetchone()
+    ids['summary'] = dict(row) if row else None
+    row = conn.execute('SELECT id, is_purchased, is_followed FROM jd_products ORDER BY id LIMIT 1').fetchone()
+    ids['jd_product'] = dict(row) if row else None
+    return ids
+
+
+def build_cases(ids):
+    """每个路由的请求：(路由规则, 名称, 方法, URL, JSON 请求体)；请求体 'created' 表示先新建一条总表记录再删除"""
+    jd_batch = ','.join(str(i) for i in ids['jd_batch'])
+    cases = [
+        ('/', 'index', 'GET', '/', None),
+        ('/maintain', 'maintain', 'GET', '/maintain', None),
+        ('/metrics', 'metrics', 'GET', '/metrics', None),
+        ('/api/jd-prices', 'jd-prices', 'GET', '/api/jd-prices', None),
+        ('/api/jd-prices', 'jd-prices?purchased', 'GET', '/api/jd-prices?purchased=未购买', None),
+        ('/api/jd-prices', 'jd-prices?limit', 'GET', '/api/jd-prices?limit=50&sort=price_drop', None),
+        ('/api/tmall-prices', 'tmall-prices', 'GET', '/api/tmall-prices', None),
+        ('/api/tmall-prices', 'tmall-prices?limit', 'GET', '/api/tmall-prices?limit=50&sort=latest_price', None),
+        ('/api/price-history/<product_id>', 'price-history', 'GET', f"/api/price-history/{ids['jd']}?source=jd", None),
+        ('/api/price-history/<product_id>', 'price-history?points', 'GET', f"/api/price-history/{ids['jd']}?source=jd&points=100", None),
+        ('/api/price-history-batch', 'price-history-batch', 'GET', f'/api/price-history-batch?source=jd&ids={jd_batch}&points=100', None),
+        ('/api/price-windows', 'price-windows', 'GET', f'/api/price-windows?source=jd&ids={jd_batch}', None),
+        ('/api/jd-stats', 'jd-stats', 'GET', '/api/jd-stats', None),
+        ('/api/tmall-stats', 'tmall-stats', 'GET', '/api/tmall-stats', None),
+        ('/api/dashboard', 'dashboard', 'GET', '/api/dashboard', None),
+        ('/api/summary-list', 'summary-list', 'GET', '/api/summary-list', None),
+        ('/api/summary-jd-options', 'summary-jd-options', 'GET', '/api/summary-jd-options', None),
+        ('/api/summary-tmall-options', 'summary-tmall-options', 'GET', '/api/summary-tmall-options', None),
+    ]
+
+    # 写接口：原值写回 / 新建后删除，保证多次运行后数据不变
+    product = ids['jd_product']
+    if product:
+        cases.append(('/api/update-product', 'update-product', 'POST', '/api/update-product', {
+            'id': product['id'], 'source': 'jd',
+            'is_purchased': product['is_purchased'], 'is_followed': product['is_followed'],
+        }))
+    summary = ids['summary']
+    if summary:
+        cases.append(('/api/summary-update', 'summary-update', 'POST', '/api/summary-update', summary))
+    cases.append(('/api/summary-create', 'summary-create', 'POST', '/api/summary-create',
+                  {'product_name': '基准测试', 'product_type': '加强级'}))
+    cases.append(('/api/summary-delete', 'summary-delete', 'POST', '/api/summary-delete', 'created'))
+    return cases
+
+
+def run_case(client, method, url, body):
+    if method == 'GET':
+        return client.get(url)
+    return client.post(url, json=body)
+
+
+def setup_app(db_path):
+    """迁移测试库（Web 端只检查数据库版本），返回 (test client, 用例)"""
+    conn = get_connection(db_path)
+    migrate(conn)
+    conn.close()
+    web_app.DB_PATH = db_path
+    web_app.app.logger.disabled = True  # 接口出错只在结果里标出，不打印堆栈
+    client = web_app.app.test_client()
+    with web_app.get_pool().connection() as conn:
+        ids = sample_ids(conn)
+    return client, build_cases(ids)
+
+
+def request_once(client, name, method, url, body, warm, created_ids):
+    """请求一次，返回 (响应, 耗时秒)；新建的总表记录 id 记进 created_ids，最后统一删除"""
+    payload = body
+    if body == 'created':
+        # 删除前先建一条（不计时）
+        resp = client.post('/api/summary-create', json={'product_name': '基准测试'})
+        payload = {'id': resp.get_json()['id']}
+    if not warm:
+        web_app.response_cache.clear()
+    start = time.perf_counter()
+    resp = run_case(client, method, url, payload)
+    elapsed = time.perf_counter() - start
+    if name == 'summary-create' and resp.status_code == 200:
+        created_ids.append(resp.get_json()['id'])
+    return resp, elapsed
+
+
+def cleanup(client, created_ids):
+    """删除基准测试新建的总表记录"""
+    for record_id in created_ids:
+        client.post('/api/summary-delete', json={'id': record_id})
+
+
+def max_rss_kb():
+    """本进程的 RSS 峰值（KB）
+
+    Linux 读 /proc/self/status 的 VmHWM：ru_maxrss 会跨 fork/exec 继承父进程的峰值，而且无法重置；
+    其他系统用 ru_maxrss（macOS 的单位是字节）。
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def reset_max_rss():
+    """把 VmHWM 重置为当前 RSS（Linux），之后的峰值只反映这一次请求"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def rss_case(db_path, name, warm):
+    """--rss-case 子进程：准备好应用后只请求一次该路由，输出 [RSS 峰值, 这次请求让峰值增加了多少]（KB）"""
+    client, cases = setup_app(db_path)
+    _, _, method, url, body = next(case for case in cases if case[1] == name)
+    created_ids = []
+    reset_max_rss()
+    before = max_rss_kb()
+    request_once(client, name, method, url, body, warm, created_ids)
+    after = max_rss_kb()
+    cleanup(client, created_ids)
+    print(json.dumps([after, after - before]))
+
+
+def measure_rss(db_path, name, warm):
+    """每个路由在新进程里单独测 RSS 峰值，返回 (峰值 KB, 请求带来的增长 KB)
+
+    RSS 峰值是进程级的，同一进程里先跑的大路由会盖住后面的路由，所以每个路由一个进程；
+    子进程里这是该路由的第一次请求（含模板编译、建连接）。
+    """
+    cmd = [sys.executable, os.path.abspath(__file__), '--db', db_path, '--rss-case', name]
+    if warm:
+        cmd.append('--warm')
+    output = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    peak, growth = json.loads(output.strip().splitlines()[-1])
+    return peak, growth
+
+
+def bench(db_path, repeat, warm, only=None):
+    """逐个路由跑 repeat 次，返回 {名称: 统计}"""
+    client, cases = setup_app(db_path)
+
+    # 没有覆盖到的路由（新加路由时提醒补充用例）
+    covered = {rule for rule, *_ in cases}
+    missing = sorted(r.rule for r in web_app.app.url_map.iter_rules()
+                     if r.endpoint != 'static' and r.rule not in covered and r.rule not in SKIPPED_ROUTES)
+    if missing:
+        print(f"⚠️  未覆盖的路由: {', '.join(missing)}")
+    for rule, reason in SKIPPED_ROUTES.items():
+        print(f"⏭️  跳过 {rule}: {reason}")
+
+    created_ids = []
+    results = {}
+    for rule, name, method, url, body in cases:
+        if only and only not in name:
+            continue
+
+        # 预热一次（模板编译、连接池）
+        resp, _ = request_once(client, name, method, url, body, warm, created_ids)
+        if resp.status_code >= 400:
+            print(f'❌ {name}: HTTP {resp.status_code}')
+            continue
+
+        timings = sorted(request_once(client, name, method, url, body, warm, created_ids)[1]
+                         for _ in range(repeat))
+
+        # Python 堆峰值单独跑一次：tracemalloc 会拖慢请求，不和耗时一起统计
+        tracemalloc.start()
+        request_once(client, name, method, url, body, warm, created_ids)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss_peak, rss_growth = measure_rss(db_path, name, warm)
+
+        results[name] = {
+            'route': rule,
+            'method': method,
+            'n': repeat,
+            'p50_ms': round(percentile(timings, 50) * 1000, 3),
+            'p95_ms': round(percentile(timings, 95) * 1000, 3),
+            'p99_ms': round(percentile(timings, 99) * 1000, 3),
+            'py_peak_kb': round(peak / 1024, 1),
+            'rss_peak_kb': rss_peak,
+            'rss_growth_kb': rss_growth,
+            'bytes': len(resp.get_data()),
+        }
+        print(f"  {name:<24} p50 {results[name]['p50_ms']:>9.2f} ms  p95 {results[name]['p95_ms']:>9.2f} ms  "
+              f"p99 {results[name]['p99_ms']:>9.2f} ms  py峰值 {results[name]['py_peak_kb']:>9.1f} KB  "
+              f"RSS峰值 {rss_peak:>7} KB (+{rss_growth})")
+
+    cleanup(client, created_ids)
+    return results
+
+
+def describe_db(db_path):
+    """数据库规模（写进基线，便于判断基线是否可比）"""
+    conn = get_connection(db_path)
+    info = {'path': os.path.abspath(db_path)}
+    for table in ('jd_products', 'tmall_products', 'jd_price_history', 'tmall_price_history', 'products_summary'):
+        info[table] = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    conn.close()
+    return info
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """和基线对比，返回回退的路由（p95 或 Python 堆峰值超过基线 REGRESSION_RATIO 倍）
+
+    RSS 增长只显示不判定：按内存页计，受分配器和环境影响大。
+    """
+    regressions = []
+    print(f"\n📏 对比基线 {baseline.get('commit')} ({baseline.get('created_at')})")
+    for name, stats in results.items():
+        old = baseline['routes'].get(name)
+        if not old:
+            print(f'  {name:<24} (基线中没有)')
+            continue
+        ratio = stats['p95_ms'] / old['p95_ms'] if old['p95_ms'] else float('inf')
+        mem_ratio = stats['py_peak_kb'] / old['py_peak_kb'] if old.get('py_peak_kb') else 1.0
+        worst = max(ratio, mem_ratio)
+        mark = '⚠️  回退' if worst > REGRESSION_RATIO else ('🚀 提升' if worst < 1 / REGRESSION_RATIO else '')
+        old_rss = old.get('rss_growth_kb', '-') if 'rss_peak_kb' in old else '-'  # 旧基线的 rss_growth_kb 不是单路由的值
+        print(f"  {name:<24} p95 {old['p95_ms']:>9.2f} -> {stats['p95_ms']:>9.2f} ms  x{ratio:.2f}  "
+              f"py峰值 {old.get('py_peak_kb', 0):>9.1f} -> {stats['py_peak_kb']:>9.1f} KB  x{mem_ratio:.2f}  "
+              f"RSS增长 {old_rss:>6} -> {stats['rss_growth_kb']:>6} KB {mark}")
+        if worst > REGRESSION_RATIO:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Web 接口性能基准')
+    parser.add_argument('--db', required=True, help='测试数据库（会被写入，用 generate_catalog.py 生成）')
+    parser.add_argument('-n', '--repeat', type=int, default=20, help='每个路由请求次数')
+    parser.add_argument('--warm', action='store_true', help='保留响应缓存（默认每次请求前清空，测的是查库路径）')
+    parser.add_argument('--only', help='只跑名称包含该字符串的用例')
+    parser.add_argument('--save', metavar='NAME', help='保存为基线 benchmarks/baselines/NAME.json')
+    parser.add_argument('--compare', metavar='NAME', help='与基线对比，p95 或内存回退时退出码为 1')
+    parser.add_argument('--rss-case', help=argparse.SUPPRESS)  # 子进程：单独测一个路由的 RSS
+    args = parser.parse_args()
+    if os.path.abspath(args.db) == os.path.abspath(DATABASE_PATH):
+        parser.error('不能在正式数据库上跑基准（会写库），请先用 benchmarks/generate_catalog.py 生成测试库')
+    if args.rss_case:
+        rss_case(args.db, args.rss_case, args.warm)
+        return
+
+    db_info = describe_db(args.db)
+    print(f"🗄  {db_info['path']}: 京东 {db_info['jd_products']} 商品/{db_info['jd_price_history']} 价格记录, "
+          f"天猫 {db_info['tmall_products']} 商品/{db_info['tmall_price_history']} 价格记录")
+    results = bench(args.db, args.repeat, args.warm, args.only)
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'db': db_info,
+        'repeat': args.repeat,
+        'warm': args.warm,
+        'routes': results,
+    }
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f'{args.save}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'💾 基线已保存: {path}')
+
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f'{args.compare}.json'), encoding='utf-8') as f:
+            regressions = compare(results, json.load(f))
+        if regressions:
+            print(f"❌ 回退: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
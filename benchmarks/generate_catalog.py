@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+生成大规模测试数据库
+
+表结构（含索引、触发器、迁移版本号）从真实数据库复制，保证与线上一致；
+商品标题、定级、价格走势按真实数据的规律随机生成。
+
+用法:
+    python benchmarks/generate_catalog.py --products 100000 --history 50000000 -o /tmp/big.db
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from config import DATABASE_PATH
+from database.history_day import to_epoch_day
+from database.price_stats import PLATFORM_TABLES, rebuild_price_stats
+
+# 定级 -> (占比, 基准价)
+LEVELS = {
+    '核心级': (0.08, 59),
+    '加强级': (0.35, 109),
+    '航行家级': (0.22, 199),
+    '领袖级': (0.15, 399),
+    '指挥官级': (0.05, 599),
+    '泰坦级': (0.03, 1999),
+    '大师级': (0.07, 899),
+    '': (0.05, 299),
+}
+
+SERIES = ['工作室系列SS', '传世', '电影大师级MPM-', '经典电影', '起源', '领袖之证', '王国', '地出']
+CHARACTERS = [
+    '擎天柱', '威震天', '大黄蜂', '红蜘蛛', '声波', '铁皮', '救护车', '爵士', '千斤顶', '探长',
+    '御天敌', '惊破天', '震荡波', '闹翻天', '横炮', '飞过山', '热破', '补天士', '天火', '钢锁',
+]
+MOVIES = ['电影1', '电影2', '电影5', '电影6', '电影7', '电影:起源', '超能勇士崛起', '']
+
+SHOPS = {
+    'jd': ('孩之宝京东自营旗舰店', 'https://mall.jd.com/index-1000002985.html'),
+    'tmall': ('变形金刚玩具旗舰店', 'https://thetransformers.tmall.com/'),
+}
+
+BATCH_SIZE = 50000
+
+
+def copy_schema(source_path, target_path):
+    """按源数据库的建表语句创建空库，返回触发器语句（数据导入完成后再创建）"""
+    source = sqlite3.connect(source_path)
+    rows = source.execute('''
+        SELECT type, name, sql FROM sqlite_master
+        WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+        ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END, rowid
+    ''').fetchall()
+    user_version = source.execute('PRAGMA user_version').fetchone()[0]
+    extra_rows = {}
+    if 'data_version' in [name for _, name, _ in rows]:
+        extra_rows['data_version'] = source.execute('SELECT * FROM data_version').fetchall()
+    source.close()
+
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    conn = sqlite3.connect(target_path)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+
+    triggers = []
+    for obj_type, name, sql in rows:
+        if obj_type == 'trigger':
+            triggers.append((name, sql))
+        else:
+            conn.execute(sql)
+    for table, table_rows in extra_rows.items():
+        for row in table_rows:
+            conn.execute(f'INSERT INTO {table} VALUES ({",".join("?" * len(row))})', row)
+    conn.execute(f'PRAGMA user_version = {user_version}')
+    conn.commit()
+    return conn, triggers
+
+
+def make_product(rng, platform, row_id, created_at):
+    """随机生成一个商品"""
+    level_names = list(LEVELS)
+    weights = np.array([LEVELS[name][0] for name in level_names])
+    level = level_names[rng.choice(len(level_names), p=weights / weights.sum())]
+    base_price = LEVELS[level][1]
+
+    series = SERIES[rng.integers(len(SERIES))]
+    code = f'{series}{rng.integers(1, 200)}' if series.endswith(('SS', '-')) else series
+    character = CHARACTERS[rng.integers(len(CHARACTERS))]
+    movie = MOVIES[rng.integers(len(MOVIES))]
+    style_name = f'{code}{level}{movie}{character}'
+    if platform == 'jd':
+        sku = str(100000000000 + row_id)
+        title = f'变形金刚（Transformers）儿童男孩玩具模型礼物 {style_name}F{rng.integers(1000, 9999)}'
+        url = f'https://item.jd.com/{sku}.html'
+        image = f'https://img11.360buyimg.com/n2/jfs/t1/{sku}.jpg'
+    else:
+        sku = str(700000000000 + row_id)
+        title = f'【现货】变形金刚{style_name}'
+        url = f'https://detail.tmall.com/item.htm?id={sku}'
+        image = f'https://img.alicdn.com/bao/uploaded/i2/{sku}.jpg'
+
+    price = float(round(base_price * rng.uniform(0.8, 1.3)))
+    shop_name, shop_url = SHOPS[platform]
+    is_purchased = '购买' if rng.random() < 0.05 else ('未购买' if platform == 'jd' else '否')
+    is_followed = '关注' if rng.random() < 0.15 else ('未关注' if platform == 'jd' else '否')
+    return (row_id, sku, url, image, title, price, '', style_name, 'available', 0,
+            created_at, created_at, shop_name, shop_url, is_purchased, is_followed, level)
+
+
+def price_walk(rng, start_price, days):
+    """每日价格：大部分时间不变，偶尔调价，偶尔几天大促"""
+    steps = rng.choice([0.0, -0.05, 0.05], size=days, p=[0.96, 0.02, 0.02])
+    prices = start_price * np.cumprod(1 + steps)
+    promo_count = days // 60
+    for start in rng.integers(0, max(days - 3, 1), size=promo_count):
+        prices[start:start + rng.integers(1, 4)] *= 0.8
+    return np.round(np.maximum(prices, 9.9), 0)
+
+
+def generate(conn, products, history, days, seed):
+    """写入商品、价格历史、总表"""
+    rng = np.random.default_rng(seed)
+    today = date.today()
+    per_product = max(history // max(products, 1), 1)
+    days = max(days or per_product, 1)
+    # 日期只算一次：每个商品的记录都截止到今天，取最后 n 天
+    day_strings = [(today - timedelta(days=offset)).strftime('%Y%m%d') for offset in range(days + 1)][::-1]
+    epoch_days = [to_epoch_day(day) for day in day_strings]
+
+    counts = {}
+    for platform, (product_table, history_table) in PLATFORM_TABLES.items():
+        n_products = products // 2 if platform == 'jd' else products - products // 2
+        n_history = history // 2 if platform == 'jd' else history - history // 2
+        counts[platform] = (n_products, n_history)
+        if n_products == 0:
+            continue
+
+        # 已迁移的库有整数日期列 day（见 database/history_day.py），一并写入
+        history_columns = [row[1] for row in conn.execute(f'PRAGMA table_info({history_table})')]
+        has_day = 'day' in history_columns
+
+        product_rows = []
+        history_rows = []
+        written = 0
+        for row_id in range(1, n_products + 1):
+            # 历史行数按商品平均分配，余数给前面的商品
+            n_days = min(n_history // n_products + (1 if row_id <= n_history % n_products else 0), days)
+            first_day = today - timedelta(days=max(n_days - 1, 0))
+            created_at = datetime.combine(first_day, datetime.min.time()).isoformat()
+            product = make_product(rng, platform, row_id, created_at)
+
+            if n_days:
+                prices = price_walk(rng, product[5], n_days).tolist()
+                if has_day:
+                    history_rows.extend(
+                        (row_id, product[2], price, product[7], day, epoch_day)
+                        for price, day, epoch_day in zip(prices, day_strings[-n_days:], epoch_days[-n_days:]))
+                else:
+                    history_rows.extend(
+                        (row_id, product[2], price, product[7], day)
+                        for price, day in zip(prices, day_strings[-n_days:]))
+                product = product[:5] + (prices[-1],) + product[6:]
+            product_rows.append(product)
+
+            if len(history_rows) >= BATCH_SIZE or row_id == n_products:
+                conn.executemany(f'INSERT INTO {product_table} (id, product_id, product_url, image_url, title, price, preprice, style_name, status, is_deposit, created_at, updated_at, shop_name, shop_url, is_purchased, is_followed, level) VALUES ({",".join("?" * 17)})', product_rows)
+                day_column = ', day' if has_day else ''
+                conn.executemany(f'INSERT INTO {history_table} (product_id, product_url, price, style_name, created_at{day_column}) VALUES (?, ?, ?, ?, ?{", ?" if has_day else ""})', history_rows)
+                conn.commit()
+                written += len(history_rows)
+                product_rows, history_rows = [], []
+                print(f'\r  {platform}: {row_id}/{n_products} 商品, {written} 条价格记录', end='', flush=True)
+        print()
+
+    # 总表：一部分商品京东/天猫配对
+    n_pairs = min(counts['jd'][0], counts['tmall'][0]) // 2
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    conn.executemany('''
+        INSERT INTO products_summary (product_name, product_type, jd_url, tmall_url, jd_product_id, tmall_product_id, created_at, updated_at)
+        SELECT j.style_name, j.level, j.product_url, t.product_url, j.id, t.id, ?, ?
+        FROM jd_products j, tmall_products t WHERE j.id = ? AND t.id = ?
+    ''', ((now, now, i, i) for i in range(1, n_pairs + 1)))
+    conn.commit()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成大规模测试数据库')
+    parser.add_argument('--products', type=int, default=100000, help='商品总数（京东/天猫各一半）')
+    parser.add_argument('--history', type=int, default=50000000, help='价格记录总数')
+    parser.add_argument('--days', type=int, default=None, help='每个商品最多多少天的记录（默认平均分配）')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--source', default=DATABASE_PATH, help='复制表结构的数据库')
+    parser.add_argument('-o', '--output', required=True, help='输出数据库路径')
+    args = parser.parse_args()
+
+    if os.path.abspath(args.output) == os.path.abspath(args.source):
+        parser.error('输出路径不能是源数据库')
+
+    start = time.time()
+    print(f'📋 复制表结构: {args.source}')
+    conn, triggers = copy_schema(args.source, args.output)
+
+    print(f'🏭 生成 {args.products} 个商品, {args.history} 条价格记录')
+    counts = generate(conn, args.products, args.history, args.days, args.seed)
+
+    # 价格统计表存在时（已迁移的库）一并重建
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'price_stats'").fetchone():
+        print('📊 重建价格统计')
+        rebuild_price_stats(conn)
+
+    for _, sql in triggers:
+        conn.execute(sql)
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+
+    size_mb = os.path.getsize(args.output) / 1024 / 1024
+    print(f'✅ 完成: {args.output} ({size_mb:.1f} MB, {time.time() - start:.1f}s)')
+    for platform, (n_products, n_history) in counts.items():
+        print(f'   {platform}: {n_products} 商品, {n_history} 条价格记录')
+
+
+if __name__ == '__main__':
+    main()
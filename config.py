@@ -28,12 +28,24 @@ class SpiderConfig:
         "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
     }
     
-    # 请求间隔（秒），防止被封
+    # 请求间隔（秒），防止被封：同一网站两次打开页面至少间隔 REQUEST_DELAY + 随机 0~REQUEST_JITTER 秒
     REQUEST_DELAY = 3
+    REQUEST_JITTER = 2
+    
+    # 同时加载的标签页数（Safari 只能操作最前面的窗口，固定为 1）
+    CRAWL_CONCURRENCY = int(os.environ.get("SPIDER_CONCURRENCY", "3"))
+    
+    # 京东详情页补款式名称的后台标签页数
+    STYLE_WORKERS = int(os.environ.get("SPIDER_STYLE_WORKERS", "2"))
     
     # 超时时间
     TIMEOUT = 30
 
+    # 浏览器驱动：safari（osascript）/ cdp（DevTools 长连接）/ replay（离线回放 fixture）
+    BROWSER_DRIVER = os.environ.get("SPIDER_DRIVER", "safari")
+    CDP_ENDPOINT = os.environ.get("SPIDER_CDP_ENDPOINT", "http://127.0.0.1:9222")
+    REPLAY_FIXTURE = os.environ.get("SPIDER_REPLAY", "")
+
 # ============ 商品状态 ============
 class ProductStatus:
     NOT_PURCHASED = "未购买"
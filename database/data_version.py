@@ -0,0 +1,36 @@
+"""
+数据版本号
+
+data_version 表只有一行，商品表、价格历史表、价格统计表、总表有任何增删改时由触发器把版本号加一，并记录修改时间
+（表和触发器由 database/migrations.py 创建）。
+爬虫、Web 的 POST 接口、手工改库都会自动更新版本号，读接口据此判断缓存是否失效。
+"""
+
+import sqlite3
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+# 版本更新时间（UTC，用于 HTTP Last-Modified）
+_NOW_SQL = "strftime('%Y-%m-%d %H:%M:%S', 'now')"
+_BUMP_SQL = f'UPDATE data_version SET version = version + 1, updated_at = {_NOW_SQL} WHERE id = 1'
+
+
+def read_data_version(conn: sqlite3.Connection) -> Tuple[int, Optional[datetime]]:
+    """读取 (版本号, 最后修改时间)"""
+    row = conn.execute('SELECT version, updated_at FROM data_version WHERE id = 1').fetchone()
+    if not row:
+        return 0, None
+    updated_at = None
+    if row[1]:
+        updated_at = datetime.strptime(row[1], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    return row[0], updated_at
+
+
+def get_data_version(conn: sqlite3.Connection) -> int:
+    """读取当前数据版本号"""
+    return read_data_version(conn)[0]
+
+
+def bump_data_version(conn: sqlite3.Connection):
+    """手动加一（不经过触发器的批量操作后调用），不提交事务"""
+    conn.execute(_BUMP_SQL)
@@ -2,19 +2,97 @@
 数据库连接管理
 """
 
+import queue
 import sqlite3
+import threading
 from contextlib import contextmanager
 from config import DATABASE_PATH
 
+# 每个连接建立时执行一次的 PRAGMA
+# WAL：读写互不阻塞，爬虫提交时 Web 端读取不会报 "database is locked"
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA cache_size = -32000',
+    'PRAGMA foreign_keys = ON',  # 外键约束默认关闭，每个连接都要打开
+)
 
-def get_connection():
-    """获取数据库连接"""
-    conn = sqlite3.connect(DATABASE_PATH)
+
+def configure_connection(conn):
+    """设置连接参数"""
     conn.row_factory = sqlite3.Row  # 允许通过列名访问
     conn.text_factory = str
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
 
+def get_connection(db_path=None, check_same_thread=True, factory=sqlite3.Connection):
+    """获取数据库连接（factory 可传入 sqlite3.Connection 子类）"""
+    conn = sqlite3.connect(db_path or DATABASE_PATH, check_same_thread=check_same_thread, factory=factory)
+    return configure_connection(conn)
+
+
+class ConnectionPool:
+    """连接池：连接建立一次、设置一次 PRAGMA，之后在请求之间复用"""
+
+    def __init__(self, db_path=None, max_size=8, factory=sqlite3.Connection):
+        self.db_path = db_path or DATABASE_PATH
+        self.max_size = max_size
+        self.factory = factory
+        self._idle = queue.LifoQueue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self):
+        """取出一个空闲连接，没有则新建"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return get_connection(self.db_path, check_same_thread=False, factory=self.factory)
+
+    def release(self, conn, discard=False):
+        """归还连接；未结束的事务回滚，出错或池已满时直接关闭"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            discard = True
+
+        with self._lock:
+            if discard or self._closed:
+                conn.close()
+                return
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def connection(self):
+        """with pool.connection() as conn: ..."""
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            self.release(conn, discard=True)
+            raise
+        else:
+            self.release(conn)
+
+    def close_all(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+
+
 def init_db():
     """初始化数据库"""
     from database.models import init_database
@@ -32,4 +110,5 @@ if __name__ == "__main__":
     print(f"数据库路径: {DATABASE_PATH}")
     conn = get_connection()
     print("数据库连接成功！")
+    print(f"journal_mode: {conn.execute('PRAGMA journal_mode').fetchone()[0]}")
     close_connection(conn)
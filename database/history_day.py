@@ -0,0 +1,40 @@
+"""
+价格历史的整数日期列 day
+
+created_at 是文本（爬虫写 'YYYYMMDD'，早期脚本写过 ISO 时间），按日期过滤/排序都要先解析字符串。
+day 列存 1970-01-01 起的天数（epoch day），(product_id, day) 建复合索引后，
+日期范围过滤就是索引范围扫描，窗口起点直接做整数减法。
+
+- 爬虫写入时直接带上 day
+- 没带 day 的写入（旧脚本、手工 SQL）由触发器根据 created_at 补上
+- 已有数据由迁移 6（database/migrations.py）分批回填，每批单独提交，不长时间锁库
+"""
+
+from datetime import date, datetime, timedelta
+
+EPOCH = date(1970, 1, 1)
+
+
+def normalize_day(value) -> str:
+    """date/datetime/'YYYYMMDD'/'YYYY-MM-DD...' -> 'YYYYMMDD'，格式不对抛 ValueError"""
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y%m%d')
+    day = str(value)[:10].replace('-', '')
+    datetime.strptime(day, '%Y%m%d')
+    return day
+
+
+def to_epoch_day(value) -> int:
+    """date/datetime/文本日期 -> epoch day"""
+    if isinstance(value, datetime):
+        value = value.date()
+    if not isinstance(value, date):
+        value = datetime.strptime(normalize_day(value), '%Y%m%d').date()
+    return (value - EPOCH).days
+
+
+def from_epoch_day(day) -> str:
+    """epoch day -> 'YYYYMMDD'"""
+    if day is None:
+        return None
+    return (EPOCH + timedelta(days=day)).strftime('%Y%m%d')
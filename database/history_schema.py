@@ -0,0 +1,86 @@
+"""
+价格历史查询计划检查
+
+价格历史的 product_id 原来是 TEXT，爬虫写入整数、Web 按 URL 里的字符串查询，能不能走索引全看 SQLite 的类型亲和规则
+（整数列和 TEXT 列比较时会放弃索引）。迁移 7（database/migrations.py）把它重建为：
+
+    product_id INTEGER NOT NULL REFERENCES {商品表}(id) ON DELETE CASCADE
+
+这里检查价格历史相关的查询都走索引，tests/test_query_plans.py 在临时库上迁移后断言每个查询都通过。
+
+检查某个数据库（在临时副本上迁移后检查，不改动数据库）：python -m database.history_schema [数据库路径]
+"""
+
+import sqlite3
+import sys
+
+from database.price_windows import PLATFORM_TABLES, latest_day_sql, window_min_sql
+
+
+def _query_plan(conn, sql, params=()):
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+
+def check_query_plans(conn: sqlite3.Connection) -> list:
+    """检查价格历史查询是否走索引，返回 [(名称, 查询计划, 是否通过)]
+
+    - /api/price-history：按 URL 里的字符串 id 查，要走 (product_id, day) 索引（idx_ 或迁移 8 的唯一索引 uq_）
+    - 价格统计/滚动窗口的相关子查询：每个商品一次索引查找，不能全表扫描
+    - 总表列表：通过主键关联商品表和 price_stats
+    """
+    results = []
+    for platform, (product_table, price_table) in PLATFORM_TABLES.items():
+        checks = [
+            (f'{platform} /api/price-history',
+             f'SELECT id, product_id, price, created_at, style_name, day FROM {price_table} '
+             f'WHERE product_id = ? ORDER BY day DESC', ('1',),
+             f'{price_table}_product_day (product_id=?)'),
+            (f'{platform} 最近价格日期子查询',
+             f'SELECT p.id, {latest_day_sql(price_table, "p.id")} FROM {product_table} p', (),
+             f'{price_table}_product_day (product_id=?)'),
+            (f'{platform} 30天最低价子查询',
+             f'SELECT p.id, {window_min_sql(price_table, "p.id", 30, "20000")} FROM {product_table} p', (),
+             f'idx_{price_table}_product_day (product_id=? AND day>? AND day<?)'),
+            (f'{platform} 总表关联',
+             f'SELECT ps.id, p.title, s.latest_date FROM products_summary ps '
+             f'LEFT JOIN {product_table} p ON p.id = ps.{platform}_product_id '
+             f"LEFT JOIN price_stats s ON s.platform = '{platform}' AND s.product_row_id = p.id", (),
+             'USING PRIMARY KEY'),
+        ]
+        for name, sql, params, expected in checks:
+            plan = _query_plan(conn, sql, params)
+            ok = any(expected in line for line in plan) and not any(
+                line.startswith(f'SCAN {price_table}') for line in plan)
+            results.append((name, plan, ok))
+    return results
+
+
+if __name__ == '__main__':
+    import os
+    import tempfile
+
+    from config import DATABASE_PATH
+    from database.db import get_connection
+    from database.migrations import migrate
+
+    # 在临时副本上迁移、检查，不改动源数据库（源库只读打开，连 WAL 设置也不写）
+    source_path = sys.argv[1] if len(sys.argv) > 1 else DATABASE_PATH
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        copy_path = os.path.join(tmp_dir, 'plan_check.db')
+        source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+        target = sqlite3.connect(copy_path)
+        source.backup(target)
+        source.close()
+        target.close()
+
+        conn = get_connection(copy_path)
+        migrate(conn)
+
+        failed = 0
+        for name, plan, ok in check_query_plans(conn):
+            print(f"{'✅' if ok else '❌'} {name}")
+            for line in plan:
+                print(f"      {line}")
+            failed += not ok
+        conn.close()
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,135 @@
+"""
+价格历史批量写入（爬虫共用）
+
+爬虫每解析完一页调用一次：先用一条 SELECT 查出这一页里已入库的商品，再在一个事务里
+executemany 写新商品、改商品价格、写价格历史，最后刷新这些商品的 price_stats 并提交。
+原来每个商品 3~4 次往返、京东每条记录提交一次，现在一页只有几条语句、一次提交。
+
+价格历史靠 (product_id, day) 唯一索引去重，同一天重复抓到的冲突按平台处理：
+- 京东 keep：保留当天第一次抓到的价格（ON CONFLICT DO NOTHING）
+- 天猫 update：以最后一次抓到的价格为准（ON CONFLICT DO UPDATE）
+"""
+
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from database.history_day import to_epoch_day
+from database.price_stats import refresh_price_stats
+from database.price_windows import PLATFORM_TABLES
+
+# 同一天重复抓取时的处理：keep 保留第一次，update 覆盖为最新
+CONFLICT_POLICY = {
+    'jd': 'keep',
+    'tmall': 'update',
+}
+
+_HISTORY_INSERT_SQL = '''
+    INSERT INTO {table} (product_id, product_url, price, style_name, created_at, day)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(product_id, day) DO {action}
+'''
+
+_CONFLICT_ACTIONS = {
+    'keep': 'NOTHING',
+    'update': 'UPDATE SET price = excluded.price',
+}
+
+
+def _product_rows(conn, product_table, where_sql='1=1', params=()):
+    rows = conn.execute(f'SELECT product_id, id, price, style_name FROM {product_table} WHERE {where_sql}', params)
+    return {str(row[0]): {'id': row[1], 'price': row[2], 'style_name': row[3]} for row in rows}
+
+
+def find_products(conn: sqlite3.Connection, platform: str, skus: Iterable[str]) -> Dict[str, dict]:
+    """按平台商品编号批量查商品，返回 {商品编号: {'id', 'price', 'style_name'}}"""
+    product_table, _ = PLATFORM_TABLES[platform]
+    skus = list(dict.fromkeys(str(s) for s in skus))
+    if not skus:
+        return {}
+    return _product_rows(conn, product_table, f"product_id IN ({', '.join('?' * len(skus))})", skus)
+
+
+def load_known_products(conn: sqlite3.Connection, platform: str) -> Dict[str, dict]:
+    """爬虫启动时一次加载该平台全部商品，格式同 find_products
+
+    传给 write_page(known=...) 后随写入更新，整个爬取过程中判断新老商品、价格是否变化都查这个字典。
+    """
+    product_table, _ = PLATFORM_TABLES[platform]
+    return _product_rows(conn, product_table, 'product_id IS NOT NULL')
+
+
+def write_page(conn: sqlite3.Connection, platform: str, new_products: List[dict] = (),
+               price_updates: Iterable[tuple] = (), history: List[dict] = (),
+               now: Optional[datetime] = None, known: Optional[Dict[str, dict]] = None) -> dict:
+    """一个事务写入一页数据并提交
+
+    new_products: 新商品，商品表的 列名 -> 值（每条列名相同，必须有 product_id）
+    price_updates: 已有商品的新价格 [(平台商品编号, 价格)]
+    history: 价格历史 [{'sku': 平台商品编号 或 'row_id': 商品表id, 'url', 'price', 'style_name'}]，
+             sku 可以指向本页的新商品
+    known: load_known_products 加载的商品字典，提交成功后把新商品和新价格写回，不传则按页查库
+    返回 {'new_products': 新商品数, 'history_new': 新增价格记录数, 'history_existing': 当天已有记录数}
+    """
+    product_table, price_table = PLATFORM_TABLES[platform]
+    now = now or datetime.now()
+    today = now.strftime('%Y%m%d')
+    today_day = to_epoch_day(now)
+    result = {'new_products': len(new_products), 'history_new': 0, 'history_existing': 0}
+
+    price_updates = [(str(sku), price) for sku, price in price_updates]
+    try:
+        touched = set()
+        if new_products:
+            columns = list(new_products[0])
+            conn.executemany(
+                f"INSERT INTO {product_table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [tuple(p[c] for c in columns) for p in new_products])
+
+        # 新商品的自增 id 插入后才知道；已知商品直接取字典，其余查一次
+        skus = ([p['product_id'] for p in new_products] + [sku for sku, _ in price_updates]
+                + [h['sku'] for h in history if 'sku' in h])
+        lookup = [str(sku) for sku in skus if known is None or str(sku) not in known]
+        row_ids = {sku: product['id'] for sku, product in find_products(conn, platform, lookup).items()}
+        if known is not None:
+            row_ids.update((str(sku), known[str(sku)]['id']) for sku in skus if str(sku) in known)
+        touched.update(row_ids[str(p['product_id'])] for p in new_products)
+
+        if price_updates:
+            conn.executemany(f'UPDATE {product_table} SET price = ?, updated_at = ? WHERE id = ?',
+                             [(price, now.isoformat(), row_ids[sku]) for sku, price in price_updates])
+            touched.update(row_ids[sku] for sku, _ in price_updates)
+
+        history_rows = []
+        for h in history:
+            row_id = h['row_id'] if 'row_id' in h else row_ids.get(str(h['sku']))
+            if row_id:
+                history_rows.append((row_id, h['url'], h['price'], h.get('style_name') or '', today, today_day))
+        if history_rows:
+            existing = {row[0] for row in conn.execute(f'''
+                SELECT product_id FROM {price_table}
+                WHERE day = ? AND product_id IN ({', '.join('?' * len(history_rows))})
+            ''', [today_day] + [row[0] for row in history_rows])}
+            result['history_existing'] = len({row[0] for row in history_rows} & existing)
+            result['history_new'] = len({row[0] for row in history_rows} - existing)
+
+            sql = _HISTORY_INSERT_SQL.format(table=price_table,
+                                             action=_CONFLICT_ACTIONS[CONFLICT_POLICY[platform]])
+            conn.executemany(sql, history_rows)
+            touched.update(row[0] for row in history_rows)
+
+        # 价格统计和写入同一事务（新商品没有价格记录也要有一行，列表排序分页依赖）
+        if touched:
+            refresh_price_stats(conn, platform, touched)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if known is not None:
+        for p in new_products:
+            sku = str(p['product_id'])
+            known[sku] = {'id': row_ids[sku], 'price': p.get('price'), 'style_name': p.get('style_name')}
+        for sku, price in price_updates:
+            known[sku]['price'] = price
+    return result
@@ -0,0 +1,369 @@
+"""
+数据库结构迁移
+
+用 PRAGMA user_version 记录已执行到的版本，爬虫连接数据库时调用 migrate()，未执行过的迁移按顺序执行一次。
+有的迁移会删除数据（迁移 7 移走孤儿价格记录，8 删同日重复价格，9 合并重复商品），Web 端不执行迁移，
+只用 check_version() 检查版本，落后时报错，部署时先手动执行迁移。
+
+每个迁移只用自己写死的 SQL，不调用会随版本变化的建表/建索引函数：已发布的迁移在新库、旧库上执行的结果
+永远和发布时一样。price_stats 是从价格历史算出来的汇总，不在每个迁移里各算一遍：本次要执行的迁移里
+最后一个标记了“重建统计”的，执行完后用当前代码重建一次（此时表结构已经是最新的）。
+
+手动执行：python -m database.migrations [数据库路径]
+"""
+
+import sqlite3
+
+from database.price_stats import rebuild_price_stats
+
+# 迁移用到的表，写死在这里（以后平台增减要新增迁移，不能改这里）
+_PLATFORMS = (
+    ('jd', 'jd_products', 'jd_price_history'),
+    ('tmall', 'tmall_products', 'tmall_price_history'),
+)
+_VERSION_TABLES = ('jd_products', 'tmall_products', 'jd_price_history', 'tmall_price_history',
+                   'products_summary', 'price_stats')
+
+_NOW_SQL = "strftime('%Y-%m-%d %H:%M:%S', 'now')"
+# 迁移 3 起的版本号触发器内容
+_BUMP_SQL = f'UPDATE data_version SET version = version + 1, updated_at = {_NOW_SQL} WHERE id = 1'
+# 'YYYYMMDD' / ISO 日期 -> epoch day（迁移 6）
+_EPOCH_DAY_SQL = ("CAST(julianday(substr(replace(substr({0}, 1, 10), '-', ''), 1, 4) || '-' || "
+                  "substr(replace(substr({0}, 1, 10), '-', ''), 5, 2) || '-' || "
+                  "substr(replace(substr({0}, 1, 10), '-', ''), 7, 2)) - 2440587.5 AS INTEGER)")
+# 迁移 6 回填 day 每批行数
+_BACKFILL_BATCH_SIZE = 20000
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def _add_column(conn, table, column, column_type):
+    if column not in _columns(conn, table):
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+
+
+def _create_version_trigger(conn, table, event):
+    trigger = f'trg_{table}_{event.lower()}_version'
+    conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    conn.execute(f'''
+        CREATE TRIGGER {trigger}
+        AFTER {event} ON {table}
+        BEGIN
+            {_BUMP_SQL};
+        END
+    ''')
+
+
+def _create_day_triggers(conn, price_table):
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{price_table}_day_insert
+        AFTER INSERT ON {price_table}
+        WHEN NEW.day IS NULL
+        BEGIN
+            UPDATE {price_table} SET day = {_EPOCH_DAY_SQL.format('NEW.created_at')} WHERE id = NEW.id;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{price_table}_day_update
+        AFTER UPDATE OF created_at ON {price_table}
+        BEGIN
+            UPDATE {price_table} SET day = {_EPOCH_DAY_SQL.format('NEW.created_at')} WHERE id = NEW.id;
+        END
+    ''')
+
+
+def _create_price_stats(conn):
+    """价格统计汇总表 price_stats"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS price_stats (
+            platform TEXT NOT NULL,
+            product_row_id INTEGER NOT NULL,
+            latest_price REAL,
+            latest_date TEXT,
+            min_price_all REAL,
+            max_price_all REAL,
+            min_price_7d REAL,
+            min_price_30d REAL,
+            min_price_90d REAL,
+            change_count INTEGER NOT NULL DEFAULT 0,
+            updated_at DateTime,
+            PRIMARY KEY (platform, product_row_id)
+        ) WITHOUT ROWID
+    ''')
+    for _, _, price_table in _PLATFORMS:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{price_table}_product ON {price_table}(product_id, created_at)')
+
+
+def _create_data_version(conn):
+    """数据版本号表和触发器（读接口缓存失效用）"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 1)')
+    for table in _VERSION_TABLES:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_version SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+
+
+def _data_version_updated_at(conn):
+    """数据版本号记录修改时间（HTTP Last-Modified 用）"""
+    _add_column(conn, 'data_version', 'updated_at', 'TEXT')
+    conn.execute(f'UPDATE data_version SET updated_at = {_NOW_SQL} WHERE updated_at IS NULL')
+    for table in _VERSION_TABLES:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            _create_version_trigger(conn, table, event)
+
+
+def _list_sort_indexes(conn):
+    """商品列表排序索引（keyset 分页）和 price_stats.price_drop"""
+    _add_column(conn, 'price_stats', 'price_drop', 'REAL')
+    for column in ('latest_price', 'price_drop'):
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_price_stats_{column} ON price_stats(platform, {column}, product_row_id)')
+    for _, product_table, _ in _PLATFORMS:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{product_table}_created ON {product_table}(created_at, id)')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{product_table}_level ON {product_table}(level, id)')
+
+
+def _price_windows(conn):
+    """价格历史 (product_id, 日期) 表达式索引、365天最低价，按规整后的日期重建 price_stats"""
+    _add_column(conn, 'price_stats', 'min_price_365d', 'REAL')
+    for _, _, price_table in _PLATFORMS:
+        conn.execute(f'''CREATE INDEX IF NOT EXISTS idx_{price_table}_product_day
+                         ON {price_table}(product_id, replace(substr(created_at, 1, 10), '-', ''), price)''')
+
+
+def _history_day(conn):
+    """价格历史整数日期列 day（分批回填）和 (product_id, day, price) 索引"""
+    bumped = False
+    for _, _, price_table in _PLATFORMS:
+        # 迁移 5 的同名表达式索引换成整数列索引
+        conn.execute(f'DROP INDEX IF EXISTS idx_{price_table}_product_day')
+        _add_column(conn, price_table, 'day', 'INTEGER')
+        # 写入时没带 day（或改了 created_at）由触发器补上
+        _create_day_triggers(conn, price_table)
+
+        if not conn.execute(f'SELECT 1 FROM {price_table} WHERE day IS NULL AND created_at IS NOT NULL LIMIT 1').fetchone():
+            continue
+
+        # 回填不改变业务数据：暂停版本号 UPDATE 触发器，每批提交一次，结束后整体加一次版本号
+        conn.execute(f'DROP TRIGGER IF EXISTS trg_{price_table}_update_version')
+        conn.commit()
+        min_id, max_id = conn.execute(f'SELECT MIN(id), MAX(id) FROM {price_table} WHERE day IS NULL').fetchone()
+        total = 0
+        for start in range(min_id, max_id + 1, _BACKFILL_BATCH_SIZE):
+            cursor = conn.execute(f'''
+                UPDATE {price_table} SET day = {_EPOCH_DAY_SQL.format('created_at')}
+                WHERE id >= ? AND id < ? AND day IS NULL
+            ''', (start, start + _BACKFILL_BATCH_SIZE))
+            conn.commit()
+            total += cursor.rowcount
+        print(f"   {price_table}: 回填 day {total} 行")
+        _create_version_trigger(conn, price_table, 'UPDATE')
+        bumped = True
+
+    if bumped:
+        conn.execute(_BUMP_SQL)
+    for _, _, price_table in _PLATFORMS:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{price_table}_product_day ON {price_table}(product_id, day, price)')
+
+
+def _history_foreign_keys(conn):
+    """价格历史 product_id 改为 INTEGER 外键（ON DELETE CASCADE），重建表和索引
+
+    SQLite 不能 ALTER 列类型，按官方的 12 步流程重建表：关外键 -> 新表 -> 拷数据 -> 删旧表 -> 改名 ->
+    重建索引/触发器 -> foreign_key_check -> 提交 -> 开外键。找不到商品的历史记录（孤儿）不丢弃，移到 {表名}_orphans。
+    """
+    conn.commit()
+    conn.execute('PRAGMA foreign_keys = OFF')  # 事务内不能切换，必须在 BEGIN 之前
+    rebuilt = False
+    try:
+        conn.execute('BEGIN')
+        for _, product_table, price_table in _PLATFORMS:
+            columns = {row[1]: row[2] for row in conn.execute(f'PRAGMA table_info({price_table})')}
+            has_fk = any(row[3] == 'product_id' for row in conn.execute(f'PRAGMA foreign_key_list({price_table})'))
+            if columns.get('product_id', '').upper() == 'INTEGER' and has_fk:
+                continue
+
+            new_table = f'{price_table}_new'
+            conn.execute(f'DROP TABLE IF EXISTS {new_table}')
+            conn.execute(f'''
+                CREATE TABLE {new_table} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    product_id INTEGER NOT NULL REFERENCES {product_table}(id) ON DELETE CASCADE,
+                    product_url TEXT,
+                    price REAL,
+                    style_name TEXT,
+                    created_at TEXT,
+                    day INTEGER
+                )
+            ''')
+
+            # 商品不存在的记录单独保存，人工核对
+            orphan_filter = f'NOT EXISTS (SELECT 1 FROM {product_table} p WHERE p.id = CAST(h.product_id AS INTEGER))'
+            orphans = conn.execute(f'SELECT COUNT(*) FROM {price_table} h WHERE {orphan_filter}').fetchone()[0]
+            if orphans:
+                conn.execute(f'CREATE TABLE IF NOT EXISTS {price_table}_orphans AS SELECT * FROM {price_table} WHERE 0')
+                conn.execute(f'INSERT INTO {price_table}_orphans SELECT * FROM {price_table} h WHERE {orphan_filter}')
+                print(f"   {price_table}: {orphans} 条记录找不到商品，移到 {price_table}_orphans")
+
+            conn.execute(f'''
+                INSERT INTO {new_table} (id, product_id, product_url, price, style_name, created_at, day)
+                SELECT h.id, CAST(h.product_id AS INTEGER), h.product_url, h.price, h.style_name, h.created_at, h.day
+                FROM {price_table} h
+                WHERE NOT {orphan_filter}
+            ''')
+
+            # 保留自增序列（删除过的 id 不复用）
+            seq = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (price_table,)).fetchone()
+            conn.execute(f'DROP TABLE {price_table}')
+            conn.execute(f'ALTER TABLE {new_table} RENAME TO {price_table}')
+            if seq:
+                conn.execute('UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?', (seq[0], price_table))
+
+            # 删表时索引和触发器一起删掉了，重建
+            conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{price_table}_product ON {price_table}(product_id, created_at)')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{price_table}_product_day ON {price_table}(product_id, day, price)')
+            _create_day_triggers(conn, price_table)
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                _create_version_trigger(conn, price_table, event)
+            print(f"   {price_table}: product_id 改为 INTEGER 外键")
+            rebuilt = True
+
+        if rebuilt:
+            # 接口返回的 product_id 从字符串变为整数，旧缓存作废
+            conn.execute(_BUMP_SQL)
+
+        violations = conn.execute('PRAGMA foreign_key_check').fetchall()
+        if violations:
+            raise sqlite3.IntegrityError(f'外键检查失败: {[tuple(row) for row in violations[:5]]}')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute('PRAGMA foreign_keys = ON')
+
+
+def _history_unique_day(conn):
+    """价格历史 (product_id, day) 唯一索引（爬虫按页 UPSERT 写入）"""
+    # 已有的同日重复记录：京东保留当天第一条，天猫保留最后一条
+    for platform, _, price_table in _PLATFORMS:
+        keep = 'MIN(id)' if platform == 'jd' else 'MAX(id)'
+        cursor = conn.execute(f'''
+            DELETE FROM {price_table}
+            WHERE day IS NOT NULL
+              AND id NOT IN (SELECT {keep} FROM {price_table} WHERE day IS NOT NULL GROUP BY product_id, day)
+        ''')
+        if cursor.rowcount:
+            print(f"   {price_table}: 删除 {cursor.rowcount} 条同日重复记录")
+        conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS uq_{price_table}_product_day ON {price_table}(product_id, day)')
+
+
+def _product_unique_sku(conn):
+    """商品表 product_id 唯一索引（重复商品合并到最早的一行）"""
+    # 保留 id 最小的一行，价格历史、总表引用改指向它，同日冲突的价格记录随重复商品删除
+    for platform, product_table, price_table in _PLATFORMS:
+        duplicates = conn.execute(f'''
+            SELECT id, keep_id FROM (
+                SELECT id, MIN(id) OVER (PARTITION BY product_id) AS keep_id
+                FROM {product_table} WHERE product_id IS NOT NULL
+            ) WHERE id <> keep_id
+        ''').fetchall()
+        if duplicates:
+            pairs = [(keep_id, dup_id) for dup_id, keep_id in duplicates]
+            dup_ids = [(dup_id,) for dup_id, _ in duplicates]
+            conn.executemany(f'UPDATE OR IGNORE {price_table} SET product_id = ? WHERE product_id = ?', pairs)
+            conn.executemany(f'DELETE FROM {price_table} WHERE product_id = ?', dup_ids)
+            conn.executemany(f'UPDATE products_summary SET {platform}_product_id = ? WHERE {platform}_product_id = ?', pairs)
+            conn.executemany(f'DELETE FROM {product_table} WHERE id = ?', dup_ids)
+            print(f"   {product_table}: 合并 {len(duplicates)} 个重复商品")
+        conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS uq_{product_table}_product_id ON {product_table}(product_id)')
+
+
+def _style_jobs(conn):
+    """京东款式名称任务队列 jd_style_jobs（详情页由后台标签页补款式）"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jd_style_jobs (
+            product_row_id INTEGER PRIMARY KEY REFERENCES jd_products(id) ON DELETE CASCADE,
+            product_url TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            updated_at DateTime
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jd_style_jobs_status ON jd_style_jobs(status, updated_at)')
+
+
+def _price_stats_prior_min(conn):
+    """price_stats.min_price_prior：最近一次价格日期之前的最低价（接口按当天算 min_price_30d 用）"""
+    _add_column(conn, 'price_stats', 'min_price_prior', 'REAL')
+
+
+# (版本号, 迁移函数, 执行后是否需要重建 price_stats)，只能追加，不要修改已发布的版本
+MIGRATIONS = [
+    (1, _create_price_stats, True),
+    (2, _create_data_version, False),
+    (3, _data_version_updated_at, False),
+    (4, _list_sort_indexes, True),
+    (5, _price_windows, True),
+    (6, _history_day, True),
+    (7, _history_foreign_keys, False),
+    (8, _history_unique_day, True),
+    (9, _product_unique_sku, True),
+    (10, _style_jobs, False),
+    (11, _price_stats_prior_min, True),
+]
+
+# 当前代码需要的数据库版本
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def check_version(conn: sqlite3.Connection) -> int:
+    """只检查不迁移：数据库版本落后于代码时抛出 RuntimeError，返回当前版本号"""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version < LATEST_VERSION:
+        raise RuntimeError(f'数据库版本 {version} 落后于代码需要的版本 {LATEST_VERSION}，'
+                           f'请先执行迁移: python -m database.migrations')
+    return version
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """执行未完成的迁移，返回当前版本号"""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    pending = [(target, func, stats) for target, func, stats in MIGRATIONS if target > version]
+    # price_stats 只在最后一个需要它的迁移之后重建一次
+    rebuild_at = max((target for target, _, stats in pending if stats), default=None)
+
+    for target, func, _ in pending:
+        print(f"🔧 数据库迁移 {target}: {func.__doc__.splitlines()[0]}")
+        func(conn)
+        if target == rebuild_at:
+            print("   重建 price_stats")
+            rebuild_price_stats(conn)
+        conn.execute(f'PRAGMA user_version = {target}')
+        conn.commit()
+        version = target
+
+    return version
+
+
+if __name__ == '__main__':
+    import sys
+
+    from database.db import get_connection
+
+    conn = get_connection(sys.argv[1] if len(sys.argv) > 1 else None)
+    print(f"当前数据库版本: {migrate(conn)}")
+    conn.close()
@@ -0,0 +1,112 @@
+"""
+价格统计汇总表 price_stats
+
+每个商品（平台 + 商品表自增id）一行，保存最新价格/日期、历史最低/最高、
+最近7/30/90/365天最低价（窗口计算见 database/price_windows.py）、价格变动次数和最近一次降价幅度。
+爬虫写入价格历史时在同一事务内刷新对应商品，Web 端列表直接读这张表，不再在请求时扫描价格历史。
+
+滚动窗口以商品最近一次价格日期为终点，不随日期变化。Web 接口的 min_price_30d 沿用原来的口径（今天以前的最低价），
+由 latest_price、latest_date 和 min_price_prior（最近一次价格日期之前的最低价）在读取时按当天算出。
+
+重建：python -m database.price_stats rebuild
+"""
+
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Iterable, Optional
+
+from database.price_windows import DEFAULT_WINDOWS, PLATFORM_TABLES, window_min_sql
+
+# 滚动窗口（天），每个窗口对应 price_stats 的一列 min_price_{N}d（表结构见 database/migrations.py，加窗口要新增迁移补列）
+WINDOWS = DEFAULT_WINDOWS
+
+
+def _refresh_sql(platform, id_placeholders=None):
+    product_table, price_table = PLATFORM_TABLES[platform]
+    if id_placeholders:
+        history_filter = f'product_id IN ({id_placeholders})'
+        product_filter = f'p.id IN ({id_placeholders})'
+    else:
+        history_filter = product_filter = '1=1'
+
+    # 滚动窗口以该商品最近一次价格日期为终点（不含当天），与“最新价 vs 之前最低价”的比较口径一致，
+    # 每个窗口是 (product_id, 日期) 索引上的一段范围扫描
+    window_columns = ',\n'.join(
+        window_min_sql(price_table, 'b.row_id', days, 'b.latest_day') for days in WINDOWS)
+
+    # 按整数日期 day 排序，同一天多条按 id 排，结果确定；latest_date 仍输出 YYYYMMDD
+    return f'''
+        WITH ranked AS (
+            SELECT product_id AS product_row_id, price, day,
+                   ROW_NUMBER() OVER w AS rn,
+                   LEAD(price) OVER w AS prev_price,
+                   FIRST_VALUE(day) OVER w AS product_latest_day
+            FROM {price_table}
+            WHERE {history_filter}
+            WINDOW w AS (PARTITION BY product_id ORDER BY day DESC, id DESC)
+        ),
+        base AS (
+            SELECT p.id AS row_id,
+                   MAX(CASE WHEN r.rn = 1 THEN r.price END) AS latest_price,
+                   MAX(CASE WHEN r.rn = 1 THEN r.day END) AS latest_day,
+                   MIN(CASE WHEN r.price > 0 THEN r.price END) AS min_price_all,
+                   MAX(CASE WHEN r.price > 0 THEN r.price END) AS max_price_all,
+                   COUNT(CASE WHEN r.prev_price IS NOT NULL AND r.price <> r.prev_price THEN 1 END) AS change_count,
+                   MAX(CASE WHEN r.rn = 1 THEN r.prev_price - r.price END) AS price_drop,
+                   MIN(CASE WHEN r.day < r.product_latest_day THEN r.price END) AS min_price_prior
+            FROM {product_table} p
+            LEFT JOIN ranked r ON r.product_row_id = p.id
+            WHERE {product_filter}
+            GROUP BY p.id
+        )
+        INSERT OR REPLACE INTO price_stats
+            (platform, product_row_id, latest_price, latest_date, min_price_all, max_price_all,
+             {', '.join(f'min_price_{days}d' for days in WINDOWS)}, change_count, price_drop, min_price_prior,
+             updated_at)
+        SELECT :platform, b.row_id, b.latest_price, strftime('%Y%m%d', b.latest_day * 86400, 'unixepoch'),
+               b.min_price_all, b.max_price_all,
+               {window_columns},
+               b.change_count, b.price_drop, b.min_price_prior, :now
+        FROM base b
+    '''
+
+
+def refresh_price_stats(conn: sqlite3.Connection, platform: str, product_row_ids: Optional[Iterable[int]] = None):
+    """刷新指定商品的统计（不传 product_row_ids 则刷新该平台全部商品）
+
+    不提交事务，由调用方和价格历史写入一起提交。
+    """
+    params = {'platform': platform, 'now': datetime.now().isoformat()}
+
+    placeholders = None
+    if product_row_ids is not None:
+        ids = sorted({int(i) for i in product_row_ids if i})
+        if not ids:
+            return
+        placeholders = ', '.join(f':id{i}' for i in range(len(ids)))
+        params.update({f'id{i}': v for i, v in enumerate(ids)})
+
+    conn.execute(_refresh_sql(platform, placeholders), params)
+
+
+def rebuild_price_stats(conn: sqlite3.Connection):
+    """从价格历史全量重建 price_stats"""
+    conn.execute('DELETE FROM price_stats')
+    for platform in PLATFORM_TABLES:
+        refresh_price_stats(conn, platform)
+    conn.commit()
+
+
+if __name__ == '__main__':
+    from database.db import get_connection
+
+    if len(sys.argv) < 2 or sys.argv[1] != 'rebuild':
+        print("用法: python -m database.price_stats rebuild")
+        sys.exit(1)
+
+    conn = get_connection()
+    rebuild_price_stats(conn)
+    count = conn.execute('SELECT COUNT(*) FROM price_stats').fetchone()[0]
+    conn.close()
+    print(f"price_stats 重建完成: {count} 条")
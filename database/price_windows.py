@@ -0,0 +1,130 @@
+"""
+滚动窗口最低价
+
+价格历史按整数日期列 day（epoch day，见 database/history_day.py）计算，
+(product_id, day, price) 复合索引上，某个商品某个窗口的最低价就是一段范围扫描，窗口起点是整数减法，
+不需要解析日期字符串，也不需要把历史读到 Python 里。price_stats 刷新、Web 接口、报表共用这里的 SQL。
+
+报表：python -m database.price_windows jd --windows 7,30,365 [--end 20260301]
+"""
+
+import sqlite3
+import sys
+from typing import Dict, Iterable, Optional, Sequence
+
+from database.history_day import from_epoch_day, to_epoch_day
+
+# 平台 -> (商品表, 价格历史表)
+PLATFORM_TABLES = {
+    'jd': ('jd_products', 'jd_price_history'),
+    'tmall': ('tmall_products', 'tmall_price_history'),
+}
+
+# 默认窗口（天）
+DEFAULT_WINDOWS = (7, 30, 90, 365)
+
+
+def latest_day_sql(price_table: str, product_expr: str) -> str:
+    """某商品最近一次价格日期（相关子查询，索引上直接取最大值）"""
+    return f'(SELECT MAX(day) FROM {price_table} WHERE product_id = {product_expr})'
+
+
+def window_min_sql(price_table: str, product_expr: str, days: int, end_expr: str) -> str:
+    """窗口 [end - days, end) 内的最低价（相关子查询，索引范围扫描）
+
+    product_expr 是商品表 id，要带表别名（价格历史表也有 id 列，不带别名的 id 会解析成价格历史的 id），
+    end_expr 是 epoch day，不含当天。价格 <= 0（解密失败）不参与。
+    """
+    return f'''(
+        SELECT MIN(price) FROM {price_table}
+        WHERE product_id = {product_expr}
+          AND day >= {end_expr} - {int(days)}
+          AND day < {end_expr}
+          AND price > 0
+    )'''
+
+
+def rolling_min(conn: sqlite3.Connection, platform: str, product_row_ids: Optional[Iterable[int]] = None,
+                windows: Sequence[int] = DEFAULT_WINDOWS, end_day=None) -> Dict[int, dict]:
+    """批量计算滚动窗口最低价
+
+    end_day 为空时，每个商品以自己最近一次价格日期为终点（不含当天，和 price_stats 口径一致）；
+    指定 end_day（epoch day 整数，或 date/文本日期）时所有商品统一以该日期为终点（不含当天），报表按日期回看用。
+    返回 {商品表id: {'latest_date': ..., 窗口天数: 最低价, ...}}
+    """
+    product_table, price_table = PLATFORM_TABLES[platform]
+    windows = sorted({int(w) for w in windows})
+    if not windows or windows[0] <= 0:
+        raise ValueError('窗口天数必须是正整数')
+
+    params = {}
+    where_sql = '1=1'
+    if product_row_ids is not None:
+        ids = sorted({int(i) for i in product_row_ids})
+        if not ids:
+            return {}
+        where_sql = f"p.id IN ({', '.join(f':id{i}' for i in range(len(ids)))})"
+        params.update({f'id{i}': v for i, v in enumerate(ids)})
+
+    if end_day is None:
+        end_sql = 'b.latest_day'
+    else:
+        end_sql = ':end_day'
+        params['end_day'] = end_day if isinstance(end_day, int) else to_epoch_day(end_day)
+
+    window_columns = ',\n'.join(
+        f"{window_min_sql(price_table, 'b.id', days, end_sql)} AS min_{days}d" for days in windows)
+    rows = conn.execute(f'''
+        SELECT b.id, b.latest_day, {window_columns}
+        FROM (
+            SELECT p.id, {latest_day_sql(price_table, 'p.id')} AS latest_day
+            FROM {product_table} p
+            WHERE {where_sql}
+        ) b
+        ORDER BY b.id
+    ''', params).fetchall()
+
+    return {
+        row[0]: {'latest_date': from_epoch_day(row[1]), **{days: row[2 + i] for i, days in enumerate(windows)}}
+        for row in rows
+    }
+
+
+def parse_windows(text: str) -> list:
+    """'7,30,365' -> [7, 30, 365]"""
+    windows = [int(part) for part in text.split(',') if part.strip()]
+    if not windows or min(windows) <= 0:
+        raise ValueError('窗口天数必须是正整数')
+    return windows
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from database.db import get_connection
+    from database.migrations import migrate
+
+    parser = argparse.ArgumentParser(description='滚动窗口最低价报表')
+    parser.add_argument('platform', choices=sorted(PLATFORM_TABLES))
+    parser.add_argument('--windows', default=','.join(map(str, DEFAULT_WINDOWS)), help='窗口天数，逗号分隔')
+    parser.add_argument('--end', help='统一终点日期（不含当天），默认每个商品最近一次价格日期')
+    parser.add_argument('--ids', help='商品表 id，逗号分隔，默认全部')
+    args = parser.parse_args()
+
+    try:
+        windows = parse_windows(args.windows)
+        end_day = to_epoch_day(args.end) if args.end else None
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    ids = [int(i) for i in args.ids.split(',')] if args.ids else None
+
+    conn = get_connection()
+    migrate(conn)
+    result = rolling_min(conn, args.platform, ids, windows, end_day)
+    conn.close()
+
+    print('ID'.ljust(8) + '最近日期'.ljust(12) + ''.join(f'{days}天最低'.rjust(12) for days in windows))
+    for row_id, stats in result.items():
+        mins = ''.join((f'{stats[days]:.2f}' if stats[days] is not None else '-').rjust(14) for days in windows)
+        print(str(row_id).ljust(8) + (stats['latest_date'] or '-').ljust(14) + mins)
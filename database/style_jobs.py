@@ -0,0 +1,172 @@
+"""
+京东款式名称任务队列 jd_style_jobs
+
+新商品的款式名称要打开详情页才能取到。原来列表爬虫遇到新商品就地打开详情页、等加载、关掉，整页都卡着；
+现在列表爬虫只把 (商品表id, 详情页网址) 写进队列，由 spiders/jd_style_worker.py 的多个标签页慢慢补。
+
+任务状态：pending 等待 → running 处理中 → done 取到款式 / failed 没取到（NOT_FOUND 或出错）。
+队列在数据库里，爬虫中途退出也不丢：启动时 requeue_style_jobs() 把 running 的放回 pending，
+没有款式名称、尝试次数未满 MAX_ATTEMPTS 的商品（包括以前没进过队列的）重新排队。
+
+表结构见 database/migrations.py（迁移 10）。
+
+队列状态：python -m database.style_jobs [status|requeue|check]
+"""
+
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+STYLE_JOBS_TABLE = 'jd_style_jobs'
+
+# 同一商品最多尝试几次（详情页确实没有款式的商品不会无限重试）
+MAX_ATTEMPTS = 3
+
+
+def enqueue_style_jobs(conn: sqlite3.Connection, jobs: Iterable[Tuple[int, str]]) -> int:
+    """新商品加入队列 [(商品表id, 详情页网址)]，已在队列里的跳过，返回新增任务数（不提交）"""
+    now = datetime.now().isoformat()
+    before = conn.total_changes
+    conn.executemany(f'''
+        INSERT INTO {STYLE_JOBS_TABLE} (product_row_id, product_url, status, updated_at)
+        VALUES (?, ?, 'pending', ?)
+        ON CONFLICT(product_row_id) DO NOTHING
+    ''', [(row_id, url, now) for row_id, url in jobs])
+    return conn.total_changes - before
+
+
+def requeue_style_jobs(conn: sqlite3.Connection) -> dict:
+    """启动时整理队列并提交：中断的任务放回 pending，缺款式名称的商品重新排队
+
+    返回 {'reset': 放回的 running 数, 'retried': 重试的 failed 数, 'added': 新加入队列的商品数}
+    """
+    now = datetime.now().isoformat()
+    reset = conn.execute(f'''
+        UPDATE {STYLE_JOBS_TABLE} SET status = 'pending', updated_at = ?
+        WHERE status = 'running'
+    ''', (now,)).rowcount
+    retried = conn.execute(f'''
+        UPDATE {STYLE_JOBS_TABLE} SET status = 'pending', updated_at = ?
+        WHERE status = 'failed' AND attempts < ?
+    ''', (now, MAX_ATTEMPTS)).rowcount
+    added = conn.execute(f'''
+        INSERT INTO {STYLE_JOBS_TABLE} (product_row_id, product_url, status, updated_at)
+        SELECT p.id, p.product_url, 'pending', ?
+        FROM jd_products p
+        WHERE p.status = 'available' AND (p.style_name IS NULL OR p.style_name = '')
+          AND p.product_url IS NOT NULL AND p.product_url != ''
+        ON CONFLICT(product_row_id) DO NOTHING
+    ''', (now,)).rowcount
+    conn.commit()
+    return {'reset': reset, 'retried': retried, 'added': added}
+
+
+def claim_style_job(conn: sqlite3.Connection) -> Optional[Tuple[int, str]]:
+    """取一个 pending 任务标记为 running 并提交，返回 (商品表id, 详情页网址)，没有任务返回 None
+
+    一条 UPDATE ... RETURNING 完成，多个进程/线程同时取不会拿到同一个任务。
+    """
+    row = conn.execute(f'''
+        UPDATE {STYLE_JOBS_TABLE}
+        SET status = 'running', attempts = attempts + 1, updated_at = ?
+        WHERE product_row_id = (
+            SELECT product_row_id FROM {STYLE_JOBS_TABLE}
+            WHERE status = 'pending' ORDER BY updated_at, product_row_id LIMIT 1
+        )
+        RETURNING product_row_id, product_url
+    ''', (datetime.now().isoformat(),)).fetchone()
+    conn.commit()
+    return (row[0], row[1]) if row else None
+
+
+def finish_style_job(conn: sqlite3.Connection, row_id: int, style_name: str = '',
+                     level: Optional[str] = None, error: Optional[str] = None):
+    """保存任务结果并提交：取到款式名称时写回商品和没有款式的价格历史，级别为空时补上 level"""
+    now = datetime.now().isoformat()
+    try:
+        if style_name:
+            conn.execute('''
+                UPDATE jd_products
+                SET style_name = ?, level = CASE WHEN IFNULL(level, '') = '' THEN ? ELSE level END, updated_at = ?
+                WHERE id = ?
+            ''', (style_name, level or '', now, row_id))
+            conn.execute('''
+                UPDATE jd_price_history SET style_name = ?
+                WHERE product_id = ? AND IFNULL(style_name, '') = ''
+            ''', (style_name, row_id))
+            conn.execute(f'''
+                UPDATE {STYLE_JOBS_TABLE} SET status = 'done', last_error = NULL, updated_at = ?
+                WHERE product_row_id = ?
+            ''', (now, row_id))
+        else:
+            conn.execute(f'''
+                UPDATE {STYLE_JOBS_TABLE} SET status = 'failed', last_error = ?, updated_at = ?
+                WHERE product_row_id = ?
+            ''', (error or 'NOT_FOUND', now, row_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def style_job_counts(conn: sqlite3.Connection) -> Dict[str, int]:
+    """各状态的任务数"""
+    return dict(conn.execute(f'SELECT status, COUNT(*) FROM {STYLE_JOBS_TABLE} GROUP BY status'))
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+
+    if command == 'check':
+        # 自检：内存数据库里模拟入队、领取、中断恢复、失败重试
+        conn = sqlite3.connect(':memory:')
+        conn.execute('PRAGMA foreign_keys = ON')
+        conn.execute('''CREATE TABLE jd_products (id INTEGER PRIMARY KEY, product_id TEXT, product_url TEXT,
+                        title TEXT, style_name TEXT, status TEXT, level TEXT DEFAULT '', updated_at DateTime)''')
+        conn.execute('CREATE TABLE jd_price_history (id INTEGER PRIMARY KEY, product_id INTEGER, style_name TEXT)')
+        conn.executemany('INSERT INTO jd_products (id, product_id, product_url, style_name, status) VALUES (?, ?, ?, ?, ?)',
+                         [(1, 'a', 'u1', '', 'available'), (2, 'b', 'u2', None, 'available'),
+                          (3, 'c', 'u3', '擎天柱', 'available'), (4, 'd', 'u4', '', 'pending')])
+        conn.execute("INSERT INTO jd_price_history (product_id, style_name) VALUES (1, '')")
+        conn.execute(f'''CREATE TABLE {STYLE_JOBS_TABLE} (product_row_id INTEGER PRIMARY KEY
+                        REFERENCES jd_products(id) ON DELETE CASCADE, product_url TEXT NOT NULL,
+                        status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0,
+                        last_error TEXT, updated_at DateTime)''')
+
+        assert enqueue_style_jobs(conn, [(1, 'u1')]) == 1
+        assert enqueue_style_jobs(conn, [(1, 'u1')]) == 0
+        conn.commit()
+        assert claim_style_job(conn) == (1, 'u1')
+        # 处理中退出，重启后放回 pending，商品 2 缺款式名称补进队列，3 已有款式、4 未上架不排队
+        assert requeue_style_jobs(conn) == {'reset': 1, 'retried': 0, 'added': 1}
+
+        claimed = [claim_style_job(conn), claim_style_job(conn), claim_style_job(conn)]
+        assert claimed == [(1, 'u1'), (2, 'u2'), None], claimed
+        finish_style_job(conn, 1, '威震天', level='领袖级')
+        finish_style_job(conn, 2, error='timeout')
+        assert conn.execute('SELECT style_name, level FROM jd_products WHERE id = 1').fetchone() == ('威震天', '领袖级')
+        assert conn.execute('SELECT style_name FROM jd_price_history').fetchone() == ('威震天',)
+        assert style_job_counts(conn) == {'done': 1, 'failed': 1}
+
+        # 失败的任务重启后重试，尝试满 MAX_ATTEMPTS 次后不再排队
+        for _ in range(MAX_ATTEMPTS - 1):
+            requeue_style_jobs(conn)
+            assert claim_style_job(conn) == (2, 'u2')
+            finish_style_job(conn, 2)
+        assert requeue_style_jobs(conn) == {'reset': 0, 'retried': 0, 'added': 0}
+        assert claim_style_job(conn) is None
+        conn.execute('DELETE FROM jd_products WHERE id = 2')
+        assert style_job_counts(conn) == {'done': 1}
+        print('✅ 款式任务队列：入队去重、领取、中断恢复、失败重试上限、删除商品级联正常')
+        sys.exit(0)
+
+    from database.db import get_connection
+    from database.migrations import migrate
+
+    conn = get_connection()
+    migrate(conn)
+    if command == 'requeue':
+        print(f"重新排队: {requeue_style_jobs(conn)}")
+    print(f"款式任务: {style_job_counts(conn)}")
+    conn.close()
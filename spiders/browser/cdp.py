@@ -0,0 +1,275 @@
+"""
+Chrome DevTools Protocol 客户端
+
+原来每执行一段 JS 都要写临时文件、起一个 shell 跑 osascript，滚动一页就是几十次进程启动。
+这里和浏览器保持一条 websocket 长连接，请求按 id 异步配对响应，事件（页面加载、网络响应）分发给监听函数。
+
+- CDPConnection：asyncio 连接，send() 等待对应 id 的响应
+- CDPBrowser：同步包装，事件循环跑在后台线程，爬虫代码按普通函数调用
+- CDPPage：一个标签页（flatten 模式的 session），evaluate() / navigate() / capture_responses()
+- ResponseCapture：记录标签页里网址匹配的网络响应体（Network 域），店铺接口的 JSON 直接拿来解析
+
+启动浏览器：chrome --remote-debugging-port=9222
+本地无浏览器自检：python -m spiders.browser.fake_cdp
+"""
+
+import asyncio
+import base64
+import itertools
+import json
+import re
+import threading
+import urllib.request
+from typing import Callable, Dict, Optional
+
+import websockets
+
+DEFAULT_ENDPOINT = 'http://127.0.0.1:9222'
+DEFAULT_TIMEOUT = 30
+
+
+class CDPError(Exception):
+    """CDP 返回错误或页面 JS 抛出异常"""
+
+
+def discover_ws_url(endpoint: str = DEFAULT_ENDPOINT, timeout: float = 5) -> str:
+    """从调试端口的 /json/version 取浏览器的 websocket 地址"""
+    with urllib.request.urlopen(f'{endpoint.rstrip("/")}/json/version', timeout=timeout) as resp:
+        return json.loads(resp.read())['webSocketDebuggerUrl']
+
+
+class CDPConnection:
+    """一条 CDP websocket 连接（在事件循环线程内使用）"""
+
+    def __init__(self, ws):
+        self._ws = ws
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._listeners: Dict[str, list] = {}
+        self._reader = asyncio.get_running_loop().create_task(self._read_loop())
+
+    @classmethod
+    async def open(cls, ws_url: str):
+        ws = await websockets.connect(ws_url, max_size=None)
+        return cls(ws)
+
+    async def send(self, method: str, params: Optional[dict] = None, session_id: Optional[str] = None,
+                   timeout: float = DEFAULT_TIMEOUT) -> dict:
+        """发送命令并等待响应，返回 result"""
+        message_id = next(self._ids)
+        message = {'id': message_id, 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        try:
+            await self._ws.send(json.dumps(message))
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(message_id, None)
+
+    def on(self, method: str, callback: Callable[[dict, Optional[str]], None]):
+        """监听事件：callback(params, session_id)，在事件循环线程里调用"""
+        self._listeners.setdefault(method, []).append(callback)
+
+    def off(self, method: str, callback):
+        if callback in self._listeners.get(method, []):
+            self._listeners[method].remove(callback)
+
+    async def _read_loop(self):
+        try:
+            async for raw in self._ws:
+                message = json.loads(raw)
+                if 'id' in message:
+                    future = self._pending.get(message['id'])
+                    if future and not future.done():
+                        if 'error' in message:
+                            future.set_exception(CDPError(message['error'].get('message', message['error'])))
+                        else:
+                            future.set_result(message.get('result', {}))
+                    continue
+                for callback in list(self._listeners.get(message.get('method'), [])):
+                    callback(message.get('params', {}), message.get('sessionId'))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(CDPError('连接已关闭'))
+
+    async def close(self):
+        await self._ws.close()
+        await self._reader
+
+
+class CDPBrowser:
+    """同步 CDP 客户端：一条长连接，事件循环在后台线程"""
+
+    def __init__(self, ws_url: Optional[str] = None, endpoint: str = DEFAULT_ENDPOINT,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='cdp-loop', daemon=True)
+        self._thread.start()
+        try:
+            self._conn = self.run(CDPConnection.open(ws_url or discover_ws_url(endpoint)))
+        except Exception:
+            self._stop_loop()
+            raise
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """在事件循环线程里执行协程并等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout or self.timeout + 5)
+
+    def send(self, method: str, params: Optional[dict] = None, session_id: Optional[str] = None,
+             timeout: Optional[float] = None) -> dict:
+        return self.run(self._conn.send(method, params, session_id, timeout or self.timeout), timeout)
+
+    def on(self, method: str, callback):
+        self._loop.call_soon_threadsafe(self._conn.on, method, callback)
+
+    def off(self, method: str, callback):
+        self._loop.call_soon_threadsafe(self._conn.off, method, callback)
+
+    def new_page(self, url: str = 'about:blank') -> 'CDPPage':
+        """新开一个标签页并附加 session"""
+        target_id = self.send('Target.createTarget', {'url': url})['targetId']
+        session_id = self.send('Target.attachToTarget', {'targetId': target_id, 'flatten': True})['sessionId']
+        page = CDPPage(self, target_id, session_id)
+        page.send('Page.enable')
+        page.send('Runtime.enable')
+        return page
+
+    def close(self):
+        try:
+            self.run(self._conn.close(), timeout=5)
+        except Exception:
+            pass
+        self._stop_loop()
+
+    def _stop_loop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+
+class CDPPage:
+    """一个标签页"""
+
+    def __init__(self, browser: CDPBrowser, target_id: str, session_id: str):
+        self.browser = browser
+        self.target_id = target_id
+        self.session_id = session_id
+
+    def send(self, method: str, params: Optional[dict] = None, timeout: Optional[float] = None) -> dict:
+        return self.browser.send(method, params, self.session_id, timeout)
+
+    def evaluate(self, expression: str, await_promise: bool = False, timeout: Optional[float] = None):
+        """执行 JS，返回表达式的值（按值序列化），JS 异常抛 CDPError"""
+        result = self.send('Runtime.evaluate', {
+            'expression': expression,
+            'returnByValue': True,
+            'awaitPromise': await_promise,
+        }, timeout)
+        if 'exceptionDetails' in result:
+            details = result['exceptionDetails']
+            text = details.get('exception', {}).get('description') or details.get('text', 'JS 异常')
+            raise CDPError(text)
+        return result.get('result', {}).get('value')
+
+    def navigate(self, url: str, wait_load: bool = True, timeout: Optional[float] = None):
+        """打开网址，默认等到 load 事件"""
+        timeout = timeout or self.browser.timeout
+        self.browser.run(self._navigate(url, wait_load, timeout), timeout + 5)
+
+    async def _navigate(self, url, wait_load, timeout):
+        conn = self.browser._conn
+        loaded = asyncio.Event()
+
+        def on_load(params, session_id):
+            if session_id == self.session_id:
+                loaded.set()
+
+        conn.on('Page.loadEventFired', on_load)
+        try:
+            result = await conn.send('Page.navigate', {'url': url}, self.session_id, timeout)
+            if result.get('errorText'):
+                raise CDPError(f"打开失败: {result['errorText']}")
+            if wait_load:
+                await asyncio.wait_for(loaded.wait(), timeout)
+        finally:
+            conn.off('Page.loadEventFired', on_load)
+
+    def capture_responses(self, pattern: str) -> 'ResponseCapture':
+        """开始记录网址匹配 pattern（正则）的响应，要在 navigate() 之前调用"""
+        capture = ResponseCapture(self, pattern)
+        capture.start()
+        return capture
+
+    def close(self):
+        try:
+            self.browser.send('Target.closeTarget', {'targetId': self.target_id})
+        except CDPError:
+            pass
+
+
+class ResponseCapture:
+    """记录一个标签页里网址匹配的网络响应
+
+    Network.responseReceived 记下匹配的请求，Network.loadingFinished 后用 Network.getResponseBody 取回响应体
+    （都在事件循环线程里异步完成，不阻塞读循环）。responses() 等已开始的取回完成后返回 [{'url', 'status', 'mime', 'body'}]。
+    """
+
+    def __init__(self, page: CDPPage, pattern: str):
+        self.page = page
+        self.pattern = re.compile(pattern)
+        self._matched = {}  # requestId -> 响应信息
+        self._tasks = []
+        self._bodies = []
+
+    def start(self):
+        self.page.send('Network.enable')
+        self.page.browser.on('Network.responseReceived', self._on_response)
+        self.page.browser.on('Network.loadingFinished', self._on_finished)
+
+    def _on_response(self, params, session_id):
+        response = params.get('response', {})
+        if session_id == self.page.session_id and self.pattern.search(response.get('url', '')):
+            self._matched[params['requestId']] = {
+                'url': response['url'], 'status': response.get('status'), 'mime': response.get('mimeType', ''),
+            }
+
+    def _on_finished(self, params, session_id):
+        if session_id == self.page.session_id and params.get('requestId') in self._matched:
+            info = self._matched.pop(params['requestId'])
+            self._tasks.append(asyncio.get_running_loop().create_task(self._fetch(params['requestId'], info)))
+
+    async def _fetch(self, request_id, info):
+        conn = self.page.browser._conn
+        try:
+            result = await conn.send('Network.getResponseBody', {'requestId': request_id}, self.page.session_id)
+        except (CDPError, asyncio.TimeoutError):
+            return
+        body = result.get('body', '')
+        if result.get('base64Encoded'):
+            body = base64.b64decode(body).decode('utf-8', errors='replace')
+        self._bodies.append(dict(info, body=body))
+
+    def responses(self, timeout: Optional[float] = None) -> list:
+        """已完成的匹配响应（等正在取回的响应体完成）"""
+        async def settle():
+            # 事件和取回任务都在事件循环线程里，先让已收到的事件处理完
+            await asyncio.sleep(0)
+            if self._tasks:
+                await asyncio.wait(list(self._tasks), timeout=timeout or self.page.browser.timeout)
+
+        self.page.browser.run(settle(), timeout)
+        return list(self._bodies)
+
+    def stop(self):
+        self.page.browser.off('Network.responseReceived', self._on_response)
+        self.page.browser.off('Network.loadingFinished', self._on_finished)
+        try:
+            self.page.send('Network.disable')
+        except CDPError:
+            pass
@@ -0,0 +1,402 @@
+"""
+浏览器驱动
+
+爬虫只通过 BrowserDriver 的几个方法操作浏览器：open / run_js / scroll_by / close / quit，后端可换：
+
+- safari：原来的 Safari + osascript（macOS）
+- cdp：Chrome DevTools Protocol 长连接（spiders/browser/cdp.py），Linux 采集机上用无头 Chrome
+- replay：离线回放录制好的 JS 结果（fixture），不需要浏览器，测试和基准用
+
+SPIDER_RECORD=<文件> 时在所选后端外面包一层录制，把每次 JS 的结果（和抓到的接口响应）存成 replay 用的 fixture。
+
+run_js() 统一返回字符串（和 osascript 一致）：JS 返回 undefined/null 时为 "OK"，出错时为 "ERROR:..."。
+"""
+
+import hashlib
+import json
+import os
+import re
+import subprocess
+import tempfile
+import time
+from typing import Dict, Optional
+
+from config import SpiderConfig
+
+# 登录页的特征文字
+LOGIN_MARKERS = ('密码登录', '短信登录', '扫码登录')
+
+IS_LOGIN_PAGE_JS = '''(function() {
+    var text = document.body ? document.body.innerText || "" : "";
+    var markers = %s;
+    for (var i = 0; i < markers.length; i++) { if (text.indexOf(markers[i]) > -1) return true; }
+    return false;
+})()''' % json.dumps(LOGIN_MARKERS, ensure_ascii=False)
+
+
+def to_text(value) -> str:
+    """JS 返回值 -> osascript 风格的字符串"""
+    if value is None:
+        return 'OK'
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (int, float)):
+        return str(value)
+    return json.dumps(value, ensure_ascii=False)
+
+
+class BrowserDriver:
+    """浏览器驱动接口"""
+
+    name = ''
+    # 能否同时开多个标签页并行爬取
+    supports_tabs = False
+
+    def open(self, url: str):
+        """在当前标签页打开网址（不等待加载完成）"""
+        raise NotImplementedError
+
+    def run_js(self, js: str) -> str:
+        """执行 JS，返回字符串结果"""
+        raise NotImplementedError
+
+    def close(self):
+        """关闭当前标签页/窗口"""
+
+    def quit(self):
+        """结束会话（关闭所有窗口/断开连接）"""
+
+    def new_tab(self) -> 'BrowserDriver':
+        """新开一个标签页，返回操作它的驱动"""
+        raise NotImplementedError(f'{self.name} 不支持多标签页')
+
+    def capture_responses(self, pattern: str):
+        """开始记录下一次 open() 的页面里网址匹配 pattern 的网络响应（在 open 之前调用）
+
+        返回带 responses() / stop() 的对象，responses() 为 [{'url', 'body', ...}]；不支持抓包的驱动返回 None
+        """
+        return None
+
+    def current_url(self) -> str:
+        return self.run_js('document.URL')
+
+    def scroll_by(self, dy: int) -> str:
+        return self.run_js(f'window.scrollBy(0, {int(dy)})')
+
+    def scroll_to(self, y: int) -> str:
+        return self.run_js(f'window.scrollTo(0, {int(y)})')
+
+    def is_login_page(self) -> bool:
+        return self.run_js(IS_LOGIN_PAGE_JS) == 'true'
+
+
+class SafariDriver(BrowserDriver):
+    """Safari + osascript：每次 JS 写临时文件、起一个 osascript 进程"""
+
+    name = 'safari'
+
+    def __init__(self, script_path: Optional[str] = None, timeout: float = 60):
+        if script_path is None:
+            # 每个驱动一个临时文件，两个爬虫同时跑不会互相覆盖脚本
+            fd, script_path = tempfile.mkstemp(prefix='spider_', suffix='.js')
+            os.close(fd)
+        self.script_path = script_path
+        self.timeout = timeout
+
+    def _osascript(self, script: str):
+        return subprocess.run(['osascript', '-e', script], capture_output=True, text=True, timeout=self.timeout)
+
+    def open(self, url: str):
+        # 确保Safari已打开，在新窗口打开网址（后续 JS 都在最前面的窗口执行）
+        subprocess.run(['open', '-a', 'Safari'])
+        self._osascript(f'tell application "Safari" to make new document with properties {{URL:"{url}"}}')
+
+    def run_js(self, js: str) -> str:
+        with open(self.script_path, 'w') as f:
+            f.write(js)
+
+        cmd = f'''osascript <<'AS'
+tell application "Safari"
+    set jsFile to "{self.script_path}"
+    set js to do shell script "cat " & quoted form of jsFile
+    try
+        set theResult to do JavaScript js in current tab of front window
+        if theResult is missing value then
+            return "OK"
+        else
+            return theResult
+        end if
+    on error errMsg
+        return "ERROR:" & errMsg
+    end try
+end tell
+AS'''
+        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=self.timeout)
+        return result.stdout.strip()
+
+    def close(self):
+        self._osascript('tell application "Safari" to close front window')
+
+    def quit(self):
+        self._osascript('tell application "Safari" to close every window')
+
+    def new_tab(self) -> 'SafariDriver':
+        # osascript 只能操作最前面的窗口，新“标签页”就是下一次 open 出来的新窗口，不能并行
+        return SafariDriver(self.script_path, self.timeout)
+
+
+class CDPDriver(BrowserDriver):
+    """Chrome DevTools Protocol：一条 websocket 长连接，每个驱动对应一个标签页
+
+    和 Safari 一样，open() 时才建标签页，close() 关掉后下一次 open() 再新建。
+    """
+
+    name = 'cdp'
+    supports_tabs = True
+
+    def __init__(self, browser=None, ws_url: Optional[str] = None, endpoint: Optional[str] = None,
+                 timeout: float = 30):
+        from spiders.browser.cdp import CDPBrowser
+
+        self._owns_browser = browser is None
+        self.browser = browser or CDPBrowser(ws_url, endpoint or SpiderConfig.CDP_ENDPOINT, timeout)
+        self.page = None
+
+    def _ensure_page(self):
+        if self.page is None:
+            self.page = self.browser.new_page()
+        return self.page
+
+    def open(self, url: str):
+        self._ensure_page().navigate(url, wait_load=False)
+
+    def capture_responses(self, pattern: str):
+        return self._ensure_page().capture_responses(pattern)
+
+    def run_js(self, js: str) -> str:
+        from spiders.browser.cdp import CDPError
+
+        if self.page is None:
+            return 'ERROR:没有打开的页面'
+        try:
+            return to_text(self.page.evaluate(js))
+        except CDPError as e:
+            return f'ERROR:{e}'
+
+    def close(self):
+        if self.page is not None:
+            self.page.close()
+            self.page = None
+
+    def quit(self):
+        self.close()
+        if self._owns_browser:
+            self.browser.close()
+
+    def new_tab(self) -> 'CDPDriver':
+        return CDPDriver(browser=self.browser)
+
+
+def script_key(js: str) -> str:
+    """fixture 里脚本的键：内容哈希（脚本很长，不直接当键）"""
+    return hashlib.sha1(js.encode('utf-8')).hexdigest()[:16]
+
+
+class ReplayDriver(BrowserDriver):
+    """离线回放：按 (网址, 脚本) 依次返回录制的结果
+
+    fixture 格式：{"pages": {网址: {脚本键: {"script": 脚本开头, "results": [结果, ...]}}},
+                   "responses": {网址: [{"url": 接口网址, "body": 响应体}, ...]}}
+    同一脚本多次执行时依次返回 results，用完后一直返回最后一个（模拟滚动加载到底）。
+    网址不在 fixture 里时使用 "*" 页。responses 是打开该网址时抓到的接口响应（capture_responses 回放）。
+    """
+
+    name = 'replay'
+    supports_tabs = True
+
+    def __init__(self, fixture, delay: float = 0):
+        if isinstance(fixture, str):
+            with open(fixture, encoding='utf-8') as f:
+                fixture = json.load(f)
+        self.fixture = fixture
+        self.delay = delay  # 每次 JS 模拟的耗时（秒）
+        self.url = 'about:blank'
+        self.calls = []
+        self._positions: Dict[str, int] = {}
+
+    def open(self, url: str):
+        self.url = url
+        self._positions = {}
+
+    def run_js(self, js: str) -> str:
+        if self.delay:
+            time.sleep(self.delay)
+        self.calls.append((self.url, js))
+        if js == 'document.URL':
+            return self.url
+        key = script_key(js)
+        pages = self.fixture.get('pages', {})
+        entry = pages.get(self.url, {}).get(key) or pages.get('*', {}).get(key)
+        if entry is None:
+            return 'ERROR:replay: 未录制的脚本'
+        results = entry['results']
+        position = self._positions.get(key, 0)
+        self._positions[key] = position + 1
+        return results[min(position, len(results) - 1)]
+
+    def new_tab(self) -> 'ReplayDriver':
+        return ReplayDriver(self.fixture, self.delay)
+
+    def capture_responses(self, pattern: str):
+        return RecordedCapture(self, pattern)
+
+
+class RecordedCapture:
+    """回放 fixture 里录制的接口响应：返回 open() 之后页面的匹配响应"""
+
+    def __init__(self, driver: ReplayDriver, pattern: str):
+        self.driver = driver
+        self.pattern = re.compile(pattern)
+
+    def responses(self, timeout: Optional[float] = None) -> list:
+        recorded = self.driver.fixture.get('responses', {}).get(self.driver.url, [])
+        return [r for r in recorded if self.pattern.search(r['url'])]
+
+    def stop(self):
+        pass
+
+
+class RecordingDriver(BrowserDriver):
+    """录制：转发给真实驱动，把结果存成 ReplayDriver 的 fixture"""
+
+    def __init__(self, inner: BrowserDriver, path: str, fixture: Optional[dict] = None):
+        self.inner = inner
+        self.path = path
+        self.name = f'{inner.name}+record'
+        self.supports_tabs = inner.supports_tabs
+        self.fixture = fixture if fixture is not None else {'pages': {}}
+        self.url = 'about:blank'
+
+    def open(self, url: str):
+        self.url = url
+        self.inner.open(url)
+
+    def run_js(self, js: str) -> str:
+        result = self.inner.run_js(js)
+        page = self.fixture['pages'].setdefault(self.url, {})
+        entry = page.setdefault(script_key(js), {'script': js[:80], 'results': []})
+        entry['results'].append(result)
+        return result
+
+    def close(self):
+        self.inner.close()
+
+    def quit(self):
+        self.inner.quit()
+        self.save()
+
+    def new_tab(self) -> 'RecordingDriver':
+        return RecordingDriver(self.inner.new_tab(), self.path, self.fixture)
+
+    def capture_responses(self, pattern: str):
+        capture = self.inner.capture_responses(pattern)
+        return capture and RecordingCapture(self, capture)
+
+    def save(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.fixture, f, ensure_ascii=False, indent=1)
+        print(f"💾 已录制 {sum(len(p) for p in self.fixture['pages'].values())} 个脚本结果: {self.path}")
+
+
+class RecordingCapture:
+    """转发抓包结果，同时按页面网址存进 fixture 的 responses"""
+
+    def __init__(self, driver: RecordingDriver, inner):
+        self.driver = driver
+        self.inner = inner
+
+    def responses(self, timeout: Optional[float] = None) -> list:
+        responses = self.inner.responses(timeout)
+        recorded = self.driver.fixture.setdefault('responses', {})
+        recorded[self.driver.url] = [{'url': r['url'], 'body': r['body']} for r in responses]
+        return responses
+
+    def stop(self):
+        self.inner.stop()
+
+
+def create_driver(name: Optional[str] = None, **kwargs) -> BrowserDriver:
+    """按名称创建驱动，默认取 SpiderConfig.BROWSER_DRIVER（环境变量 SPIDER_DRIVER）"""
+    name = name or SpiderConfig.BROWSER_DRIVER
+    if name == 'safari':
+        driver = SafariDriver(**kwargs)
+    elif name == 'cdp':
+        driver = CDPDriver(**kwargs)
+    elif name == 'replay':
+        driver = ReplayDriver(kwargs.pop('fixture', None) or SpiderConfig.REPLAY_FIXTURE, **kwargs)
+    else:
+        raise ValueError(f'未知浏览器驱动: {name}')
+
+    record_path = os.environ.get('SPIDER_RECORD')
+    if record_path:
+        driver = RecordingDriver(driver, record_path)
+    return driver
+
+
+if __name__ == '__main__':
+    # 自检：假 CDP 服务上用 cdp 驱动跑一遍并录制，再用 replay 驱动回放，结果应一致
+    import tempfile as _tempfile
+
+    from spiders.browser.fake_cdp import FakeCDPServer
+
+    def evaluate(expression, url):
+        if expression == 'document.URL':
+            return url
+        if expression == IS_LOGIN_PAGE_JS:
+            return 'login' in url
+        if expression.startswith('window.scroll'):
+            return None
+        if expression.startswith('items'):
+            return [{'id': url.rsplit('=', 1)[-1], 'price': 99.5}]
+        if expression.startswith('count'):
+            return 3.0
+        raise ValueError('unknown script')
+
+    scripts = ['document.URL', 'window.scrollBy(0, 500)', 'items', 'count', 'oops', IS_LOGIN_PAGE_JS]
+    urls = ['https://example.com/list?page=1', 'https://example.com/login?page=2']
+
+    server = FakeCDPServer(evaluate)
+    ws_url = server.start()
+    record_path = os.path.join(_tempfile.mkdtemp(), 'fixture.json')
+    driver = RecordingDriver(create_driver('cdp', ws_url=ws_url, timeout=5), record_path)
+    live = []
+    for url in urls:
+        driver.open(url)
+        live.append([driver.run_js(js) for js in scripts])
+        driver.close()
+    tab = driver.new_tab()
+    tab.open(urls[0])
+    live.append([tab.run_js('count')])
+    tab.close()
+    driver.quit()
+    server.stop()
+
+    assert live[0][:5] == [urls[0], 'OK', '[{"id": "1", "price": 99.5}]', '3', live[0][4]]
+    assert live[0][4].startswith('ERROR:') and 'unknown script' in live[0][4]
+    assert (live[0][5], live[1][5]) == ('false', 'true')
+
+    replay = create_driver('replay', fixture=record_path)
+    replayed = []
+    for url in urls:
+        replay.open(url)
+        replayed.append([replay.run_js(js) for js in scripts])
+    replay_tab = replay.new_tab()
+    replay_tab.open(urls[0])
+    replayed.append([replay_tab.run_js('count')])
+    assert replayed == live, (replayed, live)
+    assert replay.run_js('never recorded').startswith('ERROR:')
+    print('✅ cdp 驱动、录制、replay 回放结果一致')
@@ -0,0 +1,188 @@
+"""
+本地假 CDP 服务（无浏览器测试用）
+
+在 websocket 上按 CDP 协议应答 spiders/browser/cdp.py 用到的命令：
+Target.createTarget / attachToTarget / closeTarget、Page.navigate（随后发 Page.loadEventFired）、
+Runtime.evaluate、Network.getResponseBody、各 domain 的 enable。JS 不真正执行，由 evaluate(expression, url) 回调给出结果；
+responses(url) 回调给出打开页面时的网络响应 [(网址, mimeType, 响应体)]，在 load 事件之前按 Network 事件发出。
+
+自检 + 往返耗时：python -m spiders.browser.fake_cdp
+"""
+
+import asyncio
+import base64
+import itertools
+import json
+import threading
+from typing import Callable, Optional
+
+import websockets
+
+
+class FakeCDPServer:
+    """假 CDP 服务，start() 返回 websocket 地址"""
+
+    def __init__(self, evaluate: Optional[Callable[[str, str], object]] = None,
+                 host: str = '127.0.0.1', port: int = 0, responses: Optional[Callable[[str], list]] = None):
+        self.evaluate = evaluate or (lambda expression, url: None)
+        self.responses = responses or (lambda url: [])
+        self.bodies = {}  # requestId -> 响应体
+        self.host = host
+        self.port = port
+        self.calls = []  # (method, params)
+        self.targets = {}  # target_id -> 当前网址
+        self.sessions = {}  # session_id -> target_id
+        self._ids = itertools.count(1)
+        self._loop = None
+        self._thread = None
+        self._server = None
+
+    def start(self) -> str:
+        ready = threading.Event()
+
+        async def serve():
+            return await websockets.serve(self._handle, self.host, self.port)
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(serve())
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name='fake-cdp', daemon=True)
+        self._thread.start()
+        if not ready.wait(5):
+            raise RuntimeError('假 CDP 服务启动失败')
+        return f'ws://{self.host}:{self.port}/devtools/browser/fake'
+
+    def stop(self):
+        async def shutdown():
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+
+    def emit(self, ws, method, params, session_id=None):
+        """发事件（在服务线程里调用）"""
+        message = {'method': method, 'params': params}
+        if session_id:
+            message['sessionId'] = session_id
+        return ws.send(json.dumps(message))
+
+    async def _handle(self, ws, *args):
+        async for raw in ws:
+            message = json.loads(raw)
+            method = message.get('method')
+            params = message.get('params', {})
+            session_id = message.get('sessionId')
+            self.calls.append((method, params))
+            events = []
+            try:
+                result = self._dispatch(method, params, session_id, events)
+                reply = {'id': message['id'], 'result': result}
+            except KeyError as e:
+                reply = {'id': message['id'], 'error': {'code': -32601, 'message': f'{method}: {e}'}}
+            if session_id:
+                reply['sessionId'] = session_id
+            await ws.send(json.dumps(reply))
+            for event_method, event_params in events:
+                await self.emit(ws, event_method, event_params, session_id)
+
+    def _dispatch(self, method, params, session_id, events):
+        if method == 'Target.createTarget':
+            target_id = f'target-{next(self._ids)}'
+            self.targets[target_id] = params.get('url', 'about:blank')
+            return {'targetId': target_id}
+        if method == 'Target.attachToTarget':
+            session_id = f'session-{next(self._ids)}'
+            self.sessions[session_id] = params['targetId']
+            return {'sessionId': session_id}
+        if method == 'Target.closeTarget':
+            self.targets.pop(params['targetId'], None)
+            return {'success': True}
+        if method == 'Browser.getVersion':
+            return {'product': 'FakeCDP/1.0', 'protocolVersion': '1.3'}
+        if method.endswith('.enable') or method.endswith('.disable'):
+            return {}
+
+        target_id = self.sessions[session_id]
+        if method == 'Page.navigate':
+            self.targets[target_id] = params['url']
+            for url, mime, body in self.responses(params['url']):
+                request_id = f'request-{next(self._ids)}'
+                self.bodies[request_id] = body
+                events.append(('Network.responseReceived', {
+                    'requestId': request_id, 'type': 'XHR',
+                    'response': {'url': url, 'status': 200, 'mimeType': mime},
+                }))
+                events.append(('Network.loadingFinished', {'requestId': request_id}))
+            events.append(('Page.loadEventFired', {'timestamp': 0}))
+            return {'frameId': target_id}
+        if method == 'Network.getResponseBody':
+            body = self.bodies[params['requestId']]
+            if isinstance(body, bytes):
+                return {'body': base64.b64encode(body).decode('ascii'), 'base64Encoded': True}
+            return {'body': body, 'base64Encoded': False}
+        if method == 'Runtime.evaluate':
+            try:
+                value = self.evaluate(params['expression'], self.targets[target_id])
+            except Exception as e:
+                return {'result': {'type': 'object', 'subtype': 'error'},
+                        'exceptionDetails': {'text': 'Uncaught', 'exception': {'description': f'Error: {e}'}}}
+            return {'result': {'type': type(value).__name__, 'value': value}}
+        raise KeyError('method not found')
+
+
+if __name__ == '__main__':
+    import os
+    import subprocess
+    import tempfile
+    import time
+
+    from spiders.browser.cdp import CDPBrowser, CDPError
+
+    def evaluate(expression, url):
+        if expression == 'document.URL':
+            return url
+        if expression.startswith('throw'):
+            raise ValueError('boom')
+        return len(expression)
+
+    server = FakeCDPServer(evaluate)
+    ws_url = server.start()
+    browser = CDPBrowser(ws_url, timeout=5)
+    page = browser.new_page()
+    page.navigate('https://example.com/list?page=1')
+    assert page.evaluate('document.URL') == 'https://example.com/list?page=1'
+    assert page.evaluate('window.scrollBy(0, 500)') == len('window.scrollBy(0, 500)')
+    try:
+        page.evaluate('throw new Error()')
+        raise AssertionError('JS 异常没有抛出')
+    except CDPError as e:
+        assert 'boom' in str(e)
+    print('✅ 假 CDP 服务：打开页面、执行 JS、异常传递正常')
+
+    rounds = 500
+    start = time.perf_counter()
+    for _ in range(rounds):
+        page.evaluate('window.scrollBy(0, 500)')
+    cdp_ms = (time.perf_counter() - start) / rounds * 1000
+    page.close()
+    browser.close()
+    server.stop()
+
+    # 对照：原来每段 JS 写临时文件 + 起 shell（不含 osascript/AppleScript 自身的启动，只是下限）
+    js_path = os.path.join(tempfile.mkdtemp(), 'spider.js')
+    rounds_spawn = 50
+    start = time.perf_counter()
+    for _ in range(rounds_spawn):
+        with open(js_path, 'w') as f:
+            f.write('window.scrollBy(0, 500)')
+        subprocess.run(f'cat {js_path}', shell=True, capture_output=True, text=True)
+    spawn_ms = (time.perf_counter() - start) / rounds_spawn * 1000
+    print(f'   长连接 Runtime.evaluate: {cdp_ms:8.3f} ms/次')
+    print(f'   临时文件 + shell 进程:   {spawn_ms:8.3f} ms/次（osascript 实际更慢）')
@@ -0,0 +1,326 @@
+"""
+页面加载：等待就绪、滚动加载
+
+- wait_until_ready()：打开页面后原来固定睡 30 + 15 秒。现在按指数间隔轮询
+  document.readyState、商品元素是否出现、有没有登录页/滑块验证，就绪立即返回，timeout 是上限。
+- scroll_until_stable()：列表页的商品和图片是滚动到附近才懒加载的。原来固定滚 N 步、每步睡 1.5 秒：
+  短页面白等，长页面还可能没滚到底。现在每步滚一屏，每次滚动后用一段 JS 读商品数、已加载图片数、页面高度；
+  滚到底且这几个数在 quiet 秒内都不再变化就停，max_steps / max_seconds 是硬上限。
+
+自检 + 和固定等待的耗时对比：python -m spiders.browser.loading
+"""
+
+import json
+import time
+from typing import Callable, Optional
+
+from spiders.browser.driver import LOGIN_MARKERS
+
+# 滑块验证（淘宝/天猫 nc 滑块、baxia 弹窗，京东拼图验证）
+SLIDER_SELECTORS = ('#nc_1_n1z', '.nc-container', '#baxia-dialog-content', '.JDJRV-slide-bg')
+SLIDER_MARKERS = ('滑动验证', '请按住滑块', '拖动下方拼图')
+
+# 页面状态：readyState、商品数、是否还是打开前的旧页面、登录/滑块
+READY_JS = '''(function(selector, loginMarkers, sliderSelectors, sliderMarkers) {
+    var text = document.body ? document.body.innerText || "" : "";
+    function hasText(markers) {
+        for (var i = 0; i < markers.length; i++) { if (text.indexOf(markers[i]) > -1) return true; }
+        return false;
+    }
+    var wall = "";
+    for (var i = 0; i < sliderSelectors.length && !wall; i++) {
+        if (document.querySelector(sliderSelectors[i])) wall = "slider";
+    }
+    if (!wall && hasText(sliderMarkers)) wall = "slider";
+    if (!wall && hasText(loginMarkers)) wall = "login";
+    return JSON.stringify({ready_state: document.readyState, items: document.querySelectorAll(selector).length,
+                           stale: !!window.__spiderStale || document.URL === "about:blank", wall: wall});
+})(%s)'''
+
+# 标记当前页面为旧页面，新页面加载后这个变量自然消失
+MARK_STALE_JS = 'window.__spiderStale = true'
+
+WALL_NAMES = {'login': '登录页', 'slider': '滑块验证'}
+
+# 商品数、商品里已加载完的图片数、页面高度、滚动位置、视口高度
+PROBE_JS = '''(function(selector) {
+    var items = document.querySelectorAll(selector);
+    var images = 0;
+    for (var i = 0; i < items.length; i++) {
+        var imgs = items[i].querySelectorAll("img");
+        for (var j = 0; j < imgs.length; j++) {
+            var img = imgs[j];
+            if (img.complete && img.naturalWidth > 1 && img.currentSrc.indexOf("data:") !== 0) images++;
+        }
+    }
+    var root = document.scrollingElement || document.documentElement;
+    return JSON.stringify({items: items.length, images: images, height: root.scrollHeight,
+                           y: window.scrollY, viewport: window.innerHeight});
+})(%s)'''
+
+# 视口高度取不到时每步滚动的像素
+DEFAULT_JUMP = 800
+
+
+def _parse(result: str) -> Optional[dict]:
+    try:
+        return json.loads(result)
+    except (TypeError, ValueError):
+        return None
+
+
+def page_state(driver, selector: str) -> Optional[dict]:
+    """读一次页面就绪状态，JS 出错返回 None"""
+    args = [selector, list(LOGIN_MARKERS), list(SLIDER_SELECTORS), list(SLIDER_MARKERS)]
+    return _parse(driver.run_js(READY_JS % ', '.join(json.dumps(a, ensure_ascii=False) for a in args)))
+
+
+def probe(driver, selector: str) -> Optional[dict]:
+    """读一次页面加载状态，JS 出错返回 None"""
+    return _parse(driver.run_js(PROBE_JS % json.dumps(selector)))
+
+
+def wait_until_ready(driver, selector: str, timeout: float = 45, first_interval: float = 0.25,
+                     max_interval: float = 3.0, sleep: Callable[[float], None] = time.sleep,
+                     clock: Callable[[], float] = time.monotonic, done: Optional[Callable[[], bool]] = None) -> dict:
+    """轮询到页面就绪：不是旧页面、readyState 不是 loading、selector 至少有一个、没有登录页/滑块
+
+    轮询间隔从 first_interval 起每次乘 1.6，最长 max_interval；遇到登录页/滑块继续等（Safari 里可以手动处理），
+    直到 timeout。done 是额外的就绪条件（如已经抓到接口数据），返回 True 时页面没渲染完也立即返回就绪。
+    返回 {'ready': 是否就绪, 'seconds': 等待时间, 'polls': 轮询次数, 'items': 商品数,
+          'blocker': 未就绪的原因（'' / 'loading' / 'empty' / 'login' / 'slider' / 'error'）}
+    """
+    start = clock()
+    interval = first_interval
+    polls = 0
+    warned = False
+    while True:
+        state = page_state(driver, selector)
+        polls += 1
+        if state is None:
+            blocker = 'error'
+        elif state['stale'] or state['ready_state'] == 'loading':
+            blocker = 'loading'
+        elif state['wall']:
+            blocker = state['wall']
+        elif not state['items']:
+            blocker = 'empty'
+        else:
+            blocker = ''
+        if blocker and done is not None and done():
+            blocker = ''
+
+        if blocker in WALL_NAMES and not warned:
+            print(f"   ⚠️ 检测到{WALL_NAMES[blocker]}，等待处理（最多 {timeout:.0f} 秒）...")
+            warned = True
+
+        elapsed = clock() - start
+        if not blocker or elapsed >= timeout:
+            # 旧页面的商品数不算（done 提前返回时页面可能还没切换）
+            items = state['items'] if state and not state['stale'] else 0
+            return {'ready': not blocker, 'seconds': round(elapsed, 1), 'polls': polls,
+                    'items': items, 'blocker': blocker}
+        sleep(min(interval, max(timeout - elapsed, 0)))
+        interval = min(interval * 1.6, max_interval)
+
+
+def open_page(driver, url: str, selector: str, timeout: float = 45, **kwargs) -> dict:
+    """打开网址并等待就绪（先把当前页面标记为旧页面，避免新页面还没开始加载就读到旧页面的商品）"""
+    driver.run_js(MARK_STALE_JS)
+    driver.open(url)
+    return wait_until_ready(driver, selector, timeout, **kwargs)
+
+
+def format_wait(report: dict) -> str:
+    """一行等待报告"""
+    if report['ready']:
+        return f"就绪，等待 {report['seconds']} 秒（轮询 {report['polls']} 次，商品 {report['items']}）"
+    reason = WALL_NAMES.get(report['blocker'], {'loading': '页面未加载完', 'empty': '没有商品',
+                                                 'error': '页面脚本出错'}.get(report['blocker']))
+    return f"未就绪（{reason}），等待 {report['seconds']} 秒"
+
+
+def scroll_until_stable(driver, selector: str, max_steps: int = 60, max_seconds: float = 120,
+                        quiet: float = 2.0, interval: float = 0.6, back_to_top: bool = False,
+                        sleep: Callable[[float], None] = time.sleep,
+                        clock: Callable[[], float] = time.monotonic) -> dict:
+    """一屏一屏往下滚，直到滚到底且商品数、图片数、页面高度 quiet 秒不变
+
+    selector: 商品元素选择器（天猫 [data-id]，京东 .jItem）
+    interval: 每次滚动/检查之间的等待
+    back_to_top: 结束后滚回顶部
+    返回 {'steps': 滚动次数, 'seconds': 耗时, 'items', 'images', 'stable': 是否正常稳定（False 为达到上限）}
+    """
+    start = clock()
+    steps = 0
+    last = None
+    changed_at = start
+    stable = False
+    state = None
+
+    driver.scroll_to(0)
+    while True:
+        state = probe(driver, selector)
+        now = clock()
+        key = (state['items'], state['images'], state['height']) if state else None
+        if key is None or key != last:
+            last = key
+            changed_at = now
+
+        at_bottom = bool(state) and state['y'] + state['viewport'] >= state['height'] - 2
+        if at_bottom and now - changed_at >= quiet:
+            stable = True
+            break
+        if steps >= max_steps or now - start >= max_seconds:
+            break
+
+        if not at_bottom:
+            jump = int(state['viewport'] * 0.9) if state and state['viewport'] else DEFAULT_JUMP
+            result = driver.scroll_by(jump)
+            if result.startswith('ERROR'):
+                print(f"      ⚠️ 滚动失败: {result}")
+            steps += 1
+        sleep(interval)
+
+    if back_to_top:
+        driver.scroll_to(0)
+    return {
+        'steps': steps,
+        'seconds': round(clock() - start, 1),
+        'items': state['items'] if state else 0,
+        'images': state['images'] if state else 0,
+        'stable': stable,
+    }
+
+
+def format_report(report: dict) -> str:
+    """一行滚动报告"""
+    reason = '已稳定' if report['stable'] else '达到上限'
+    return (f"滚动 {report['steps']} 步 / {report['seconds']} 秒，"
+            f"商品 {report['items']}，图片 {report['images']}（{reason}）")
+
+
+if __name__ == '__main__':
+    from spiders.browser.driver import BrowserDriver
+
+    class FakeClock:
+        def __init__(self):
+            self.now = 0.0
+
+        def sleep(self, seconds):
+            self.now += seconds
+
+        def __call__(self):
+            return self.now
+
+    class LazyListDriver(BrowserDriver):
+        """模拟懒加载列表：滚到离底部一屏以内时再加载一批商品，图片进视口 1 秒后加载完"""
+
+        name = 'lazy'
+
+        def __init__(self, clock, total, batch=20, row_height=100, viewport=900):
+            self.clock = clock
+            self.total = total
+            self.batch = batch
+            self.row_height = row_height
+            self.viewport = viewport
+            self.loaded = batch
+            self.y = 0
+            self.seen_at = {}  # 商品序号 -> 进入视口的时间
+
+        def height(self):
+            return self.loaded * self.row_height + 600
+
+        def update(self):
+            if self.y + 2 * self.viewport >= self.height() and self.loaded < self.total:
+                self.loaded = min(self.total, self.loaded + self.batch)
+            first, last = self.y // self.row_height, (self.y + self.viewport) // self.row_height
+            for i in range(first, min(last + 1, self.loaded)):
+                self.seen_at.setdefault(i, self.clock())
+
+        def run_js(self, js):
+            if js.startswith('window.scrollBy'):
+                self.y = min(self.y + int(js.split(',')[1].rstrip(')')), self.height() - self.viewport)
+            elif js.startswith('window.scrollTo'):
+                self.y = 0
+            elif js.startswith('(function(selector)'):
+                self.update()
+                images = sum(1 for t in self.seen_at.values() if self.clock() - t >= 1.0)
+                return json.dumps({'items': self.loaded, 'images': images, 'height': self.height(),
+                                   'y': self.y, 'viewport': self.viewport})
+            return 'OK'
+
+    for total in (20, 60, 200, 400):
+        clock = FakeClock()
+        driver = LazyListDriver(clock, total)
+        report = scroll_until_stable(driver, '[data-id]', sleep=clock.sleep, clock=clock)
+        assert report['stable'] and report['items'] == total, report
+        assert report['images'] == total, report
+        # 原来固定 50 步 × 1.5 秒，前后再等 2 + 3 + 3 秒
+        fixed = 50 * 1.5 + 8
+        print(f'   {total:4d} 个商品: {format_report(report)}，固定步数 {fixed:.0f} 秒')
+
+    clock = FakeClock()
+    report = scroll_until_stable(LazyListDriver(clock, 5000), '[data-id]', max_steps=30,
+                                 sleep=clock.sleep, clock=clock)
+    assert not report['stable'] and report['steps'] == 30, report
+    print(f'   上限: {format_report(report)}')
+    print('✅ 滚动加载：商品和图片加载完即停止，超长页面按上限截止')
+
+    class SlowPageDriver(BrowserDriver):
+        """模拟打开页面：ready_at 秒后商品出现；wall 为 login/slider 时一直停在验证页"""
+
+        name = 'slow'
+
+        def __init__(self, clock, ready_at, wall=''):
+            self.clock = clock
+            self.ready_at = ready_at
+            self.wall = wall
+            self.stale = False
+            self.opened_at = None
+
+        def open(self, url):
+            self.stale = False
+            self.opened_at = self.clock()
+
+        def run_js(self, js):
+            if js == MARK_STALE_JS:
+                self.stale = True
+                return 'OK'
+            assert js.startswith('(function(selector, loginMarkers')
+            if self.opened_at is None:
+                # 还没开始加载新页面，读到的是带商品的旧页面
+                return json.dumps({'ready_state': 'complete', 'items': 40, 'stale': self.stale, 'wall': ''})
+            elapsed = self.clock() - self.opened_at
+            loaded = elapsed >= self.ready_at
+            return json.dumps({'ready_state': 'complete' if loaded else 'loading',
+                               'items': 40 if loaded and not self.wall else 0,
+                               'stale': False, 'wall': self.wall if loaded else ''})
+
+    for ready_at in (0.8, 2.5, 6.0, 12.0):
+        clock = FakeClock()
+        report = open_page(SlowPageDriver(clock, ready_at), 'https://example.com', '[data-id]',
+                           sleep=clock.sleep, clock=clock)
+        assert report['ready'] and ready_at <= report['seconds'] < ready_at * 1.6 + 0.5, report
+        print(f'   页面 {ready_at:4.1f} 秒加载完: {format_wait(report)}，原来固定 45 秒')
+
+    clock = FakeClock()
+    driver = SlowPageDriver(clock, 1.0)
+    driver.opened_at = None
+    driver.run_js(MARK_STALE_JS)
+    report = wait_until_ready(driver, '[data-id]', timeout=0.5, sleep=clock.sleep, clock=clock)
+    assert not report['ready'] and report['blocker'] == 'loading', report
+
+    clock = FakeClock()
+    report = open_page(SlowPageDriver(clock, 1.0, wall='slider'), 'https://example.com', '[data-id]',
+                       timeout=20, sleep=clock.sleep, clock=clock)
+    assert not report['ready'] and report['blocker'] == 'slider' and report['seconds'] == 20, report
+    print(f'   滑块: {format_wait(report)}')
+
+    # 接口数据 1.5 秒到、页面 12 秒才渲染：done 为 True 就返回
+    clock = FakeClock()
+    report = open_page(SlowPageDriver(clock, 12.0), 'https://example.com', '[data-id]',
+                       sleep=clock.sleep, clock=clock, done=lambda: clock() >= 1.5)
+    assert report['ready'] and 1.5 <= report['seconds'] < 3.0, report
+    print(f'   接口先到: {format_wait(report)}')
+    print('✅ 等待就绪：商品出现（或接口数据到达）即返回，不会读到旧页面，验证页等到超时')
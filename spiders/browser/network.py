@@ -0,0 +1,213 @@
+"""
+接口响应解析
+
+店铺页面的商品列表是前端通过 XHR / JSONP 接口拿到 JSON 再渲染的。抓到这些响应（driver.capture_responses，
+CDP 的 Network 域）后直接从 JSON 里取商品，价格是明文，不用滚动触发懒加载，也不用解密天猫的价格字体。
+解析不到商品（Safari 不能抓包、接口改版）时爬虫仍走原来的 DOM 解析。
+
+- parse_payload()：JSON / JSONP（callback(...)、/**/cb(...)、try{cb(...)}catch(e){}）都能解析，解析不了返回 None
+- extract_products()：在任意结构的 JSON 里找“商品列表”（有编号和价格的对象数组），统一成
+  {'id', 'title', 'price', 'url', 'img'}，字段名按常见接口的写法匹配
+
+样例响应（离线自检用）：spiders/browser/fixtures/listing_responses.json
+SPIDER_RECORD=<文件> 运行爬虫时会把抓到的真实响应录进 fixture，之后用 replay 驱动离线回放。
+
+自检：python -m spiders.browser.network
+"""
+
+import json
+import re
+from typing import Callable, List, Optional
+
+# 字段名（按优先级）：售价在前，原价（reservePrice）最后
+ID_KEYS = ('itemId', 'item_id', 'skuId', 'sku_id', 'wareId', 'nid', 'id')
+PRICE_KEYS = ('discountPrice', 'promotionPrice', 'salePrice', 'jdPrice', 'price', 'p', 'reservePrice')
+TITLE_KEYS = ('title', 'itemTitle', 'raw_title', 'wname', 'name')
+URL_KEYS = ('url', 'itemUrl', 'detail_url', 'auctionUrl', 'link')
+IMG_KEYS = ('picUrl', 'pic_url', 'pic', 'imageurl', 'imageUrl', 'imgUrl', 'img', 'image')
+
+_JSONP_RE = re.compile(r'^[\s;]*(?:/\*\*/)?\s*(?:try\s*\{\s*)?[\w$.]+\s*\((.*)\)\s*;?\s*(?:\}\s*catch\s*\(\s*\w*\s*\)\s*\{\s*\}\s*)?;?\s*$',
+                       re.DOTALL)
+
+
+def parse_payload(body) -> Optional[object]:
+    """JSON 或 JSONP 响应体 -> Python 对象，解析失败返回 None"""
+    if isinstance(body, bytes):
+        body = body.decode('utf-8', errors='replace')
+    if not body:
+        return None
+    text = body.strip().lstrip('\ufeff').strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    match = _JSONP_RE.match(text)
+    candidates = [match.group(1)] if match else []
+    # 兜底：第一个 ( 到最后一个 ) 之间
+    if '(' in text and ')' in text:
+        candidates.append(text[text.index('(') + 1:text.rindex(')')])
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            continue
+    return None
+
+
+def _first(item: dict, keys) -> Optional[object]:
+    for key in keys:
+        value = item.get(key)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def _to_price(value) -> float:
+    try:
+        price = float(str(value).replace('¥', '').replace(',', '').strip())
+    except ValueError:
+        return 0
+    return price if price > 0 else 0
+
+
+def _absolute(url) -> str:
+    url = str(url or '').strip()
+    return 'https:' + url if url.startswith('//') else url
+
+
+def normalize_item(item: dict) -> Optional[dict]:
+    """一个接口商品对象 -> {'id', 'title', 'price', 'url', 'img'}，没有编号或价格返回 None"""
+    if not isinstance(item, dict):
+        return None
+    item_id = _first(item, ID_KEYS)
+    price = 0
+    for key in PRICE_KEYS:
+        price = _to_price(item.get(key)) if item.get(key) not in (None, '') else 0
+        if price:
+            break
+    if item_id in (None, '') or not price:
+        return None
+    return {
+        'id': re.sub(r'^J_', '', str(item_id)),  # 京东价格接口的编号带 J_ 前缀
+        'title': str(_first(item, TITLE_KEYS) or '').strip(),
+        'price': price,
+        'url': _absolute(_first(item, URL_KEYS)),
+        'img': _absolute(_first(item, IMG_KEYS)),
+    }
+
+
+def _product_lists(data, found):
+    """递归找对象数组：至少一半元素能识别成商品的数组算商品列表"""
+    if isinstance(data, list):
+        dicts = [x for x in data if isinstance(x, dict)]
+        if dicts:
+            items = [normalize_item(x) for x in dicts]
+            items = [x for x in items if x]
+            if len(items) * 2 >= len(dicts):
+                found.append(items)
+                return
+        for x in data:
+            _product_lists(x, found)
+    elif isinstance(data, dict):
+        for value in data.values():
+            if isinstance(value, str) and value[:1] in '{[':
+                # 有的接口把列表再序列化一次放在字符串字段里
+                value = parse_payload(value)
+            _product_lists(value, found)
+
+
+def extract_products(responses: List[dict], require_title: bool = True) -> List[dict]:
+    """从抓到的响应里取商品（按编号去重，先出现的优先），responses 为 [{'url', 'body'}]"""
+    products = {}
+    for response in responses:
+        data = parse_payload(response.get('body'))
+        if data is None:
+            continue
+        found = []
+        _product_lists(data, found)
+        for items in found:
+            for item in items:
+                if require_title and not item['title']:
+                    continue
+                products.setdefault(item['id'], item)
+    return list(products.values())
+
+
+def products_arrived(capture) -> Optional[Callable[[], bool]]:
+    """open_page(done=...) 用：抓到接口商品就算就绪，不用等页面渲染；不支持抓包（capture 为 None）时返回 None"""
+    if capture is None:
+        return None
+    return lambda: bool(capture_products(capture))
+
+
+def capture_products(capture, require_title: bool = True) -> List[dict]:
+    """capture_responses() 的结果 -> 商品列表；不支持抓包（capture 为 None）或出错时返回 []"""
+    if capture is None:
+        return []
+    try:
+        return extract_products(capture.responses(), require_title)
+    except Exception as e:
+        print(f"   ⚠️ 读取接口响应失败: {e}")
+        return []
+
+
+if __name__ == '__main__':
+    import os
+
+    from spiders.browser.cdp import CDPBrowser
+    from spiders.browser.driver import CDPDriver, ReplayDriver
+    from spiders.browser.fake_cdp import FakeCDPServer
+
+    fixture_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'listing_responses.json')
+    with open(fixture_path, encoding='utf-8') as f:
+        fixture = json.load(f)
+
+    # 1. 各种 JSONP 写法
+    for body in ('cb({"a": 1})', '/**/ jQuery123_4({"a": 1});', 'try{cb({"a": 1})}catch(e){}',
+                 ' \ufeff{"a": 1}', 'mtopjsonp3({"a": 1})\n'):
+        assert parse_payload(body) == {'a': 1}, body
+    assert parse_payload('<html>登录</html>') is None and parse_payload('') is None
+
+    # 2. 样例响应：天猫 mtop、京东商品接口、京东价格接口（无标题，默认跳过）、无关接口、坏数据
+    from spiders.jd_spider_multi_page import BASE_URL
+    from spiders.tmall_fixed import PAGE1_URL
+
+    tmall_url = PAGE1_URL
+    jd_url = BASE_URL.format(1)
+    tmall = extract_products(fixture['responses'][tmall_url])
+    jd = extract_products(fixture['responses'][jd_url])
+    assert [(p['id'], p['price']) for p in tmall] == [('888000111', 1299.0), ('888000222', 259.0)], tmall
+    assert tmall[0]['img'].startswith('https://img.alicdn.com/')
+    assert [(p['id'], p['price']) for p in jd] == [('100012345', 99.0), ('100067890', 459.0)], jd
+    prices = extract_products(fixture['responses'][jd_url], require_title=False)
+    assert ('100099999', 19.9) in [(p['id'], p['price']) for p in prices]
+    print(f'✅ 接口解析：天猫 {len(tmall)} 个、京东 {len(jd)} 个商品，JSONP 各种写法、无关/损坏响应正常跳过')
+
+    # 3. 回放：fixture 的 responses 按页面网址返回
+    replay = ReplayDriver(fixture)
+    capture = replay.capture_responses(r'mtop|h5api')
+    replay.open(tmall_url)
+    assert capture_products(capture) == tmall
+    replay.open('https://example.com/')
+    assert capture_products(capture) == []
+
+    # 4. 假 CDP 服务：Network 事件 + getResponseBody（含 base64 响应体），Safari 等不支持抓包时返回 []
+    def responses(url):
+        recorded = fixture['responses'].get(url, [])
+        return [(r['url'], 'application/json', r['body'].encode('utf-8') if i % 2 else r['body'])
+                for i, r in enumerate(recorded)]
+
+    server = FakeCDPServer(responses=responses)
+    ws_url = server.start()
+    browser = CDPBrowser(ws_url, timeout=5)
+    driver = CDPDriver(browser=browser)
+    for url, expected in ((tmall_url, tmall), (jd_url, jd)):
+        capture = driver.capture_responses(r'mtop|h5api|api\.m\.jd\.com|p\.3\.cn')
+        driver.page.navigate(url)
+        assert capture_products(capture) == expected, url
+        capture.stop()
+    driver.quit()
+    browser.close()
+    server.stop()
+    assert capture_products(None) == []
+    print('✅ 抓包：CDP Network 响应、fixture 回放和原来的解析结果一致')
@@ -0,0 +1,217 @@
+"""
+多标签页爬取调度
+
+原来一页一页串行：打开 → 等加载 → 滚动 → 解析 → 写库 → 下一页，写库时浏览器闲着，等加载时 CPU 闲着。
+run_pages() 开 N 个标签页同时加载不同的页，解析出的数据交给一个写库线程，写库和下一页的加载重叠。
+
+- 同一网站（按主域名，如 tmall.com、jd.com）的所有打开页面操作（包括详情页）都经过 DomainThrottle：
+  两次打开之间至少间隔 SpiderConfig.REQUEST_DELAY + 随机 0~REQUEST_JITTER 秒，并发不会提高请求频率。
+- 不支持多标签页的驱动（Safari 只能操作最前面的窗口）并发固定为 1，仍然和写库重叠。
+- 写库只在一个线程里做，SQLite 不会有并发写。其他要写库的后台线程（京东款式名称任务）写库时拿 write_lock，
+  和写库线程串行。
+
+自检 + 串行/并发耗时对比：python -m spiders.browser.scheduler
+"""
+
+import queue
+import random
+import threading
+import time
+from typing import Callable, List, Optional
+from urllib.parse import urlsplit
+
+from config import SpiderConfig
+from spiders.browser.driver import BrowserDriver
+
+
+# 进程内写库的锁：写库线程保存每页时持有，后台线程写库前也要拿到
+write_lock = threading.Lock()
+
+
+def site_of(url: str) -> str:
+    """主域名：detail.tmall.com / thetransformers.tmall.com -> tmall.com"""
+    host = urlsplit(url).hostname or ''
+    return '.'.join(host.split('.')[-2:])
+
+
+class DomainThrottle:
+    """按网站限速：同一网站两次打开页面至少间隔 min_interval + 随机 0~jitter 秒（多线程共用）"""
+
+    def __init__(self, min_interval: Optional[float] = None, jitter: Optional[float] = None,
+                 sleep: Callable[[float], None] = time.sleep, clock: Callable[[], float] = time.monotonic):
+        self.min_interval = SpiderConfig.REQUEST_DELAY if min_interval is None else min_interval
+        self.jitter = SpiderConfig.REQUEST_JITTER if jitter is None else jitter
+        self._sleep = sleep
+        self._clock = clock
+        self._next = {}  # 网站 -> 下一次允许打开的时间
+        self._lock = threading.Lock()
+        self.waited = 0.0
+        self.opened = []  # (网站, 打开时间)
+
+    def wait(self, url: str) -> float:
+        """等到允许打开 url，返回等待的秒数"""
+        site = site_of(url)
+        with self._lock:
+            # 在锁里预订时间点，锁外睡眠：多个标签页排队，不会同时放行
+            now = self._clock()
+            start = max(now, self._next.get(site, now))
+            self._next[site] = start + self.min_interval + random.uniform(0, self.jitter)
+            self.opened.append((site, start))
+            self.waited += start - now
+        if start > now:
+            self._sleep(start - now)
+        return start - now
+
+
+class ThrottledDriver(BrowserDriver):
+    """包一层驱动，open() 前先经过限速"""
+
+    def __init__(self, inner: BrowserDriver, throttle: DomainThrottle):
+        self.inner = inner
+        self.throttle = throttle
+        self.name = inner.name
+        self.supports_tabs = inner.supports_tabs
+
+    def open(self, url: str):
+        self.throttle.wait(url)
+        self.inner.open(url)
+
+    def run_js(self, js: str) -> str:
+        return self.inner.run_js(js)
+
+    def close(self):
+        self.inner.close()
+
+    def quit(self):
+        self.inner.quit()
+
+    def new_tab(self) -> 'ThrottledDriver':
+        return ThrottledDriver(self.inner.new_tab(), self.throttle)
+
+    def capture_responses(self, pattern: str):
+        return self.inner.capture_responses(pattern)
+
+
+class PageJob:
+    """一页的爬取任务
+
+    crawl(tab, url) 在浏览器线程里打开页面并解析，返回的数据交给 save(data) 在写库线程里保存；
+    没有 save 时 crawl 的返回值就是结果。
+    """
+
+    def __init__(self, url: str, crawl: Callable, save: Optional[Callable] = None, name: str = ''):
+        self.url = url
+        self.crawl = crawl
+        self.save = save
+        self.name = name or url
+
+
+def run_pages(driver: BrowserDriver, jobs: List[PageJob], concurrency: Optional[int] = None,
+              throttle: Optional[DomainThrottle] = None) -> list:
+    """并发爬取多页，返回各页 save 的结果（按 jobs 顺序，失败的为 None）
+
+    concurrency 默认 SpiderConfig.CRAWL_CONCURRENCY；驱动不支持多标签页时为 1。
+    """
+    if not jobs:
+        return []
+    throttle = throttle or DomainThrottle()
+    concurrency = concurrency or SpiderConfig.CRAWL_CONCURRENCY
+    if not driver.supports_tabs:
+        concurrency = 1
+    concurrency = max(1, min(concurrency, len(jobs)))
+
+    pending = queue.Queue()
+    for index, job in enumerate(jobs):
+        pending.put((index, job))
+    to_save = queue.Queue()
+    results = [None] * len(jobs)
+    start = time.monotonic()
+
+    def crawl_worker(tab):
+        while True:
+            try:
+                index, job = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                to_save.put((index, job, job.crawl(tab, job.url)))
+            except Exception as e:
+                print(f"❌ {job.name} 爬取失败: {e}")
+
+    def save_worker():
+        while True:
+            item = to_save.get()
+            if item is None:
+                return
+            index, job, data = item
+            try:
+                with write_lock:
+                    results[index] = job.save(data) if job.save else data
+            except Exception as e:
+                print(f"❌ {job.name} 保存失败: {e}")
+
+    # 并发为 1 时直接用传入的驱动（Safari 的当前窗口），否则每个线程一个新标签页
+    tabs = [driver] if concurrency == 1 else [driver.new_tab() for _ in range(concurrency)]
+    writer = threading.Thread(target=save_worker, name='page-writer')
+    writer.start()
+    workers = [threading.Thread(target=crawl_worker, args=(ThrottledDriver(tab, throttle),), name=f'page-tab-{i}')
+               for i, tab in enumerate(tabs)]
+    try:
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        to_save.put(None)
+        writer.join()
+        if concurrency > 1:
+            for tab in tabs:
+                tab.close()
+
+    print(f"⏱️ {len(jobs)} 页，{concurrency} 个标签页，总耗时 {time.monotonic() - start:.1f} 秒，"
+          f"限速等待 {throttle.waited:.1f} 秒")
+    return results
+
+
+if __name__ == '__main__':
+    from spiders.browser.driver import ReplayDriver
+
+    # 模拟：打开页面 + 滚动解析每页 0.4 秒，写库 0.1 秒；限速 0.15 秒 + 抖动 0.05 秒
+    LOAD, SAVE, DELAY, JITTER = 0.4, 0.1, 0.15, 0.05
+    urls = ([f'https://mall.jd.com/list-{i}.html' for i in range(1, 8)]
+            + [f'https://thetransformers.tmall.com/category.htm?pageNo={i}' for i in range(1, 4)])
+    saved_in = set()
+
+    def crawl(tab, url):
+        tab.open(url)
+        time.sleep(LOAD)
+        return url
+
+    def save(data):
+        saved_in.add(threading.current_thread().name)
+        time.sleep(SAVE)
+        return data
+
+    timings = {}
+    for concurrency, supports_tabs in ((1, False), (3, True)):
+        driver = ReplayDriver({'pages': {}})
+        driver.supports_tabs = supports_tabs
+        throttle = DomainThrottle(DELAY, JITTER)
+        began = time.monotonic()
+        results = run_pages(driver, [PageJob(url, crawl, save) for url in urls], concurrency, throttle)
+        timings[concurrency] = time.monotonic() - began
+        assert results == urls, results
+
+        # 同一网站相邻两次打开至少间隔 DELAY
+        for site in ('jd.com', 'tmall.com'):
+            times = sorted(t for s, t in throttle.opened if s == site)
+            gaps = [b - a for a, b in zip(times, times[1:])]
+            assert min(gaps) >= DELAY - 1e-6, (site, gaps)
+    assert saved_in == {'page-writer'}, saved_in
+
+    serial = len(urls) * (LOAD + SAVE)
+    print(f'   原来串行（加载 + 写库）: {serial:.1f} 秒')
+    print(f'   1 个标签页（写库重叠）:   {timings[1]:.1f} 秒')
+    print(f'   3 个标签页:               {timings[3]:.1f} 秒')
+    assert timings[3] < timings[1] * 0.6, timings
+    print('✅ 并发爬取：结果顺序正确，同网站打开间隔不低于限速，写库都在一个线程')
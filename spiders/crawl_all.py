@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+京东 + 天猫一次爬完
+
+两个网站的列表页放进同一个调度（spiders/browser/scheduler.py）：多个标签页同时加载，
+每个网站各自按 SpiderConfig.REQUEST_DELAY 限速，写库在单独的线程，京东款式名称在后台标签页补。
+
+SPIDER_DRIVER=cdp SPIDER_CONCURRENCY=4 python spiders/crawl_all.py
+"""
+
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from database.db import get_connection
+from database.history_writer import load_known_products
+from database.migrations import migrate
+from database.style_jobs import requeue_style_jobs
+from spiders import jd_spider_multi_page, tmall_fixed
+from spiders.browser.driver import create_driver
+
+
+def main():
+    print("="*60)
+    print("🚀 京东 + 天猫 全量爬取")
+    print("="*60)
+    
+    conn = get_connection(jd_spider_multi_page.DB_PATH)
+    migrate(conn)
+    jd_known = load_known_products(conn, 'jd')
+    tmall_known = load_known_products(conn, 'tmall')
+    requeued = requeue_style_jobs(conn)
+    conn.close()
+    print(f"📦 已有商品: 京东 {len(jd_known)}，天猫 {len(tmall_known)}，款式任务重新排队 {requeued}")
+    
+    jd_jobs = jd_spider_multi_page.page_jobs(jd_known)
+    tmall_jobs = tmall_fixed.page_jobs(tmall_known)
+    
+    # 两个网站交替排队，开始时各网站都有页面在加载
+    jobs = []
+    for i in range(max(len(jd_jobs), len(tmall_jobs))):
+        jobs.extend(j[i] for j in (jd_jobs, tmall_jobs) if i < len(j))
+    
+    start = time.monotonic()
+    driver = create_driver()
+    try:
+        # 京东新商品的款式名称在后台标签页补（jd_style_jobs 队列）
+        results = jd_spider_multi_page.crawl_pages(driver, jobs, known=jd_known)
+    finally:
+        driver.quit()
+    
+    jd_results = [r for job, r in zip(jobs, results) if r and job in jd_jobs]
+    tmall_results = [r or 0 for job, r in zip(jobs, results) if job in tmall_jobs]
+    print("\n" + "="*60)
+    print("📊 最终统计")
+    print("="*60)
+    print(f"   京东: {len(jd_results)}/{len(jd_jobs)} 页，商品 {sum(r['products'] for r in jd_results)}，"
+          f"新增 {sum(r['new'] for r in jd_results)}")
+    print(f"   天猫: {len(tmall_jobs)} 页，写入商品 {sum(tmall_results)}")
+    print(f"   总耗时: {time.monotonic() - start:.0f} 秒")
+    print("="*60)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,42 @@
 #!/usr/bin/env python3
 """
 京东爬虫 - 完整版（包含款式名称）
+
+浏览器由 spiders/browser/driver.py 驱动（SPIDER_DRIVER=safari/cdp/replay，默认 Safari）
 """
 
-import subprocess
 import sqlite3
-import time
 import random
 import json
 import re
 import os
+import sys
+import threading
 from datetime import datetime
 
 # 使用绝对路径，确保从任何目录运行都能正确找到数据库
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.path.join(BASE_DIR, 'data', 'transformers.db')
 BASE_URL = 'https://mall.jd.com/view_search-396211-17821117-99-1-20-{}.html'
+# 详情页的款式列表或标题，出现即详情页就绪（没有款式的商品不用等到超时）
+STYLE_SELECTOR = '.specification-item-sku, .sku-name'
+
+# 店铺商品列表接口（JSONP），抓到时直接用接口数据，不用下拉和解析页面
+API_PATTERN = r'api\.m\.jd\.com|wareInfo'
+IMG_BASE = 'https://img10.360buyimg.com/n0/'
+# 接口数据没有页面上的预售标记，按标题过滤
+PRESALE_KEYWORDS = ['预售', '定金', '尾款', '预订', '预付']
+
+sys.path.insert(0, BASE_DIR)
+from config import SpiderConfig
+from database.db import get_connection
+from database.history_writer import find_products, load_known_products, write_page
+from database.migrations import migrate
+from database.style_jobs import claim_style_job, enqueue_style_jobs, finish_style_job, requeue_style_jobs, style_job_counts
+from spiders.browser.driver import create_driver
+from spiders.browser.loading import format_report, format_wait, open_page, scroll_until_stable
+from spiders.browser.network import capture_products, products_arrived
+from spiders.browser.scheduler import DomainThrottle, PageJob, ThrottledDriver, run_pages, write_lock
 
 
 def extract_level(title):
@@ -38,42 +59,16 @@ def extract_level(title):
     return ''
 
 
-def random_wait(min_sec=3, max_sec=5):
-    wait_time = random.uniform(min_sec, max_sec)
-    print(f"   waiting {wait_time:.1f}s...")
-    time.sleep(wait_time)
-
-
-def run_js(js_code):
-    with open('/tmp/jd_spider.js', 'w') as f:
-        f.write(js_code)
-    
-    cmd = '''osascript <<'AS'
-tell application "Safari"
-    set jsFile to "/tmp/jd_spider.js"
-    set js to do shell script "cat " & quoted form of jsFile
-    set result to do JavaScript js in current tab of front window
-    return result
-end tell
-AS'''
-    
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=60)
-    return result.stdout.strip()
-
-
-def scroll_page():
-    """分15次小滚动，每次200像素，间隔1.5秒"""
-    for i in range(15):
-        js = 'window.scrollBy(0, 200)'
-        run_js(js)
-        time.sleep(1.5)
-    
-    time.sleep(5)
+def scroll_page(driver):
+    """一屏一屏下拉，商品数和图片数不再变化就停（最多15步）"""
+    report = scroll_until_stable(driver, '.jItem', max_steps=15)
+    print(f"   {format_report(report)}")
+    return report
 
 
-def get_products_from_page():
+def get_products_from_page(driver):
     """从当前页面获取商品ID列表"""
-    scroll_page()
+    scroll_page(driver)
     
     js = '''var m = document.querySelector(".j-module[module-function*=saleAttent][module-param*=product]");
 var products = [];
@@ -110,179 +105,232 @@ if(m) {
 }
 JSON.stringify(products);'''
     
-    result = run_js(js)
+    result = driver.run_js(js)
     try:
         return json.loads(result) if result else []
     except:
         return []
 
 
-def get_style_name(product_url):
-    """从详情页获取款式名称"""
+def get_api_products(capture, dom_count=0):
+    """从抓到的店铺接口响应取商品，格式同 get_products_from_page
+    接口商品比页面上已渲染的少时（没抓全）返回 []，走页面解析"""
+    products = []
+    for item in capture_products(capture):
+        if any(kw in item['title'] for kw in PRESALE_KEYWORDS):
+            continue
+        img = item['img']
+        if img and not img.startswith('http'):
+            img = IMG_BASE + img.lstrip('/')
+        products.append({'id': item['id'], 'url': f"https://item.jd.com/{item['id']}.html", 'img': img,
+                         'title': item['title'], 'price': item['price'], 'status': 'available'})
+    if products and len(products) < dom_count:
+        print(f"   接口只有 {len(products)} 个商品（页面 {dom_count} 个），改用页面解析")
+        return []
+    return products
+
+
+def get_style_name(tab, product_url):
+    """在款式任务的标签页里打开详情页，获取款式名称"""
     # 打开详情页
-    subprocess.run(['osascript', '-e', f'tell application "Safari" to open location "{product_url}"'])
-    time.sleep(6)
+    report = open_page(tab, product_url, STYLE_SELECTOR, timeout=10)
+    if not report['ready']:
+        print(f"         ⏳ {format_wait(report)}")
     
     # 获取款式名称
     js = '''var selected = document.querySelector('.specification-item-sku.has-image.specification-item-sku--selected');
 var textElem = selected ? selected.querySelector('.specification-item-sku-text') : null;
 textElem ? textElem.innerText.trim() : 'NOT_FOUND';'''
     
-    result = run_js(js)
+    result = tab.run_js(js)
     
-    # 关闭详情页
-    subprocess.run(['osascript', '-e', 'tell application "Safari" to close front window'])
-    
-    if result and result != 'NOT_FOUND':
+    if result and result != 'NOT_FOUND' and not result.startswith('ERROR:'):
         return result
     return ''
 
 
-def save_products(products, page_num):
+def run_style_workers(driver, workers=None, until=None, throttle=None, known=None):
+    """款式名称任务池：每个工作线程一个详情页标签页，从 jd_style_jobs 队列取任务，直到队列为空
+    
+    until: threading.Event，传入时队列空了也继续等新任务，直到事件被设置（列表爬取结束）再退出
+    throttle: 和列表页共用的限速（DomainThrottle），详情页也算在 jd.com 的请求频率里
+    known: 列表爬取用的商品字典，取到款式名称后写回，之后的页面写价格历史时带上款式
+    驱动不支持多标签页（Safari）时只有 1 个工作线程，直接用传入的驱动，每个详情页取完关掉窗口
+    领取和保存任务都拿 write_lock，和列表页的写库线程串行（SQLite 同时只有一个写入）
+    返回 {'done': 取到款式数, 'failed': 没取到数}
+    """
+    workers = workers or SpiderConfig.STYLE_WORKERS
+    if not driver.supports_tabs:
+        workers = 1
+    throttle = throttle or DomainThrottle()
+    counts = {'done': 0, 'failed': 0}
+    lock = threading.Lock()
+    
+    def worker(tab):
+        conn = get_connection(DB_PATH)
+        try:
+            while True:
+                with write_lock:
+                    job = claim_style_job(conn)
+                if job is None:
+                    if until is None or until.is_set():
+                        return
+                    until.wait(1)
+                    continue
+                
+                row_id, url = job
+                try:
+                    style_name = get_style_name(tab, url)
+                    error = None
+                except Exception as e:
+                    style_name, error = '', str(e)
+                if not driver.supports_tabs:
+                    # Safari 每次打开都是新窗口，取完关掉
+                    tab.close()
+                row = conn.execute('SELECT product_id, title FROM jd_products WHERE id = ?', (row_id,)).fetchone()
+                sku, title = row if row else (None, '')
+                level = extract_level((title or '') + ' ' + style_name)
+                with write_lock:
+                    finish_style_job(conn, row_id, style_name, level, error)
+                    if style_name and known is not None and sku in known:
+                        known[sku]['style_name'] = style_name
+                with lock:
+                    counts['done' if style_name else 'failed'] += 1
+                print(f"   🎨 {row_id}: {style_name or '⚠️ ' + (error or 'No style name')}")
+        finally:
+            conn.close()
+            if driver.supports_tabs:
+                tab.close()
+    
+    # 支持多标签页时每个工作线程新开标签页（传入的驱动可能还在爬列表页）
+    tabs = [driver.new_tab() for _ in range(workers)] if driver.supports_tabs else [driver]
+    threads = [threading.Thread(target=worker, args=(ThrottledDriver(tab, throttle),), name=f'style-{i}')
+               for i, tab in enumerate(tabs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"🎨 款式名称: 取到 {counts['done']}，未取到 {counts['failed']}")
+    return counts
+
+
+def save_products(products, page_num, known=None):
     """保存商品到数据库
     
+    known: 爬取开始时加载的商品字典（load_known_products），随写入更新；不传则按页查库
+    
     逻辑：
-    1. 检查商品是否已存在
-    2. 如果已存在：不打开详情页，不重复保存商品，但检查并保存价格历史
-    3. 如果不存在：获取款式名称，保存商品，保存价格历史
-    4. 同一天同一商品只能有一条价格历史
+    1. 在已知商品字典里判断新老商品
+    2. 如果已存在：不打开详情页，不重复保存商品，但保存价格历史
+    3. 如果不存在：保存商品，保存价格历史，详情页加入款式名称队列（run_style_workers 后台处理）
+    4. 同一天同一商品只能有一条价格历史（已有则保留第一次的价格）
+    5. 整页在一个事务里批量写入（database/history_writer.py）
     """
     if not products:
         return 0, 0
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection(DB_PATH)
+    migrate(conn)
+    
+    # 同一页重复出现的商品只处理一次
+    products = list({p['id']: p for p in products}.values())
+    existing = known if known is not None else find_products(conn, 'jd', [p['id'] for p in products])
     
-    new_count = 0
-    style_count = 0
-    today = datetime.now().strftime('%Y%m%d')
+    new_products = []
+    history = []
     
     for i, p in enumerate(products, 1):
         print(f"      [{i}/{len(products)}] {p['id']}")
         
-        # 检查商品是否已存在
-        cursor.execute("SELECT id, style_name FROM jd_products WHERE product_id=?", (p['id'],))
-        existing = cursor.fetchone()
-        
-        if existing:
+        if p['id'] in existing:
             # 已存在商品：不打开详情页，不重复保存商品
             print(f"         ⏭️ 已存在，跳过详情页")
-            
-            # 检查并保存价格历史（同一天同一商品只有一条）
             if p['status'] == 'available':
-                cursor.execute("""
-                    SELECT id FROM jd_price_history 
-                    WHERE product_id=? AND created_at=?
-                """, (existing[0], today))
-                if cursor.fetchone():
-                    print(f"         ⏭️ 今天已有价格记录，跳过")
-                else:
-                    try:
-                        cursor.execute("""
-                            INSERT INTO jd_price_history (product_id, product_url, price, style_name, created_at)
-                            VALUES (?, ?, ?, ?, ?)
-                        """, (existing[0], p['url'], p['price'], existing[1], today))
-                        conn.commit()
-                        print(f"         ✅ 新增价格历史")
-                    except Exception as e:
-                        print(f"         ❌ 保存价格历史失败: {e}")
+                history.append({'row_id': existing[p['id']]['id'], 'url': p['url'], 'price': p['price'],
+                                'style_name': existing[p['id']]['style_name']})
             continue
         
-        # 商品不存在，需要获取款式名称
+        # 商品不存在，款式名称之后由详情页队列补上
         style_name = ''
         level = ''
         if p['status'] == 'available':
-            print(f"         Getting style name...")
-            style_name = get_style_name(p['url'])
-            if style_name:
-                print(f"         ✅ {style_name}")
-                style_count += 1
-            else:
-                print(f"         ⚠️ No style name")
+            print(f"         🆕 款式名称加入队列")
             
-            # 识别级别
-            level = extract_level(p['title'] + ' ' + style_name)
+            # 识别级别（取到款式名称后还会再识别一次）
+            level = extract_level(p['title'])
             if level:
                 print(f"         🏷️ {level}")
+            
+            history.append({'sku': p['id'], 'url': p['url'], 'price': p['price'], 'style_name': style_name})
         else:
             print(f"         ⏭️ Pending, skip")
         
-        # 保存商品
-        try:
-            cursor.execute("""
-                INSERT INTO jd_products 
-                    (product_id, product_url, image_url, title, price, status, shop_name, shop_url, style_name, level, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                p['id'], p['url'], p['img'], p['title'][:500],
-                p['price'], p['status'],
-                "孩之宝京东自营旗舰店", BASE_URL.format(page_num),
-                style_name, level,
-                datetime.now().isoformat(), datetime.now().isoformat()
-            ))
-            conn.commit()
-        except Exception as e:
-            print(f"         ❌ 保存商品失败: {e}")
-            continue
-        
-        # 获取刚插入商品的 id（自增主键）
-        cursor.execute("SELECT id FROM jd_products WHERE product_id=?", (p['id'],))
-        result = cursor.fetchone()
-        product_row_id = result[0] if result else None
-        
-        # 保存到价格历史表
-        if p['status'] == 'available' and product_row_id:
-            try:
-                cursor.execute("""
-                    INSERT INTO jd_price_history (product_id, product_url, price, style_name, created_at)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (product_row_id, p['url'], p['price'], style_name, today))
-                conn.commit()
-            except Exception as e:
-                print(f"         ❌ 保存价格历史失败: {e}")
-        
-        new_count += 1
+        now = datetime.now().isoformat()
+        new_products.append({
+            'product_id': p['id'], 'product_url': p['url'], 'image_url': p['img'], 'title': p['title'][:500],
+            'price': p['price'], 'status': p['status'],
+            'shop_name': "孩之宝京东自营旗舰店", 'shop_url': BASE_URL.format(page_num),
+            'style_name': style_name, 'level': level,
+            'created_at': now, 'updated_at': now,
+        })
+    
+    queued = 0
+    try:
+        result = write_page(conn, 'jd', new_products=new_products, history=history, known=known)
+        # 在售的新商品进款式名称队列（写入失败或中途退出的，下次启动 requeue_style_jobs 会补上）
+        available = [p for p in new_products if p['status'] == 'available']
+        row_ids = find_products(conn, 'jd', [p['product_id'] for p in available])
+        queued = enqueue_style_jobs(conn, [(row_ids[p['product_id']]['id'], p['product_url']) for p in available])
+        conn.commit()
+        print(f"      💾 新商品 {result['new_products']}，新增价格历史 {result['history_new']}，"
+              f"今天已有价格记录 {result['history_existing']}，款式待取 {queued}")
+    except Exception as e:
+        print(f"      ❌ 保存失败: {e}")
+        result = {'new_products': 0}
     
     conn.close()
-    return new_count, style_count
+    return result['new_products'], queued
 
 
-def go_to_page(page_num):
+def go_to_page(driver, page_num, done=None):
+    """打开列表页，等到商品出现（最多30秒；done() 为 True 时提前返回），返回等待报告"""
     url = BASE_URL.format(page_num)
-    subprocess.run(['osascript', '-e', f'tell application "Safari" to open location "{url}"'])
-    random_wait(15, 20)
+    report = open_page(driver, url, '.jItem', timeout=30, done=done)
+    print(f"   {format_wait(report)}")
+    return report
 
 
-def main():
-    print("\n" + "="*80)
-    print("JD Spider - With Style Names")
-    print("="*80)
-    
-    total_products = 0
-    total_new = 0
-    total_styles = 0
-    
-    for page in range(1, 8):
-        print(f"\n{'='*80}")
-        print(f"Page {page}")
-        print("="*80)
-        
-        print(f"\nOpening page {page}...")
-        go_to_page(page)
-        
-        print(f"\nParsing products...")
-        products = get_products_from_page()
-        print(f"Found {len(products)} products")
-        
+def fetch_page(driver, page_num):
+    """打开列表页 → 解析商品，返回 (商品列表, 等待秒数)
+    能抓到店铺接口响应（CDP 驱动）时直接用接口数据，否则下拉后解析页面
+    在爬取标签页的线程里执行，写库交给 save_products"""
+    print(f"\nOpening page {page_num}...")
+    capture = driver.capture_responses(API_PATTERN)
+    try:
+        wait = go_to_page(driver, page_num, done=products_arrived(capture))
+        products = get_api_products(capture, wait['items'])
+    finally:
+        if capture is not None:
+            capture.stop()
+    if products:
+        print(f"   📡 接口返回 {len(products)} 个商品，跳过下拉")
+    else:
+        products = get_products_from_page(driver)
+    print(f"Page {page_num}: found {len(products)} products")
+    return products, wait['seconds']
+
+
+def page_jobs(known, pages=range(1, 8)):
+    """列表页的爬取任务（spiders/browser/scheduler.py 并发执行），每页结果为
+    {'products': 商品数, 'new': 新商品数, 'queued': 加入款式队列数, 'wait': 等待秒数}"""
+    def save(data, page_num):
+        products, wait = data
+        print(f"\nSaving page {page_num}...")
         available = sum(1 for p in products if p['status'] == 'available')
         pending = sum(1 for p in products if p['status'] == 'pending')
         print(f"Available: {available} | Pending: {pending}")
         
-        print(f"\nSaving products...")
-        new_count, style_count = save_products(products, page)
-        total_products += len(products)
-        total_new += new_count
-        total_styles += style_count
+        new_count, queued = save_products(products, page_num, known)
         
         for i, p in enumerate(products[:3], 1):
             status = 'OK' if p['status'] == 'available' else 'WAIT'
@@ -291,9 +339,63 @@ def main():
         
         if len(products) > 3:
             print(f"  ... and {len(products) - 3} more")
+        return {'products': len(products), 'new': new_count, 'queued': queued, 'wait': wait}
+    
+    return [PageJob(BASE_URL.format(page),
+                    lambda tab, url, page=page: fetch_page(tab, page),
+                    lambda data, page=page: save(data, page),
+                    f'Page {page}')
+            for page in pages]
+
+
+def crawl_pages(driver, jobs, throttle=None, known=None):
+    """跑列表页任务，款式名称队列同时在后台标签页处理（驱动不支持多标签页时列表爬完再处理）
+    jd.com 的列表页和详情页共用一个限速，返回各页结果
+    known: page_jobs 用的京东商品字典，款式任务完成后更新"""
+    throttle = throttle or DomainThrottle()
+    listing_done = threading.Event()
+    pool = None
+    if driver.supports_tabs:
+        pool = threading.Thread(target=run_style_workers, args=(driver,),
+                                kwargs={'until': listing_done, 'throttle': throttle, 'known': known},
+                                name='style-workers')
+        pool.start()
+    try:
+        results = run_pages(driver, jobs, throttle=throttle)
+    finally:
+        listing_done.set()
+    if pool:
+        pool.join()
+    else:
+        run_style_workers(driver, throttle=throttle, known=known)
+    return results
+
+
+def main():
+    print("\n" + "="*80)
+    print("JD Spider - With Style Names")
+    print("="*80)
+    
+    # 已入库商品一次加载，之后每页判断新老商品都查内存
+    conn = get_connection(DB_PATH)
+    migrate(conn)
+    known = load_known_products(conn, 'jd')
+    # 上次中断的款式任务放回队列，缺款式名称的商品重新排队
+    requeued = requeue_style_jobs(conn)
+    conn.close()
+    print(f"Known products: {len(known)} | Style jobs requeued: {requeued}")
+    
+    # 多个标签页同时加载列表页，写库在单独的线程（spiders/browser/scheduler.py），款式名称在后台标签页补
+    driver = create_driver()
+    try:
+        results = [r for r in crawl_pages(driver, page_jobs(known), known=known) if r]
+    finally:
+        print(f"\nClosing browser...")
+        driver.quit()
     
-    print(f"\nClosing browser...")
-    subprocess.run(['osascript', '-e', 'tell application "Safari" to close every window'])
+    total_products = sum(r['products'] for r in results)
+    total_new = sum(r['new'] for r in results)
+    total_wait = sum(r['wait'] for r in results)
     
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
@@ -307,6 +409,7 @@ def main():
     pending_count = cursor.fetchone()[0]
     cursor.execute("SELECT COUNT(*) FROM jd_products WHERE style_name IS NOT NULL AND style_name != ''")
     styled_count = cursor.fetchone()[0]
+    style_jobs = style_job_counts(conn)
     conn.close()
     
     print(f"\n" + "="*80)
@@ -314,7 +417,8 @@ def main():
     print("="*80)
     print(f"  Total: {total_products} | New: {total_new}")
     print(f"  Available: {available_count} | Pending: {pending_count}")
-    print(f"  With Style: {styled_count} | History: {history}")
+    print(f"  With Style: {styled_count} | History: {history} | Style jobs: {style_jobs}")
+    print(f"  Page waits: {total_wait:.1f}s (fixed 15-20s per page: ~{17.5 * len(results):.0f}s)")
     print(f"\nDone!")
     print("="*80)
 
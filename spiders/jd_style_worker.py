@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+京东款式名称补全（单独运行）
+
+处理 jd_style_jobs 队列直到为空：上次中断的任务放回队列，缺款式名称的商品重新排队，
+多个标签页（SpiderConfig.STYLE_WORKERS）同时打开详情页。列表爬虫运行时也会在后台处理同一个队列。
+
+SPIDER_DRIVER=cdp python spiders/jd_style_worker.py
+"""
+
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from database.db import get_connection
+from database.migrations import migrate
+from database.style_jobs import requeue_style_jobs, style_job_counts
+from spiders.browser.driver import create_driver
+from spiders.jd_spider_multi_page import DB_PATH, run_style_workers
+
+
+def main():
+    conn = get_connection(DB_PATH)
+    migrate(conn)
+    print(f"🔁 重新排队: {requeue_style_jobs(conn)}")
+    print(f"📋 款式任务: {style_job_counts(conn)}")
+    conn.close()
+    
+    driver = create_driver()
+    try:
+        run_style_workers(driver)
+    finally:
+        driver.quit()
+    
+    conn = get_connection(DB_PATH)
+    print(f"📋 款式任务: {style_job_counts(conn)}")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -6,38 +6,60 @@
 2. 图片：从class="photo"的img获取
 3. 爬完关闭Safari
 4. 增加滚动次数，确保滚到底
+
+浏览器由 spiders/browser/driver.py 驱动（SPIDER_DRIVER=safari/cdp/replay，默认 Safari）
 """
 
-import subprocess
 import sqlite3
-import time
 import random
 import os
+import sys
 import re
 import json
 from datetime import datetime
-from fontTools.ttLib import TTFont
 
 # 使用绝对路径，确保从任何目录运行都能正确找到数据库
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.path.join(BASE_DIR, 'data', 'transformers.db')
-FONT_PATH = os.path.join(BASE_DIR, 'data', 'fonts', 'tmall_price.woff')
 COOKIE_PATH = os.path.join(BASE_DIR, 'data', 'tmall_cookies.json')
 
 PAGE1_URL = "https://thetransformers.tmall.com/category.htm?spm=a1z10.3-b.w5001-22116109517.10.77742409X6wOMa&search=y&orderType=hotsell_desc&scene=taobao_shop"
 PAGE2_URL = "https://thetransformers.tmall.com/category.htm?spm=a1z10.3-b.w4011-22116109545.508.5ecd2409eajMbv&search=y&orderType=hotsell_desc&scene=taobao_shop&pageNo=2"
 PAGE3_URL = "https://thetransformers.tmall.com/category.htm?spm=a1z10.3-b.w4011-22116109545.509.1a132409FfGkP2&search=y&orderType=hotsell_desc&scene=taobao_shop&pageNo=3"
 
+# (网址, 名称, 最多滚动步数)
+PAGES = [
+    (PAGE1_URL, "第1页", 50),
+    (PAGE2_URL, "第2页", 50),
+    (PAGE3_URL, "第3页", 10),
+]
+
+# 带价格的商品元素，出现即页面就绪
+PRICE_SELECTOR = '[data-id] .c-price'
+
+# 店铺商品列表接口（mtop JSONP / 旧版 asynSearch），抓到时直接用接口里的明文价格
+API_PATTERN = r'mtop\.taobao\.shop|asynSearch'
+
+sys.path.insert(0, BASE_DIR)
+from database.db import get_connection
+from database.history_writer import find_products, load_known_products, write_page
+from database.migrations import migrate
+from spiders.browser.driver import create_driver
+from spiders.browser.loading import format_report, format_wait, open_page, scroll_until_stable, wait_until_ready
+from spiders.browser.network import capture_products, products_arrived
+from spiders.browser.scheduler import PageJob, run_pages
+from spiders.tmall_font import FONT_PATH, decrypt_prices, font_hash, get_table, resolve_font
+
 
-def save_cookies():
-    """保存Safari的cookie到文件"""
+def save_cookies(driver):
+    """保存浏览器的cookie到文件"""
     js = '''var cookies = [];
 try {
     var cookies = document.cookie.split(';').filter(function(c) { return c.trim().length > 0; });
     JSON.stringify({cookies: cookies});
 } catch(e) { JSON.stringify({error: e.message}); }'''
     
-    result = run_js(js)
+    result = driver.run_js(js)
     try:
         data = eval(result) if result else {}
         if 'cookies' in data:
@@ -50,7 +72,7 @@ try {
     return False
 
 
-def load_cookies():
+def load_cookies(driver):
     """加载cookie到当前页面"""
     if not os.path.exists(COOKIE_PATH):
         return False
@@ -65,7 +87,7 @@ def load_cookies():
             js += f'document.cookie = "{cookie.strip()}";'
         
         if js:
-            run_js(js)
+            driver.run_js(js)
         print(f"✅ Cookie已加载: {len(cookies)} 条")
         return True
     except:
@@ -73,95 +95,11 @@ def load_cookies():
     return False
 
 
-def run_js(js_code):
-    """执行JavaScript"""
-    with open('/tmp/tmall_spider.js', 'w') as f:
-        f.write(js_code)
-    
-    cmd = '''osascript <<'AS'
-tell application "Safari"
-    set jsFile to "/tmp/tmall_spider.js"
-    set js to do shell script "cat " & quoted form of jsFile
-    try
-        set theResult to do JavaScript js in current tab of front window
-        if theResult is missing value then
-            return "OK"
-        else
-            return theResult
-        end if
-    on error errMsg
-        return "ERROR:" & errMsg
-    end try
-end tell
-AS'''
-    
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=60)
-    return result.stdout.strip()
-
-
-def open_url(url):
-    """打开URL"""
-    # 确保Safari已打开
-    subprocess.run(['open', '-a', 'Safari'])
-    time.sleep(3)
-    
-    # 创建新文档
-    subprocess.run(['osascript', '-e', 'tell application "Safari" to make new document'])
-    time.sleep(2)
-    
-    # 设置URL
-    subprocess.run(['osascript', '-e', f'tell application "Safari" to set URL of front document to "{url}"'])
-    print(f"✅ 已打开: {url[:60]}...")
-
-
-def close_safari():
-    """关闭Safari"""
-    subprocess.run(['osascript', '-e', 'tell application "Safari" to close every window'])
-    time.sleep(2)
-
-
-def scroll_to_bottom(scroll_steps=50):
-    """滚动到底部（分N步，逐步加载图片 - 参考京东爬虫）"""
-    step = 0
-    
-    # 先滚动到顶部
-    run_js('window.scrollTo(0, 0)')
-    time.sleep(2)
-    
-    for i in range(scroll_steps):
-        step += 1
-        result = run_js('window.scrollBy(0, 500)')  # 每次滚动500像素
-        
-        # 检查是否滚动失败
-        if result.startswith('ERROR'):
-            print(f"      ⚠️ 滚动失败: {result}")
-        
-        time.sleep(1.5)  # 等待1.5秒
-        
-        # 每步打印进度
-        if step % 10 == 0 or step == scroll_steps:
-            print(f"      滚动 {step}/{scroll_steps}")
-    
-    # 滚动回顶部
-    time.sleep(3)  # 等待页面完全加载
-    run_js('window.scrollTo(0, 0)')
-    time.sleep(3)
-
-
-def is_login_page():
-    """检测登录页面"""
-    js = '''var bodyText = document.body ? document.body.innerText || "" : "";
-var isLogin = bodyText.indexOf("密码登录") > -1 || bodyText.indexOf("短信登录") > -1;
-JSON.stringify({isLogin: isLogin});'''
-    
-    result = run_js(js)
-    try:
-        if result.startswith("ERROR:"):
-            return False
-        data = eval(result) if result else {}
-        return data.get('isLogin', False)
-    except:
-        return False
+def scroll_to_bottom(driver, max_steps=50):
+    """一屏一屏下拉到底，商品数和图片数不再变化就停（最多 max_steps 步），结束后回到顶部"""
+    report = scroll_until_stable(driver, '[data-id]', max_steps=max_steps, back_to_top=True)
+    print(f"      {format_report(report)}")
+    return report
 
 
 def extract_style_name(title):
@@ -182,7 +120,52 @@ def extract_style_name(title):
     return title.strip()
 
 
-def get_products():
+def get_font_url(driver):
+    """页面价格字体的地址（.c-price 的 @font-face），找不到返回空字符串"""
+    js = '''var url = "";
+var elem = document.querySelector(".c-price");
+var family = elem ? getComputedStyle(elem).fontFamily.split(",")[0].replace(/["']/g, "").trim() : "";
+for(var i=0; i<document.styleSheets.length && !url; i++) {
+    var rules;
+    try { rules = document.styleSheets[i].cssRules; } catch(e) { continue; }
+    for(var j=0; rules && j<rules.length; j++) {
+        var rule = rules[j];
+        if(rule.type != 5) continue;
+        var name = rule.style.getPropertyValue("font-family").replace(/["']/g, "").trim();
+        var m = rule.style.getPropertyValue("src").match(/url\\(["']?([^"')]+\\.woff2?[^"')]*)/);
+        if(m && (!family || name == family)) { url = m[1]; break; }
+    }
+}
+if(!url) {
+    var entries = performance.getEntriesByType("resource");
+    for(var k=entries.length-1; k>=0; k--) {
+        if(/\\.woff2?(\\?|$)/.test(entries[k].name)) { url = entries[k].name; break; }
+    }
+}
+url;'''
+    result = driver.run_js(js)
+    if not result or result == "OK" or result.startswith("ERROR:"):
+        return ''
+    return result.strip()
+
+
+def resolve_page_font(driver):
+    """下载页面当前的价格字体并识别数字（按轮廓指纹，字体轮换也能解密），失败时用固定字体"""
+    try:
+        url = get_font_url(driver)
+        if not url:
+            print("⚠️ 页面上没找到价格字体，使用固定字体文件")
+            return FONT_PATH
+        font_path = resolve_font(url)
+        get_table(font_path)
+        print(f"🔤 页面字体 {font_hash(font_path)[:8]}: {url[:60]}")
+        return font_path
+    except Exception as e:
+        print(f"⚠️ 页面字体处理失败（{e}），使用固定字体文件")
+        return FONT_PATH
+
+
+def get_products(driver):
     """获取商品"""
     js = '''var products = [];
 var items = document.querySelectorAll("[data-id]");
@@ -218,7 +201,7 @@ for(var i=0; i<items.length; i++) {
 console.log("有价格: " + products.length);
 JSON.stringify(products);'''
     
-    result = run_js(js)
+    result = driver.run_js(js)
     if result.startswith("ERROR:"):
         print(f"      JS错误: {result}")
         return []
@@ -231,23 +214,17 @@ JSON.stringify(products);'''
         return []
 
 
-def decrypt_price(encrypted):
-    """解密价格"""
-    if not encrypted:
-        return 0
-    try:
-        font = TTFont(FONT_PATH)
-        cmap = font['cmap'].getBestCmap()
-        base = {'.':'.', 'zero':'0', 'one':'1', 'two':'2', 'three':'3', 'four':'4', 'five':'5', 'six':'6', 'seven':'7', 'eight':'8', 'nine':'9'}
-        price = ''
-        for c in encrypted:
-            name = cmap.get(ord(c))
-            if name and name in base:
-                price += base[name]
-        font.close()
-        return round(float(price) / 100, 2) if price else 0
-    except:
-        return 0
+def get_api_products(capture, dom_count=0):
+    """从抓到的店铺接口响应取商品（价格是明文，带 price 字段，不用解密）
+    接口商品比页面上已渲染的少时（没抓全）返回 []，走 DOM 解析"""
+    products = []
+    for item in capture_products(capture):
+        url = item['url'] if 'id=' in item['url'] else f"https://detail.tmall.com/item.htm?id={item['id']}"
+        products.append({'id': item['id'], 'url': url, 'title': item['title'], 'price': item['price']})
+    if products and len(products) < dom_count:
+        print(f"      接口只有 {len(products)} 个商品（页面 {dom_count} 个），改用页面解析")
+        return []
+    return products
 
 
 def extract_level(title):
@@ -268,22 +245,22 @@ def extract_level(title):
     return ''
 
 
-def save_products(products, page_name, page_url):
+def save_products(products, page_name, page_url, known=None, font_path=FONT_PATH):
     """保存商品
+    known: 爬取开始时加载的商品字典（load_known_products），随写入更新；不传则按页查库
+    font_path: 解密价格用的字体（resolve_page_font 取页面当前字体）；接口来的商品带明文 price，不用解密
     规则：
     1. 过滤尾款/预售/定金类商品（不入库）
-    2. 根据商品URL中的id查询商品表（product_id）
-    3. 存在则更新；不存在则跳过
-    4. 历史价格表：根据 product_id + 日期查询，有则更新，没有则插入
+    2. 根据商品URL中的id在已知商品字典里查找
+    3. 存在则更新价格；不存在则新增
+    4. 历史价格表：同一 product_id + 日期只有一条，有则更新为最新价格，没有则插入
+    5. 整页在一个事务里批量写入（database/history_writer.py）
     """
     if not products:
         return 0
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    updated_count = 0
-    today = datetime.now().strftime('%Y%m%d')
+    conn = get_connection(DB_PATH)
+    migrate(conn)
     
     # 过滤尾款/预售/定金类商品
     PRESALE_KEYWORDS = ['尾款', '预售', '定金', '预付', '预订', '全款预售']
@@ -294,181 +271,175 @@ def save_products(products, page_name, page_url):
     if filtered_count > 0:
         print(f"  🚫 过滤掉 {filtered_count} 个尾款/预售类商品")
     
+    # 从URL中提取id
+    parsed = []
     for i, p in enumerate(products, 1):
-        url = p.get('url', '')
-        
-        # 从URL中提取id
-        match = re.search(r'id=(\d+)', url)
+        match = re.search(r'id=(\d+)', p.get('url', ''))
         if not match:
             print(f"  [{i}/{len(products)}] ❌ URL格式错误")
             continue
+        parsed.append((match.group(1), p))
+    
+    # 整页价格一次解密（字体映射表按内容哈希缓存），接口来的明文价格直接用
+    encrypted = [p.get('encryptedPrice', '') for _, p in parsed if 'price' not in p]
+    decrypted = iter(decrypt_prices(encrypted, font_path) if encrypted else [])
+    prices = [p['price'] if 'price' in p else next(decrypted) for _, p in parsed]
+    
+    existing = known if known is not None else find_products(conn, 'tmall', [sku for sku, _ in parsed])
+    
+    new_products = {}
+    price_updates = {}
+    history = {}
+    
+    for i, ((product_id_from_url, p), price) in enumerate(zip(parsed, prices), 1):
+        url = p.get('url', '')
+        print(f"  [{i}/{len(parsed)}] ID:{product_id_from_url}...", end='')
         
-        product_id_from_url = match.group(1)
-        print(f"  [{i}/{len(products)}] ID:{product_id_from_url}...", end='')
-        
-        # 解密价格
-        price = decrypt_price(p.get('encryptedPrice', ''))
         if price == 0:
             print(f" ⚠️ 价格解密失败，继续...")
         else:
             print(f" ¥{price}")
         
-        # 根据 id 查询商品表
-        cursor.execute("SELECT id, price FROM tmall_products WHERE product_id = ?", (product_id_from_url,))
-        row = cursor.fetchone()
-        
+        row = existing.get(product_id_from_url)
         if row:
-            db_id = row[0]
-            old_price = row[1]
+            old_price = row['price']
             
             # 更新商品价格
             if old_price != price:
-                cursor.execute("UPDATE tmall_products SET price=?, updated_at=? WHERE id=?",
-                            (price, datetime.now().isoformat(), db_id))
+                price_updates[product_id_from_url] = price
                 print(f" ✅ ¥{price} (¥{old_price}→¥{price})")
             else:
+                price_updates.pop(product_id_from_url, None)
                 print(f" ✅ ¥{price} (未变)")
             
-            # 历史价格表：根据 product_id + 日期查询
-            cursor.execute("SELECT id FROM tmall_price_history WHERE product_id = ? AND created_at = ?", 
-                        (db_id, today))
-            if cursor.fetchone():
-                cursor.execute("UPDATE tmall_price_history SET price=? WHERE product_id=? AND created_at=?",
-                            (price, db_id, today))
-                print(f"    📜 更新历史")
-            else:
-                cursor.execute("INSERT INTO tmall_price_history (product_id, product_url, price, style_name, created_at) VALUES (?, ?, ?, ?, ?)",
-                            (db_id, url, price, '', today))
-                print(f"    📜 新增历史")
-            
-            updated_count += 1
+            history[product_id_from_url] = {'row_id': row['id'], 'url': url, 'price': price}
+        elif product_id_from_url in new_products:
+            # 同一页重复出现的新商品，价格以最后一次为准
+            new_products[product_id_from_url]['price'] = price
+            if price > 0:
+                history[product_id_from_url] = {'sku': product_id_from_url, 'url': url, 'price': price}
         else:
             # 商品不存在，插入新记录（即使价格解密失败也要保存）
             title = p.get('title', '')[:500]
-            style_name = extract_style_name(title)
-            level = extract_level(title)
-            
-            cursor.execute("""
-                INSERT INTO tmall_products 
-                    (product_id, product_url, title, price, status, shop_name, shop_url, level, style_name, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                product_id_from_url, url, title,
-                price, "available",
-                "变形金刚玩具旗舰店", url,
-                level, style_name,
-                datetime.now().isoformat(), datetime.now().isoformat()
-            ))
-            conn.commit()
+            now = datetime.now().isoformat()
+            new_products[product_id_from_url] = {
+                'product_id': product_id_from_url, 'product_url': url, 'title': title,
+                'price': price, 'status': "available",
+                'shop_name': "变形金刚玩具旗舰店", 'shop_url': url,
+                'level': extract_level(title), 'style_name': extract_style_name(title),
+                'created_at': now, 'updated_at': now,
+            }
             
             if price > 0:
                 print(f" ✅ ¥{price} 🆕")
+                # 新商品也记录历史
+                history[product_id_from_url] = {'sku': product_id_from_url, 'url': url, 'price': price}
             else:
                 print(f" ⚠️ 价格解密失败 🆕")
-            
-            # 新商品也记录历史
-            if price > 0:
-                cursor.execute("SELECT id FROM tmall_products WHERE product_id = ?", (product_id_from_url,))
-                new_row = cursor.fetchone()
-                if new_row:
-                    cursor.execute("INSERT INTO tmall_price_history (product_id, product_url, price, style_name, created_at) VALUES (?, ?, ?, ?, ?)",
-                                (new_row[0], url, price, '', today))
-                    print(f"    📜 新增历史")
-            
-            updated_count += 1
     
-    conn.commit()
+    result = write_page(conn, 'tmall', new_products=list(new_products.values()),
+                        price_updates=price_updates.items(), history=list(history.values()), known=known)
+    print(f"  💾 新商品 {result['new_products']}，改价 {len(price_updates)}，"
+          f"新增历史 {result['history_new']}，更新历史 {result['history_existing']}")
+    
     conn.close()
-    return updated_count
+    return len(parsed)
 
 
-def crawl_one_page(url, page_name, scroll_steps):
-    """爬取单页（打开Safari → 下载字体 → 滚动 → 爬数据 → 关闭Safari）"""
-    print(f"\n{'='*60}")
-    print(f"📄 {page_name}: {url[:60]}...")
-    print("="*60)
-    
-    # 1. 打开Safari，输入网址
-    print(f"🔗 打开Safari，输入网址...")
-    open_url(url)
-    time.sleep(30)  # 等待页面加载
-    
-    # 确认页面已打开
-    result = run_js('document.URL')
-    print(f"✅ 当前页面: {result[:80]}...")
-    
-    # 2. 使用固定字体文件（不下载新字体，避免映射错误）
-    print(f"🔤 使用固定字体文件...")
-    
-    # 等待页面完全加载
-    print("⏳ 等待页面加载...")
-    time.sleep(15)
+def fetch_page(driver, url, page_name, max_steps):
+    """爬取单页（打开页面 → 识别页面字体 → 滚动 → 爬数据 → 关闭页面），返回 (商品列表, 字体文件)
+    能抓到店铺接口响应（CDP 驱动）时直接用接口数据，跳过字体识别和滚动
+    在爬取标签页的线程里执行，写库交给 save_products"""
+    print(f"\n📄 {page_name}: {url[:60]}...")
     
-    # 3. 逐步下拉
-    print(f"📜 逐步下拉 ({scroll_steps}次)...")
-    scroll_to_bottom(scroll_steps)
+    waits = []  # 各次等待的报告，最后汇总
     
-    # 等待数据加载
-    print("⏳ 等待数据加载...")
-    time.sleep(10)
-    
-    # 4. 爬取页面数据
-    print("🔍 获取商品...")
-    products = get_products()
-    
-    if not products:
-        print("⚠️ 无商品，尝试重新获取...")
-        time.sleep(20)
-        products = get_products()
+    # 1. 打开浏览器，输入网址，等到商品价格出现（最多45秒）；打开前开始抓接口响应（Safari 不支持，为 None），
+    #    接口数据先到就不等页面渲染
+    print(f"🔗 {page_name} 打开浏览器（{driver.name}），输入网址...")
+    capture = driver.capture_responses(API_PATTERN)
+    try:
+        waits.append(open_page(driver, url, PRICE_SELECTOR, timeout=45, done=products_arrived(capture)))
+        print(f"⏳ {page_name} 页面加载: {format_wait(waits[-1])}")
+        products = get_api_products(capture, waits[-1]['items'])
+    finally:
+        if capture is not None:
+            capture.stop()
+    
+    if products:
+        print(f"📡 {page_name} 接口返回 {len(products)} 个商品，跳过字体识别和下拉")
+        font_path = FONT_PATH
+    else:
+        # 2. 页面当前的价格字体（天猫会轮换字体，按字形轮廓识别数字）
+        font_path = resolve_page_font(driver)
+        
+        # 3. 逐步下拉
+        print(f"📜 {page_name} 逐步下拉 (最多{max_steps}步)...")
+        scroll_to_bottom(driver, max_steps)
+        
+        # 4. 爬取页面数据
+        products = get_products(driver)
     
     if not products:
-        print("⚠️ 仍然无商品")
-        return 0
-    
-    print(f"✅ 获取到 {len(products)} 个商品")
-    
-    # 保存
-    print(f"💾 保存 {len(products)} 个商品...")
-    new_count = save_products(products, page_name, url)
-    
-    # 保存cookie
-    print("💾 保存Cookie...")
-    save_cookies()
-    
-    # 5. 关闭Safari
-    print("🔒 关闭Safari...")
-    close_safari()
-    
-    print(f"✅ {page_name} 完成，新增 {new_count} 个")
-    return new_count
+        print(f"⚠️ {page_name} 无商品，等待后重新获取...")
+        waits.append(wait_until_ready(driver, PRICE_SELECTOR, timeout=20))
+        print(f"⏳ {format_wait(waits[-1])}")
+        products = get_products(driver)
+    
+    waited = sum(w['seconds'] for w in waits)
+    fixed = 55 + 20 * (len(waits) - 1)
+    print(f"⏱️ {page_name} 等待共 {waited:.1f} 秒（原来固定 {fixed} 秒）")
+    
+    if products:
+        print(f"✅ {page_name} 获取到 {len(products)} 个商品")
+        # 保存cookie
+        save_cookies(driver)
+    else:
+        print(f"⚠️ {page_name} 仍然无商品")
+    
+    # 5. 关闭页面
+    driver.close()
+    return products, font_path
+
+
+def page_jobs(known):
+    """三页的爬取任务（spiders/browser/scheduler.py 并发执行），每页结果为写入的商品数"""
+    jobs = []
+    for url, page_name, max_steps in PAGES:
+        def save(data, url=url, page_name=page_name):
+            products, font_path = data
+            if not products:
+                return 0
+            print(f"\n💾 {page_name} 保存 {len(products)} 个商品...")
+            count = save_products(products, page_name, url, known, font_path)
+            print(f"✅ {page_name} 完成，新增 {count} 个")
+            return count
+        
+        jobs.append(PageJob(url, lambda tab, url, page_name=page_name, max_steps=max_steps:
+                            fetch_page(tab, url, page_name, max_steps), save, page_name))
+    return jobs
 
 
 def main():
     print("="*60)
     print("🚀 天猫爬虫 - 3页完整版")
     print("="*60)
-    print("结构：打开Safari → 下载字体 → 下拉滚动 → 爬数据 → 关闭Safari")
+    print("结构：打开页面 → 识别字体 → 下拉滚动 → 爬数据 → 关闭页面（多标签页并发，写库单独一个线程）")
     print("="*60)
     
-    # 第1页：50步滚动
-    print("\n📄 爬取第1页（50步滚动）...")
-    new1 = crawl_one_page(PAGE1_URL, "第1页", 50)
-    
-    # 间隔30秒
-    print("\n⏳ 间隔30秒后再爬第2页...")
-    time.sleep(30)
-    
-    # 第2页：50步滚动
-    print("\n📄 爬取第2页（50步滚动）...")
-    new2 = crawl_one_page(PAGE2_URL, "第2页", 50)
-    
-    # 间隔30秒
-    print("\n⏳ 间隔30秒后再爬第3页...")
-    time.sleep(30)
+    # 已入库商品一次加载，之后每页判断新老商品、价格是否变化都查内存
+    conn = get_connection(DB_PATH)
+    migrate(conn)
+    known = load_known_products(conn, 'tmall')
+    conn.close()
+    print(f"📦 已有商品: {len(known)}")
     
-    # 第3页：10步滚动
-    print("\n📄 爬取第3页（10步滚动）...")
-    new3 = crawl_one_page(PAGE3_URL, "第3页", 10)
+    # 页面间隔由限速控制（SpiderConfig.REQUEST_DELAY），不再固定间隔30秒
+    driver = create_driver()
+    try:
+        new1, new2, new3 = [count or 0 for count in run_pages(driver, page_jobs(known))]
+    finally:
+        driver.quit()
     
     # 统计
     conn = sqlite3.connect(DB_PATH)
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+天猫价格字体解密
+
+天猫页面的价格用自定义字体显示，HTML 里是私有区字符，字体 cmap 把每个字符映射到 zero/one/... 字形。
+原来每解密一个价格都要打开一次 WOFF、解析 cmap，这里每个字体文件只解析一次：
+按文件内容的哈希缓存成 str.translate 的映射表，一页价格一次批量解密。
+
+天猫会轮换字体：码位和字形名都会变，但数字的轮廓不变。所以不按字形名识别，而是给每个字形的轮廓算指纹，
+和已知字体（data/fonts/tmall_price.woff）学到的 指纹 -> 数字 参考表比对。
+参考表保存在 data/fonts/glyph_reference.json，每个字体（按内容哈希）识别出的映射保存在
+data/fonts/font_mappings.json，同一个字体只识别一次。页面当前字体用 resolve_font() 下载。
+
+微基准：python spiders/tmall_font.py
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from typing import Dict, Iterable, List, Optional, Union
+
+from fontTools.pens.recordingPen import RecordingPen
+from fontTools.ttLib import TTFont
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FONT_DIR = os.path.join(BASE_DIR, 'data', 'fonts')
+FONT_PATH = os.path.join(FONT_DIR, 'tmall_price.woff')
+# 指纹 -> 数字 参考表（从已知字体学习）
+REFERENCE_PATH = os.path.join(FONT_DIR, 'glyph_reference.json')
+# 字体内容哈希 -> {码位: 数字}
+MAPPING_CACHE_PATH = os.path.join(FONT_DIR, 'font_mappings.json')
+# 下载的页面字体
+FONT_CACHE_DIR = os.path.join(FONT_DIR, 'cache')
+
+DOWNLOAD_TIMEOUT = 15
+
+# 字形名 -> 数字（小数点不参与，价格按“分”解析后除以 100）
+DIGIT_GLYPHS = {
+    'zero': '0', 'one': '1', 'two': '2', 'three': '3', 'four': '4',
+    'five': '5', 'six': '6', 'seven': '7', 'eight': '8', 'nine': '9',
+}
+
+
+class _TranslateTable(dict):
+    """str.translate 映射表：不是数字字形的字符一律删除"""
+
+    def __missing__(self, key):
+        return None
+
+
+# 字体内容哈希 -> 映射表
+_tables: Dict[str, _TranslateTable] = {}
+# 字体路径 -> (修改时间, 大小, 内容哈希)，文件没变就不重新读取
+_file_hashes: Dict[str, tuple] = {}
+# 多个爬取标签页（线程）同时解密：映射表缓存、参考表和 font_mappings.json 的读改写都在锁里做
+_lock = threading.RLock()
+
+
+def font_hash(font_path: str = FONT_PATH) -> str:
+    """字体文件内容的 sha1（按修改时间和大小缓存）"""
+    stat = os.stat(font_path)
+    cached = _file_hashes.get(font_path)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    with open(font_path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    _file_hashes[font_path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def glyph_fingerprint(glyph_set, name: str) -> Optional[str]:
+    """字形轮廓指纹：绘制指令 + 相对包围盒左下角的坐标（平移不影响），空字形返回 None"""
+    pen = RecordingPen()
+    glyph_set[name].draw(pen)
+    points = [pt for _, args in pen.value for pt in args]
+    if not points:
+        return None
+    min_x = min(x for x, _ in points)
+    min_y = min(y for _, y in points)
+    outline = [(op, [(round(x - min_x), round(y - min_y)) for x, y in args]) for op, args in pen.value]
+    return hashlib.sha1(repr(outline).encode()).hexdigest()
+
+
+def learn_reference(font_path: str = FONT_PATH) -> Dict[str, str]:
+    """从字形名正确的已知字体学习 指纹 -> 数字"""
+    font = TTFont(font_path)
+    try:
+        glyph_set = font.getGlyphSet()
+        reference = {}
+        for name, digit in DIGIT_GLYPHS.items():
+            if name in glyph_set:
+                fingerprint = glyph_fingerprint(glyph_set, name)
+                if fingerprint:
+                    reference[fingerprint] = digit
+    finally:
+        font.close()
+    return reference
+
+
+_reference: Dict[str, str] = {}
+
+
+def load_reference() -> Dict[str, str]:
+    """参考表：优先读保存的文件，没有则从已知字体学习并保存"""
+    with _lock:
+        if not _reference:
+            if os.path.exists(REFERENCE_PATH):
+                with open(REFERENCE_PATH, encoding='utf-8') as f:
+                    _reference.update(json.load(f))
+            else:
+                _reference.update(learn_reference(FONT_PATH))
+                with open(REFERENCE_PATH, 'w', encoding='utf-8') as f:
+                    json.dump(_reference, f, indent=2, sort_keys=True)
+    return _reference
+
+
+def _load_mapping_cache() -> dict:
+    if not os.path.exists(MAPPING_CACHE_PATH):
+        return {}
+    try:
+        with open(MAPPING_CACHE_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_mapping(digest: str, mapping: Dict[int, str]):
+    with _lock:
+        cache = _load_mapping_cache()
+        cache[digest] = {str(code): digit for code, digit in mapping.items()}
+        # 每次写一个独立的临时文件再替换，写到一半的文件不会被读到
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=os.path.dirname(MAPPING_CACHE_PATH),
+                                         prefix='.font_mappings.', suffix='.tmp', delete=False) as f:
+            json.dump(cache, f, indent=1, sort_keys=True)
+        try:
+            os.replace(f.name, MAPPING_CACHE_PATH)
+        except OSError:
+            os.remove(f.name)
+            raise
+
+
+def identify_digits(font_path: str) -> Dict[int, str]:
+    """按轮廓指纹识别字体里的数字，返回 {码位: 数字}
+
+    指纹不在参考表里的字形再按字形名识别（兼容字形名正确的字体）。
+    """
+    reference = load_reference()
+    font = TTFont(font_path)
+    try:
+        glyph_set = font.getGlyphSet()
+        cmap = font['cmap'].getBestCmap()
+        digits = {}
+        for name in set(cmap.values()):
+            digit = reference.get(glyph_fingerprint(glyph_set, name)) or DIGIT_GLYPHS.get(name)
+            if digit:
+                digits[name] = digit
+        return {code: digits[name] for code, name in cmap.items() if name in digits}
+    finally:
+        font.close()
+
+
+def build_table(font_path: str, digest: Optional[str] = None) -> _TranslateTable:
+    """字体的 {码位: 数字} 映射表，识别结果按字体内容哈希持久化"""
+    digest = digest or font_hash(font_path)
+    cached = _load_mapping_cache().get(digest)
+    if cached is not None:
+        return _TranslateTable({int(code): digit for code, digit in cached.items()})
+
+    mapping = identify_digits(font_path)
+    found = set(mapping.values())
+    if len(found) < len(DIGIT_GLYPHS):
+        print(f"⚠️ 字体 {digest[:8]} 只识别出数字 {''.join(sorted(found)) or '无'}，价格可能解密失败")
+    else:
+        _save_mapping(digest, mapping)
+    return _TranslateTable(mapping)
+
+
+def get_table(font_path: str = FONT_PATH) -> _TranslateTable:
+    """字体对应的映射表（同一内容的字体只解析一次）"""
+    digest = font_hash(font_path)
+    table = _tables.get(digest)
+    if table is None:
+        with _lock:
+            # 等锁期间别的线程可能已经建好了
+            table = _tables.get(digest)
+            if table is None:
+                table = _tables[digest] = build_table(font_path, digest)
+    return table
+
+
+def resolve_font(source: Union[str, bytes]) -> str:
+    """页面当前字体 -> 本地路径
+
+    source 可以是字体 URL（下载）、字体文件内容或本地路径；下载的字体按内容哈希存到 data/fonts/cache。
+    """
+    if isinstance(source, str) and not source.startswith(('http://', 'https://', '//')):
+        return source
+
+    if isinstance(source, str):
+        url = 'https:' + source if source.startswith('//') else source
+        request = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+        with urllib.request.urlopen(request, timeout=DOWNLOAD_TIMEOUT) as resp:
+            data = resp.read()
+        ext = '.woff2' if url.split('?')[0].endswith('.woff2') else '.woff'
+    else:
+        data = source
+        ext = '.woff2' if data[:4] == b'wOF2' else '.woff'
+
+    os.makedirs(FONT_CACHE_DIR, exist_ok=True)
+    path = os.path.join(FONT_CACHE_DIR, hashlib.sha1(data).hexdigest() + ext)
+    if not os.path.exists(path):
+        with open(path, 'wb') as f:
+            f.write(data)
+    return path
+
+
+def _to_price(digits: str) -> float:
+    return round(float(digits) / 100, 2) if digits else 0
+
+
+def decrypt_price(encrypted: str, font_path: str = FONT_PATH) -> float:
+    """解密单个价格，失败返回 0"""
+    return decrypt_prices([encrypted], font_path)[0]
+
+
+def decrypt_prices(encrypted_list: Iterable[str], font_path: str = FONT_PATH) -> List[float]:
+    """批量解密一页价格，失败的返回 0"""
+    encrypted_list = list(encrypted_list)
+    try:
+        table = get_table(font_path)
+    except Exception:
+        return [0] * len(encrypted_list)
+
+    prices = []
+    for encrypted in encrypted_list:
+        try:
+            prices.append(_to_price(encrypted.translate(table)) if encrypted else 0)
+        except ValueError:
+            prices.append(0)
+    return prices
+
+
+def _decrypt_price_uncached(encrypted, font_path=FONT_PATH):
+    """原实现：每个价格打开一次字体（微基准对照用）"""
+    if not encrypted:
+        return 0
+    try:
+        font = TTFont(font_path)
+        cmap = font['cmap'].getBestCmap()
+        price = ''.join(DIGIT_GLYPHS[cmap[ord(c)]] for c in encrypted if cmap.get(ord(c)) in DIGIT_GLYPHS)
+        font.close()
+        return _to_price(price)
+    except Exception:
+        return 0
+
+
+def _rotated_font(font_path: str, seed: int = 0):
+    """模拟天猫轮换字体：字形改名、码位重排、轮廓整体平移（自检用），返回 (字体内容, {原码位: 新码位})"""
+    import io
+    import random
+
+    rng = random.Random(seed)
+    font = TTFont(font_path)
+    order = font.getGlyphOrder()
+    names = {name: name if i == 0 else f'glyph{rng.randrange(16 ** 6):06x}{i}' for i, name in enumerate(order)}
+    glyf = font['glyf']
+    for name in order:
+        glyph = glyf[name]
+        if glyph.numberOfContours > 0:
+            glyph.coordinates.translate((7, 3))
+            glyph.recalcBounds(glyf)
+    glyf.glyphs = {names[n]: g for n, g in glyf.glyphs.items()}
+    font['hmtx'].metrics = {names[n]: m for n, m in font['hmtx'].metrics.items()}
+    private_codes = [code for code in font['cmap'].getBestCmap() if code > 0xFF]
+    shuffled = private_codes[:]
+    rng.shuffle(shuffled)
+    remap = dict(zip(private_codes, shuffled))
+    for table in font['cmap'].tables:
+        table.cmap = {remap[code]: names[name] for code, name in table.cmap.items() if code in remap}
+    font['post'].formatType = 3.0  # 不保存字形名
+    font.setGlyphOrder([names[n] for n in order])
+    glyf.glyphOrder = font.getGlyphOrder()
+    buffer = io.BytesIO()
+    font.save(buffer)
+    font.close()
+    return buffer.getvalue(), remap
+
+
+def _sample_prices(font_path, rng, count=60):
+    """用字体的码位拼出一页加密价格"""
+    font = TTFont(font_path)
+    codes_by_digit = {}
+    cmap = font['cmap'].getBestCmap()
+    digits = identify_digits(font_path)
+    for code in cmap:
+        if code > 0xFF and code in digits:
+            codes_by_digit.setdefault(digits[code], []).append(chr(code))
+    font.close()
+    # 5~6 位数字（分）
+    values = [rng.randint(1000, 999999) for _ in range(count)]
+    return values, [''.join(rng.choice(codes_by_digit[d]) for d in str(v)) for v in values]
+
+
+if __name__ == '__main__':
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+
+    font_path = sys.argv[1] if len(sys.argv) > 1 else FONT_PATH
+    rng = random.Random(42)
+
+    # 自检不写项目里的映射缓存
+    tmp_dir = tempfile.mkdtemp()
+    MAPPING_CACHE_PATH = os.path.join(tmp_dir, 'font_mappings.json')
+    FONT_CACHE_DIR = os.path.join(tmp_dir, 'cache')
+
+    _, samples = _sample_prices(font_path, rng)
+
+    start = time.perf_counter()
+    expected = [_decrypt_price_uncached(s, font_path) for s in samples]
+    uncached = (time.perf_counter() - start) / len(samples)
+
+    _tables.clear()
+    _file_hashes.clear()
+    start = time.perf_counter()
+    first = decrypt_prices(samples, font_path)
+    cold = time.perf_counter() - start
+
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        cached = decrypt_prices(samples, font_path)
+    warm = (time.perf_counter() - start) / (rounds * len(samples))
+
+    assert first == cached == expected, '缓存结果与原实现不一致'
+    print(f"✅ {len(samples)} 个价格解密结果一致，例如 {expected[:3]}")
+    print(f"   每个价格打开字体: {uncached * 1e6:10.1f} µs/个")
+    print(f"   首次（解析字体）: {cold * 1e3:10.2f} ms/页")
+    print(f"   缓存后批量解密:   {warm * 1e6:10.3f} µs/个  (x{uncached / warm:.0f})")
+
+    # 轮换字体：字形名、码位都变了，按轮廓指纹识别
+    data, remap = _rotated_font(font_path, seed=7)
+    rotated_path = resolve_font(data)
+    font = TTFont(rotated_path)
+    assert not any(name in DIGIT_GLYPHS for name in font['cmap'].getBestCmap().values()), '轮换字体还有数字字形名'
+    font.close()
+
+    values, samples = _sample_prices(font_path, rng)
+    rotated = [''.join(chr(remap[ord(c)]) for c in s) for s in samples]
+    _tables.clear()
+    assert decrypt_prices(rotated, rotated_path) == [round(v / 100, 2) for v in values], '轮换字体解密错误'
+    print(f"✅ 轮换字体（字形改名、码位重排、轮廓平移）按轮廓指纹解密 {len(values)} 个价格正确")
+    _tables.clear()
+    assert get_table(rotated_path) == build_table(rotated_path)
+    print(f"   映射已按字体哈希缓存: {', '.join(h[:8] for h in _load_mapping_cache())}")
+
+    # 多个标签页同时遇到不同的新字体：映射都要落盘，不能互相覆盖，也不能留下临时文件
+    rotated_paths = [resolve_font(_rotated_font(font_path, seed=seed)[0]) for seed in range(20, 28)]
+    _tables.clear()
+    with ThreadPoolExecutor(len(rotated_paths)) as pool:
+        tables = list(pool.map(get_table, rotated_paths))
+    assert all(len(set(table.values())) == len(DIGIT_GLYPHS) for table in tables)
+    saved = _load_mapping_cache()
+    assert all(font_hash(path) in saved for path in rotated_paths), '并发写映射缓存丢了记录'
+    assert not [name for name in os.listdir(tmp_dir) if name.endswith('.tmp')], '留下了临时文件'
+    print(f"✅ {len(rotated_paths)} 个线程同时识别不同字体，映射全部写入缓存")
@@ -0,0 +1,56 @@
+"""价格走势降采样（web/downsample.py）"""
+
+import numpy as np
+import pytest
+
+from web.downsample import downsample_indices, local_minima_indices, lttb_indices
+
+
+@pytest.fixture
+def daily_prices():
+    """模拟每日价格：大部分时间不变，偶尔调价/促销，第 1234~1239 天一次大促"""
+    rng = np.random.default_rng(0)
+    days = np.arange(3000)
+    prices = np.round(199 + np.cumsum(rng.choice([0, 0, 0, 0, 0, 0, 0, -5, 5], size=len(days))), 2)
+    prices[1234:1240] = prices.min() - 30
+    return days, prices
+
+
+def test_downsample_keeps_shape_and_minima(daily_prices):
+    days, prices = daily_prices
+    idx = downsample_indices(days, prices, 200)
+
+    assert idx[0] == 0 and idx[-1] == len(days) - 1, "首尾点必须保留"
+    assert np.all(np.diff(idx) > 0), "下标必须升序且不重复"
+    assert prices[idx].min() == prices.min(), "全局最低价必须保留"
+    assert len(idx) < len(days) / 2, "点数应明显减少"
+    assert set(local_minima_indices(prices)) <= set(idx), "所有局部最低点必须保留"
+    assert 1234 in idx and 1239 in idx, "最低价区间的首尾都要保留"
+
+
+def test_lttb_selects_requested_number_of_points(daily_prices):
+    days, prices = daily_prices
+    idx = lttb_indices(days, prices, 200)
+    assert len(idx) == 200
+    assert idx[0] == 0 and idx[-1] == len(days) - 1
+
+
+def test_fewer_points_than_requested_are_returned_unchanged(daily_prices):
+    days, prices = daily_prices
+    assert list(downsample_indices(days[:50], prices[:50], 200)) == list(range(50))
+    assert list(downsample_indices(days[:50], prices[:50], None)) == list(range(50))
+
+
+@pytest.mark.parametrize('n_out', [1, 2])
+def test_small_point_counts_return_first_and_last(n_out):
+    days = np.arange(1000)
+    prices = np.linspace(300, 100, len(days))  # 单调下降，没有中间的局部最低点
+    assert list(lttb_indices(days, prices, n_out)) == [0, len(days) - 1]
+    assert list(downsample_indices(days, prices, n_out)) == [0, len(days) - 1]
+
+
+def test_small_point_counts_still_keep_local_minima(daily_prices):
+    days, prices = daily_prices
+    idx = downsample_indices(days, prices, 1)
+    assert set(idx) == {0, len(days) - 1} | set(local_minima_indices(prices))
+    assert len(idx) < len(days) / 2
@@ -0,0 +1,100 @@
+"""店铺列表页离线回放：接口路径和 DOM 路径解析出的商品一致，接口数据到达后不等页面渲染"""
+
+import functools
+import os
+
+import pytest
+
+from spiders import jd_spider_multi_page as jd
+from spiders import tmall_fixed
+from spiders.browser.driver import ReplayDriver
+from spiders.browser.loading import PROBE_JS, open_page, scroll_until_stable, wait_until_ready
+from spiders.tmall_font import decrypt_prices
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'spiders', 'browser', 'fixtures', 'listing_responses.json')
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def __call__(self):
+        return self.now
+
+
+class DomOnlyDriver(ReplayDriver):
+    """不能抓包的驱动（如 Safari）：只能解析页面"""
+
+    def capture_responses(self, pattern):
+        return None
+
+
+@pytest.fixture
+def clock(monkeypatch, tmp_path):
+    clock = FakeClock()
+    for module in (tmall_fixed, jd):
+        monkeypatch.setattr(module, 'open_page', functools.partial(open_page, sleep=clock.sleep, clock=clock))
+        monkeypatch.setattr(module, 'scroll_until_stable',
+                            functools.partial(scroll_until_stable, sleep=clock.sleep, clock=clock))
+    monkeypatch.setattr(tmall_fixed, 'wait_until_ready',
+                        functools.partial(wait_until_ready, sleep=clock.sleep, clock=clock))
+    monkeypatch.setattr(tmall_fixed, 'COOKIE_PATH', str(tmp_path / 'tmall_cookies.json'))
+    return clock
+
+
+def scrolled(driver):
+    return any(js.startswith(PROBE_JS[:20]) for _, js in driver.calls)
+
+
+def tmall_rows(products, font_path):
+    """统一成 (编号, 标题, 价格)：DOM 路径的价格要用页面字体解密"""
+    if products and 'price' not in products[0]:
+        prices = decrypt_prices([p['encryptedPrice'] for p in products], font_path)
+        products = [dict(p, price=price) for p, price in zip(products, prices)]
+    return sorted((p['url'].split('id=')[1].split('&')[0], p['title'], p['price']) for p in products)
+
+
+def test_tmall_api_matches_dom(clock):
+    api_driver = ReplayDriver(FIXTURE)
+    api, font_path = tmall_fixed.fetch_page(api_driver, tmall_fixed.PAGE1_URL, '第1页', 50)
+    # 接口响应在第一次轮询时已到：不等页面渲染、不识别字体、不下拉
+    assert clock.now == 0
+    assert not scrolled(api_driver)
+    assert all('price' in p for p in api)
+
+    dom_driver = DomOnlyDriver(FIXTURE)
+    dom, dom_font = tmall_fixed.fetch_page(dom_driver, tmall_fixed.PAGE1_URL, '第1页', 50)
+    assert scrolled(dom_driver)
+    assert all('encryptedPrice' in p for p in dom)
+
+    assert tmall_rows(api, font_path) == tmall_rows(dom, dom_font)
+    assert tmall_rows(api, font_path) == [('888000111', '变形金刚 MP-44 擎天柱 3.0 大师级', 1299.0),
+                                          ('888000222', '变形金刚 SS86 系列 威震天 航行家级', 259.0)]
+
+
+def test_tmall_partial_api_falls_back_to_dom(clock):
+    driver = ReplayDriver(FIXTURE)
+    products, font_path = tmall_fixed.fetch_page(driver, tmall_fixed.PAGE2_URL, '第2页', 50)
+    # 接口只抓到 1 个，页面已渲染 3 个：改用页面解析
+    assert scrolled(driver)
+    assert len(tmall_rows(products, font_path)) == 3
+    assert tmall_rows(products, font_path)[0] == ('888000333', '变形金刚 工作室系列 SS-109 震荡波 领袖级', 459.0)
+
+
+def test_jd_api_matches_dom(clock):
+    api_driver = ReplayDriver(FIXTURE)
+    api, waited = jd.fetch_page(api_driver, 1)
+    assert waited == 0 and clock.now == 0
+    assert not scrolled(api_driver)
+
+    dom_driver = DomOnlyDriver(FIXTURE)
+    dom, waited = jd.fetch_page(dom_driver, 1)
+    assert waited > 0
+    assert scrolled(dom_driver)
+
+    assert len(api) == 2
+    assert sorted(api, key=lambda p: p['id']) == sorted(dom, key=lambda p: p['id'])
@@ -0,0 +1,69 @@
+"""价格历史查询走索引（database/history_schema.py 的 EXPLAIN QUERY PLAN 检查）"""
+
+import pytest
+
+from database.db import get_connection
+from database.history_schema import check_query_plans
+from database.migrations import migrate
+
+# 迁移前（user_version = 0）的表结构：价格历史的 product_id 还是 TEXT
+BASE_SCHEMA = '''
+CREATE TABLE jd_price_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, product_id TEXT, product_url TEXT, price REAL,
+    style_name TEXT, created_at TEXT
+);
+CREATE TABLE tmall_price_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, product_id TEXT, product_url TEXT, price REAL,
+    style_name TEXT, created_at TEXT
+);
+CREATE TABLE jd_products (
+    id INTEGER PRIMARY KEY, product_id TEXT, product_url TEXT, image_url TEXT, title TEXT, price REAL,
+    preprice TEXT, style_name TEXT, status TEXT, is_deposit INTEGER, created_at DateTime, updated_at DateTime,
+    shop_name TEXT, shop_url TEXT, is_purchased TEXT DEFAULT '否', is_followed TEXT DEFAULT '否', level TEXT DEFAULT ''
+);
+CREATE TABLE tmall_products (
+    id INTEGER PRIMARY KEY, product_id TEXT, product_url TEXT, image_url TEXT, title TEXT, price REAL,
+    preprice TEXT, style_name TEXT, status TEXT, is_deposit INTEGER, created_at DateTime, updated_at DateTime,
+    shop_name TEXT, shop_url TEXT, is_purchased TEXT DEFAULT '否', is_followed TEXT DEFAULT '否', level TEXT DEFAULT ''
+);
+CREATE TABLE products_summary (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, product_name TEXT NOT NULL, product_type TEXT, jd_url TEXT, tmall_url TEXT,
+    jd_product_id INTEGER REFERENCES jd_products(id), tmall_product_id INTEGER REFERENCES tmall_products(id),
+    created_at DateTime DEFAULT CURRENT_TIMESTAMP, updated_at DateTime DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX idx_products_summary_jd ON products_summary(jd_product_id);
+CREATE INDEX idx_products_summary_tmall ON products_summary(tmall_product_id);
+'''
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = get_connection(str(tmp_path / 'plans.db'))
+    conn.executescript(BASE_SCHEMA)
+    for platform in ('jd', 'tmall'):
+        conn.executemany(f"INSERT INTO {platform}_products (id, product_id, title, status) VALUES (?, ?, ?, 'available')",
+                         [(i, f'{platform}{i}', f'商品{i}') for i in range(1, 6)])
+        conn.executemany(f'INSERT INTO {platform}_price_history (product_id, price, created_at) VALUES (?, ?, ?)',
+                         [(str(i), 100 + day, f'202601{day:02d}') for i in range(1, 6) for day in range(1, 11)])
+    conn.execute("INSERT INTO products_summary (product_name, jd_product_id, tmall_product_id) VALUES ('擎天柱', 1, 1)")
+    conn.commit()
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+def test_price_history_queries_use_product_index(conn):
+    results = check_query_plans(conn)
+    assert len(results) == 8
+    failed = {name: plan for name, plan, ok in results if not ok}
+    assert not failed, failed
+
+
+def test_check_fails_without_product_index(conn):
+    # 索引被删掉（或被别的索引遮住）时检查必须失败
+    for index in ('idx_jd_price_history_product_day', 'uq_jd_price_history_product_day'):
+        conn.execute(f'DROP INDEX IF EXISTS {index}')
+    failed = [name for name, _, ok in check_query_plans(conn) if not ok]
+    assert 'jd /api/price-history' in failed
+    assert 'jd 30天最低价子查询' in failed
+    assert not any(name.startswith('tmall') for name in failed)
@@ -3,10 +3,17 @@
 Transformers 价格追踪系统 - Web应用
 """
 
-from flask import Flask, render_template, jsonify, request
-import sqlite3
+from flask import Flask, render_template, jsonify, request, g, Response
 from datetime import datetime, timedelta
+import atexit
+import base64
+import functools
+import gzip
+import hashlib
+import json
 import os
+import sys
+import time
 
 app = Flask(__name__, 
             template_folder='templates',
@@ -16,12 +23,174 @@ app = Flask(__name__,
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.path.join(BASE_DIR, 'data', 'transformers.db')
 
+sys.path.insert(0, BASE_DIR)
+from database.data_version import read_data_version
+from database.db import ConnectionPool
+from database.migrations import check_version
+from database.price_stats import PLATFORM_TABLES
+from database.history_day import from_epoch_day, to_epoch_day
+from database.price_windows import DEFAULT_WINDOWS, parse_windows, rolling_min
+from web.cache import ResponseCache
+from web.downsample import downsample_indices
+from web.metrics import InstrumentedConnection, WebMetrics, start_tracking, stop_tracking
+
+# 连接池（首次使用时创建，并检查数据库版本）
+_pool = None
+
+
+def get_pool():
+    """获取连接池
+
+    不在请求里执行迁移（有的迁移会删数据、长时间持有写锁），数据库版本落后时报错，
+    先执行 python -m database.migrations。
+    """
+    global _pool
+    if _pool is None or _pool.db_path != DB_PATH:
+        pool = ConnectionPool(DB_PATH, factory=InstrumentedConnection)
+        with pool.connection() as conn:
+            check_version(conn)
+        if _pool is not None:
+            _pool.close_all()
+        _pool = pool
+    return _pool
+
 
 def get_db():
-    """获取数据库连接"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """获取当前请求的数据库连接（同一请求内复用，请求结束时归还连接池）"""
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+
+@app.teardown_appcontext
+def release_db(exc):
+    """请求结束：回滚未提交的事务并归还连接"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        get_pool().release(conn, discard=exc is not None)
+
+
+@atexit.register
+def close_pool():
+    """进程退出时关闭连接"""
+    if _pool is not None:
+        _pool.close_all()
+
+
+# 请求指标（/metrics）
+metrics = WebMetrics()
+
+# 慢请求日志阈值（毫秒），超过时记录本次请求执行的全部 SQL；0 表示关闭
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '0'))
+
+
+@app.before_request
+def start_request_metrics():
+    """记录请求开始时间，开始统计 SQL"""
+    g.request_start = time.perf_counter()
+    g.sql_tracker, g.sql_tracker_token = start_tracking()
+
+
+@app.after_request
+def record_request_metrics(resp):
+    """记录耗时、响应大小、SQL 条数和耗时"""
+    start = g.pop('request_start', None)
+    if start is None:
+        return resp
+    seconds = time.perf_counter() - start
+    tracker = g.get('sql_tracker')
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    size = None if resp.is_streamed else resp.calculate_content_length()
+    metrics.observe_request(route, request.method, resp.status_code, seconds, size, tracker)
+    
+    if SLOW_REQUEST_MS and seconds * 1000 >= SLOW_REQUEST_MS:
+        metrics.slow_requests.inc((route,))
+        lines = [f'{sql_seconds * 1000:8.2f} ms  {sql}' for sql, sql_seconds in tracker.statements] if tracker else []
+        app.logger.warning(
+            '慢请求 %s %s %.1f ms, SQL %d 条 %.1f ms\n%s',
+            request.method, request.full_path.rstrip('?'), seconds * 1000,
+            tracker.count if tracker else 0, tracker.seconds * 1000 if tracker else 0,
+            '\n'.join(lines))
+    return resp
+
+
+@app.teardown_request
+def stop_request_metrics(exc):
+    token = g.pop('sql_tracker_token', None)
+    if token is not None:
+        stop_tracking(token)
+
+
+# 读接口响应缓存（数据版本变化时失效）
+response_cache = ResponseCache(max_entries=256)
+
+# 超过该大小的响应体做 gzip 压缩
+GZIP_MIN_SIZE = 1024
+
+
+def make_etag(version, key):
+    """强 ETag：数据版本号 + 路径 + 查询参数"""
+    digest = hashlib.sha1(repr((version, key)).encode('utf-8')).hexdigest()[:20]
+    return f'v{version}-{digest}'
+
+
+def cached_json(view):
+    """读接口缓存装饰器
+    
+    1. ETag/Last-Modified 由数据版本号生成，If-None-Match 命中直接返回 304（只读版本号，不查业务表）
+    2. 按 (路径, 参数) 缓存响应体，数据版本号变化后重新计算
+    3. 大响应体缓存一份 gzip 压缩结果，客户端支持时直接返回
+    列表的 min_price_30d 按当天计算，跨天后数据版本号不变响应也会变，所以日期也算进版本里。
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        version, last_modified = read_data_version(get_db())
+        today = today_str()
+        key = ResponseCache.make_key(request.path, request.args)
+        etag = make_etag(version, (key, today))
+        midnight = datetime.now().astimezone().replace(hour=0, minute=0, second=0, microsecond=0)
+        if last_modified and last_modified < midnight:
+            last_modified = midnight
+        
+        # 条件请求：数据没变就返回 304
+        not_modified = False
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag) or request.if_none_match.contains(etag + '-gzip')
+        elif request.if_modified_since and last_modified:
+            not_modified = last_modified <= request.if_modified_since
+        
+        use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+        
+        if not_modified:
+            resp = Response(status=304)
+            resp.set_etag(etag + '-gzip' if request.if_none_match.contains(etag + '-gzip') else etag)
+        else:
+            cached = response_cache.get(key, (version, today))
+            if cached is None:
+                resp = app.make_response(view(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+                body = resp.get_data()
+                gzipped = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_SIZE else None
+                cached = (body, resp.mimetype, gzipped)
+                response_cache.set(key, (version, today), cached)
+            
+            body, mimetype, gzipped = cached
+            if use_gzip and gzipped is not None:
+                # 压缩后的内容是另一种表示，ETag 也要区分
+                resp = Response(gzipped, mimetype=mimetype)
+                resp.headers['Content-Encoding'] = 'gzip'
+                resp.set_etag(etag + '-gzip')
+            else:
+                resp = Response(body, mimetype=mimetype)
+                resp.set_etag(etag)
+        
+        if last_modified:
+            resp.last_modified = last_modified
+        resp.headers['Cache-Control'] = 'no-cache'
+        resp.vary.add('Accept-Encoding')
+        return resp
+    return wrapper
 
 
 def parse_date(date_str):
@@ -40,226 +209,290 @@ def parse_date(date_str):
         return None
 
 
-def get_price_stats(product_row_id, price_table):
-    """获取价格统计"""
-    if not product_row_id:
-        return {'latest_price': None, 'latest_date': None, 'min_price_30d': None, 'min_price_all': None}
-    
-    conn = get_db()
-    
-    try:
-        today = datetime.now().strftime('%Y%m%d')
-        price_history = conn.execute(f'''
-            SELECT price, created_at
-            FROM {price_table}
-            WHERE product_id = ?
-            ORDER BY created_at DESC
-        ''', (product_row_id,)).fetchall()
-        
-        conn.close()
-        
-        if not price_history:
-            return {'latest_price': None, 'latest_date': None, 'min_price_30d': None, 'min_price_all': None}
-        
-        latest = price_history[0]
-        
-        min_30d = None
-        for ph in price_history:
-            created_at = ph['created_at']
-            if created_at and created_at < str(today):
-                price = ph['price']
-                if min_30d is None or price < min_30d:
-                    min_30d = price
-        
-        min_all = min(ph['price'] for ph in price_history if ph['price'])
-        
-        return {
-            'latest_price': latest['price'],
-            'latest_date': latest['created_at'],
-            'min_price_30d': min_30d,
-            'min_price_all': min_all
-        }
-    except Exception as e:
-        print(f"Price stats error: {e}")
-        return {'latest_price': None, 'latest_date': None, 'min_price_30d': None, 'min_price_all': None}
+EMPTY_PRICE_STATS = {'latest_price': None, 'latest_date': None, 'min_price_30d': None, 'min_price_all': None}
 
 
-@app.route('/test')
-def test():
-    """测试页面"""
-    return render_template('test_complete.html')
+def price_stats_from_row(row):
+    """从查询结果中取出价格统计（没有有效价格时全部为None）"""
+    if row['min_price_all'] is None:
+        return dict(EMPTY_PRICE_STATS)
+    return {key: row[key] for key in EMPTY_PRICE_STATS}
 
 
-@app.route('/debug')
-def debug():
-    """调试页面"""
-    return render_template('index_debug.html')
+# min_price_30d 是今天以前的最低价：最近一次价格在今天以前时包括最新价，否则只看最近一次价格日期之前的
+PRODUCT_LIST_COLUMNS = '''
+        p.id, p.product_id, p.product_url, p.image_url, p.title, p.style_name,
+        p.shop_name, p.created_at, p.is_purchased, p.is_followed,
+        s.latest_price, s.latest_date, s.min_price_all,
+        CASE WHEN s.latest_date < :today THEN MIN(s.latest_price, IFNULL(s.min_price_prior, s.latest_price))
+             ELSE s.min_price_prior END AS min_price_30d
+'''
 
 
-@app.route('/')
-def index():
-    """主页面 - 服务端渲染"""
-    conn = get_db()
-    
-    today = datetime.now().strftime('%Y%m%d')
+def today_str():
+    """今天（YYYYMMDD，和 price_stats.latest_date 同格式）"""
+    return datetime.now().strftime('%Y%m%d')
+
+
+def format_product_rows(rows):
+    """商品行转为接口返回格式"""
     three_days_ago = (datetime.now() - timedelta(days=3)).strftime('%Y-%m-%d')
     
-    # 京东商品
-    jd_products_raw = conn.execute('''
-        SELECT id, product_id, product_url, image_url, title, style_name, 
-               shop_name, created_at, is_purchased, is_followed
-        FROM jd_products
-        ORDER BY id DESC
-    ''').fetchall()
-    
-    jd_products = []
-    for p in jd_products_raw:
-        p = dict(p)
-        price_stats = get_price_stats(p['id'], 'jd_price_history')
-        p['min_price_30d'] = price_stats['min_price_30d']
-        p['latest_price'] = price_stats['latest_price']
-        p['latest_date'] = price_stats['latest_date']
-        p['min_price_all'] = price_stats['min_price_all']
+    result = []
+    for row in rows:
+        p = {key: row[key] for key in ('id', 'product_id', 'product_url', 'image_url', 'title', 'style_name',
+                                       'shop_name', 'created_at', 'is_purchased', 'is_followed')}
+        p.update(price_stats_from_row(row))
         
         # 判断是否3天内新建
-        p['is_new'] = False
         created_at_str = str(p['created_at'])[:10] if p['created_at'] else ''
-        if created_at_str >= three_days_ago:
-            p['is_new'] = True
+        p['is_new'] = bool(created_at_str) and created_at_str >= three_days_ago
         
         # 格式化创建日期
-        if created_at_str:
-            p['created_at_display'] = created_at_str
-        else:
-            p['created_at_display'] = '-'
+        p['created_at_display'] = created_at_str if created_at_str else '-'
         
-        jd_products.append(p)
-    
-    # 天猫商品通过 API 动态加载，不再服务端渲染
-    conn.close()
+        result.append(p)
     
-    return render_template('index.html', jd_products=jd_products)
+    return result
 
 
-@app.route('/api/jd-prices')
-def api_jd_prices():
-    """获取京东价格列表（支持筛选）"""
-    conn = get_db()
-    
-    # 获取筛选参数（都是可选的）
-    filter_purchased = request.args.get('purchased', '')
-    filter_followed = request.args.get('followed', '')
-    
-    # 构建查询条件
-    where_conditions = []
-    params = []
-    
-    # 是否购买：全部/未购买/已购买
-    if filter_purchased in ['未购买', '购买']:
-        where_conditions.append('is_purchased = ?')
-        params.append(filter_purchased)
-    
-    # 是否关注：全部/未关注/已关注
-    if filter_followed in ['未关注', '关注']:
-        where_conditions.append('is_followed = ?')
-        params.append(filter_followed)
-    
-    where_sql = ' AND '.join(where_conditions) if where_conditions else '1=1'
+def get_products_with_stats(conn, platform, where_sql='1=1', params=None):
+    """查询商品列表并关联 price_stats 汇总表（单次索引读取，与价格历史长度无关）"""
+    product_table, _ = PLATFORM_TABLES[platform]
+    params = dict(params or {})
+    params['platform'] = platform
+    params['today'] = today_str()
     
     products = conn.execute(f'''
-        SELECT id, product_id, product_url, image_url, title, style_name, 
-               shop_name, created_at, is_purchased, is_followed
-        FROM jd_products
+        SELECT {PRODUCT_LIST_COLUMNS}
+        FROM {product_table} p
+        LEFT JOIN price_stats s ON s.platform = :platform AND s.product_row_id = p.id
         WHERE {where_sql}
-        ORDER BY id DESC
+        ORDER BY p.id DESC
     ''', params).fetchall()
     
-    conn.close()
-    
-    result = []
-    today = datetime.now()
-    three_days_ago = (today - timedelta(days=3)).strftime('%Y-%m-%d')
+    return format_product_rows(products)
+
+
+# ============ 列表分页（keyset） ============
+
+# 排序参数 -> (排序列, 默认方向)；每个排序列都有 (排序值, id) 复合索引
+SORT_OPTIONS = {
+    'id': ('p.id', 'desc'),
+    'latest_price': ('s.latest_price', 'asc'),
+    'price_drop': ('s.price_drop', 'desc'),
+    'created': ('p.created_at', 'desc'),
+    'level': ('p.level', 'asc'),
+}
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(value, row_id):
+    """分页游标：上一页最后一行的 (排序值, id)"""
+    raw = json.dumps([value, row_id], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析分页游标，格式错误抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, row_id = json.loads(raw)
+        return value, int(row_id)
+    except Exception:
+        raise ValueError('无效的分页游标')
+
+
+def get_product_page(conn, platform, where_sql, params, sort='id', order=None, after=None, limit=50):
+    """按排序列做 keyset 分页
+    
+    排序值相同的按 id 排；排序值为空的行排在最后（单独一段按 id 排）。
+    按 price_stats 的列排序时从 price_stats 索引出发，按商品表的列排序时从商品表索引出发，
+    每页只读取 limit 行附近的索引，与总行数无关。
+    返回 (当前页商品, 下一页游标或None)
+    """
+    product_table, _ = PLATFORM_TABLES[platform]
+    sort_col, default_order = SORT_OPTIONS[sort]
+    order = order or default_order
+    direction = 'DESC' if order == 'desc' else 'ASC'
+    cmp = '<' if order == 'desc' else '>'
+    
+    if sort_col.startswith('s.'):
+        id_col = 's.product_row_id'
+        from_sql = f'''price_stats s
+        JOIN {product_table} p ON p.id = s.product_row_id
+        WHERE s.platform = :platform'''
+    else:
+        id_col = 'p.id'
+        from_sql = f'''{product_table} p
+        LEFT JOIN price_stats s ON s.platform = :platform AND s.product_row_id = p.id
+        WHERE 1=1'''
+    
+    params = dict(params)
+    params['platform'] = platform
+    params['today'] = today_str()
+    
+    def fetch(segment_sql, extra_params, order_sql, n):
+        query_params = dict(params, **extra_params, limit=n)
+        return conn.execute(f'''
+            SELECT {PRODUCT_LIST_COLUMNS}, {sort_col} AS sort_value
+            FROM {from_sql} AND ({where_sql}) AND {segment_sql}
+            ORDER BY {order_sql}
+            LIMIT :limit
+        ''', query_params).fetchall()
+    
+    after_value, after_id = after if after else (None, None)
+    in_null_segment = after is not None and after_value is None
+    
+    # 第一段：排序值非空
+    rows = []
+    if not in_null_segment:
+        if after is None:
+            segment_sql, extra = f'{sort_col} IS NOT NULL', {}
+        else:
+            segment_sql = f'({sort_col} {cmp} :after_value OR ({sort_col} = :after_value AND {id_col} {cmp} :after_id))'
+            extra = {'after_value': after_value, 'after_id': after_id}
+        rows = fetch(segment_sql, extra, f'{sort_col} {direction}, {id_col} {direction}', limit + 1)
+    
+    # 第二段：排序值为空
+    if len(rows) <= limit:
+        if in_null_segment:
+            segment_sql, extra = f'{sort_col} IS NULL AND {id_col} {cmp} :after_id', {'after_id': after_id}
+        else:
+            segment_sql, extra = f'{sort_col} IS NULL', {}
+        rows += fetch(segment_sql, extra, f'{id_col} {direction}', limit + 1 - len(rows))
     
-    for p in products:
-        p = dict(p)
-        price_stats = get_price_stats(p['id'], 'jd_price_history')
-        p['min_price_30d'] = price_stats['min_price_30d']
-        p['latest_price'] = price_stats['latest_price']
-        p['latest_date'] = price_stats['latest_date']
-        p['min_price_all'] = price_stats['min_price_all']
-        
-        p['is_new'] = False
-        created_at_str = str(p['created_at'])[:10] if p['created_at'] else ''
-        if created_at_str >= three_days_ago:
-            p['is_new'] = True
-        
-        p['created_at_display'] = created_at_str if created_at_str else '-'
-        
-        result.append(p)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last['sort_value'], last['id'])
     
-    return jsonify(result)
+    return format_product_rows(rows), next_cursor
 
 
-@app.route('/api/tmall-prices')
-def api_tmall_prices():
-    """获取天猫价格列表（支持筛选）"""
+def product_list_response(platform):
+    """商品列表接口：不带 limit 返回全部（数组）；带 limit 返回 {items, next_cursor}"""
     conn = get_db()
     
-    # 获取筛选参数
-    filter_purchased = request.args.get('purchased', '')
-    filter_followed = request.args.get('followed', '')
+    # 获取筛选参数（都是可选的）
+    where_sql, params = build_filter_conditions(request.args)
+    
+    if 'limit' not in request.args and 'after' not in request.args:
+        return jsonify(get_products_with_stats(conn, platform, where_sql, params))
+    
+    sort = request.args.get('sort', 'id')
+    order = request.args.get('order') or None
+    if sort not in SORT_OPTIONS:
+        return jsonify({'error': f'不支持的排序字段: {sort}'}), 400
+    if order not in (None, 'asc', 'desc'):
+        return jsonify({'error': f'不支持的排序方向: {order}'}), 400
     
-    # 构建查询条件
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), MAX_PAGE_SIZE)
+        after = decode_cursor(request.args['after']) if request.args.get('after') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    items, next_cursor = get_product_page(conn, platform, where_sql, params, sort, order, after, limit)
+    return jsonify({'items': items, 'next_cursor': next_cursor})
+
+
+def build_filter_conditions(args):
+    """根据请求参数构建筛选条件（是否购买/是否关注）"""
     where_conditions = []
-    params = []
+    params = {}
     
+    # 是否购买：全部/未购买/已购买
+    filter_purchased = args.get('purchased', '')
     if filter_purchased in ['未购买', '购买']:
-        where_conditions.append('is_purchased = ?')
-        params.append(filter_purchased)
+        where_conditions.append('p.is_purchased = :purchased')
+        params['purchased'] = filter_purchased
     
+    # 是否关注：全部/未关注/已关注
+    filter_followed = args.get('followed', '')
     if filter_followed in ['未关注', '关注']:
-        where_conditions.append('is_followed = ?')
-        params.append(filter_followed)
+        where_conditions.append('p.is_followed = :followed')
+        params['followed'] = filter_followed
     
     where_sql = ' AND '.join(where_conditions) if where_conditions else '1=1'
-    
-    products = conn.execute(f'''
-        SELECT id, product_id, product_url, image_url, title, style_name, 
-               shop_name, created_at, is_purchased, is_followed
-        FROM tmall_products
-        WHERE {where_sql}
-        ORDER BY id DESC
-    ''', params).fetchall()
-    
-    conn.close()
-    
-    result = []
-    today = datetime.now()
-    three_days_ago = (today - timedelta(days=3)).strftime('%Y-%m-%d')
-    
-    for p in products:
-        p = dict(p)
-        price_stats = get_price_stats(p['id'], 'tmall_price_history')
-        p['min_price_30d'] = price_stats['min_price_30d']
-        p['latest_price'] = price_stats['latest_price']
-        p['latest_date'] = price_stats['latest_date']
-        p['min_price_all'] = price_stats['min_price_all']
-        
-        p['is_new'] = False
-        created_at_str = str(p['created_at'])[:10] if p['created_at'] else ''
-        if created_at_str >= three_days_ago:
-            p['is_new'] = True
-        
-        p['created_at_display'] = created_at_str if created_at_str else '-'
+    return where_sql, params
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus 指标"""
+    return Response(metrics.render(response_cache.stats()),
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/test')
+def test():
+    """测试页面"""
+    return render_template('test_complete.html')
+
+
+@app.route('/debug')
+def debug():
+    """调试页面"""
+    return render_template('index_debug.html')
+
+
+@app.route('/')
+def index():
+    """主页面"""
+    # 商品列表和统计由页面加载后请求 /api/dashboard 一次性获取
+    return render_template('index.html')
+
+
+@app.route('/api/jd-prices')
+@cached_json
+def api_jd_prices():
+    """获取京东价格列表（支持筛选；传 limit/after/sort/order 时按游标分页）"""
+    return product_list_response('jd')
+
+
+@app.route('/api/tmall-prices')
+@cached_json
+def api_tmall_prices():
+    """获取天猫价格列表（支持筛选；传 limit/after/sort/order 时按游标分页）"""
+    return product_list_response('tmall')
+
+
+def downsample_history(history, points):
+    """价格历史降采样（LTTB + 保留所有局部最低点），history 按日期倒序，返回同样的顺序
+    
+    横轴用整数日期 day，返回前去掉 day 字段；product_id 转回字符串（迁移 7 之前是 TEXT 列），接口输出不变。
+    """
+    if points and points > 0 and len(history) > points:
+        rows = history[::-1]
+        days = []
+        for i, row in enumerate(rows):
+            day = row.get('day')
+            days.append(day if day is not None else (days[-1] + 1 if days else i))
+        prices = [row['price'] or 0 for row in rows]
         
-        result.append(p)
+        keep = downsample_indices(days, prices, points)
+        history = [rows[i] for i in keep[::-1]]
     
-    return jsonify(result)
+    for row in history:
+        row.pop('day', None)
+        if row.get('product_id') is not None:
+            row['product_id'] = str(row['product_id'])
+    return history
+
+
+def parse_points_arg():
+    """points 参数（可选，正整数），格式错误抛出 ValueError"""
+    points = request.args.get('points')
+    return int(points) if points else None
 
 
 @app.route('/api/price-history/<product_id>')
+@cached_json
 def api_price_history(product_id):
-    """获取价格历史"""
+    """获取价格历史（可选 points=N 降采样到约 N 个点，局部最低点全部保留）"""
     source = request.args.get('source', 'jd')
     
     if source == 'jd':
@@ -269,22 +502,133 @@ def api_price_history(product_id):
     
     conn = get_db()
     
+    try:
+        points = parse_points_arg()
+    except ValueError:
+        return jsonify({'error': 'points 必须是整数'}), 400
+    
     try:
         history = conn.execute(f'''
-            SELECT id, product_id, price, created_at, style_name
+            SELECT id, product_id, price, created_at, style_name, day
             FROM {table}
             WHERE product_id = ?
-            ORDER BY created_at DESC
+            ORDER BY day DESC
         ''', (product_id,)).fetchall()
     except:
         history = []
     
-    conn.close()
+    # 可选降采样：?points=N
+    return jsonify(downsample_history([dict(row) for row in history], points))
+
+
+# 批量价格历史一次最多查询的商品数
+MAX_BATCH_PRODUCTS = 200
+
+
+@app.route('/api/price-history-batch')
+@cached_json
+def api_price_history_batch():
+    """批量获取价格历史（一次请求、一条SQL返回多个商品的走势）
+    
+    参数：
+        source: jd / tmall
+        ids: 商品表 id，逗号分隔
+        start, end: 可选日期范围（YYYYMMDD 或 YYYY-MM-DD，含首尾）
+        points: 可选，每个商品降采样到约 N 个点（LTTB，局部最低点全部保留）
+    """
+    source = request.args.get('source', 'jd')
+    if source not in PLATFORM_TABLES:
+        return jsonify({'error': f'未知平台: {source}'}), 400
+    _, table = PLATFORM_TABLES[source]
+    
+    try:
+        ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip()]
+        points = parse_points_arg()
+    except ValueError:
+        return jsonify({'error': 'ids 和 points 必须是整数'}), 400
+    
+    if not ids:
+        return jsonify({'error': '缺少商品id'}), 400
+    if len(ids) > MAX_BATCH_PRODUCTS:
+        return jsonify({'error': f'一次最多查询 {MAX_BATCH_PRODUCTS} 个商品'}), 400
+    
+    ids = list(dict.fromkeys(ids))
+    params = {f'id{i}': v for i, v in enumerate(ids)}
+    conditions = [f"product_id IN ({', '.join(':' + k for k in params)})"]
+    
+    # 日期范围：整数日期 day 上的范围条件（含首尾）
+    for arg, op in (('start', '>='), ('end', '<=')):
+        if request.args.get(arg):
+            day = parse_date(request.args[arg])
+            if not day:
+                return jsonify({'error': f'日期格式错误: {request.args[arg]}'}), 400
+            conditions.append(f'day {op} :{arg}')
+            params[arg] = to_epoch_day(day)
+    
+    conn = get_db()
+    rows = conn.execute(f'''
+        SELECT id, product_id, price, created_at, style_name, day
+        FROM {table}
+        WHERE {' AND '.join(conditions)}
+        ORDER BY product_id, day DESC
+    ''', params).fetchall()
+    
+    series = {str(i): [] for i in ids}
+    for row in rows:
+        series.setdefault(str(row['product_id']), []).append(dict(row))
+    
+    series = {key: downsample_history(history, points) for key, history in series.items()}
+    
+    return jsonify({'source': source, 'series': series})
+
+
+# 滚动窗口接口最多几个窗口、窗口最长多少天
+MAX_WINDOWS = 8
+MAX_WINDOW_DAYS = 3650
+
+
+@app.route('/api/price-windows')
+@cached_json
+def api_price_windows():
+    """滚动窗口最低价
+    
+    参数：
+        source: jd / tmall
+        ids: 商品表 id，逗号分隔
+        windows: 可选，窗口天数，逗号分隔（默认 7,30,90,365）
+        end: 可选，统一终点日期（不含当天）；默认每个商品以最近一次价格日期为终点
+    """
+    source = request.args.get('source', 'jd')
+    if source not in PLATFORM_TABLES:
+        return jsonify({'error': f'未知平台: {source}'}), 400
     
-    return jsonify([dict(row) for row in history])
+    try:
+        ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip()]
+        windows = parse_windows(request.args['windows']) if request.args.get('windows') else list(DEFAULT_WINDOWS)
+        end_day = to_epoch_day(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'error': 'ids/windows 必须是整数，end 必须是日期'}), 400
+    
+    if not ids:
+        return jsonify({'error': '缺少商品id'}), 400
+    if len(ids) > MAX_BATCH_PRODUCTS:
+        return jsonify({'error': f'一次最多查询 {MAX_BATCH_PRODUCTS} 个商品'}), 400
+    if len(windows) > MAX_WINDOWS or max(windows) > MAX_WINDOW_DAYS:
+        return jsonify({'error': f'最多 {MAX_WINDOWS} 个窗口，每个不超过 {MAX_WINDOW_DAYS} 天'}), 400
+    
+    result = rolling_min(get_db(), source, ids, windows, end_day)
+    products = {
+        str(row_id): {
+            'latest_date': stats['latest_date'],
+            'min_price': {str(days): stats[days] for days in sorted(set(windows))},
+        }
+        for row_id, stats in result.items()
+    }
+    return jsonify({'source': source, 'end': from_epoch_day(end_day), 'products': products})
 
 
 @app.route('/api/jd-stats')
+@cached_json
 def api_jd_stats():
     """获取京东统计数据（不受筛选影响）"""
     conn = get_db()
@@ -300,8 +644,6 @@ def api_jd_stats():
         FROM jd_products
     ''').fetchone()
     
-    conn.close()
-    
     return jsonify({
         'total': stats['total'] or 0,
         'purchased': stats['purchased'] or 0,
@@ -312,6 +654,7 @@ def api_jd_stats():
 
 
 @app.route('/api/tmall-stats')
+@cached_json
 def api_tmall_stats():
     """获取天猫统计数据（不受筛选影响）"""
     conn = get_db()
@@ -327,8 +670,6 @@ def api_tmall_stats():
         FROM tmall_products
     ''').fetchone()
     
-    conn.close()
-    
     return jsonify({
         'total': stats['total'] or 0,
         'purchased': stats['purchased'] or 0,
@@ -338,6 +679,48 @@ def api_tmall_stats():
     })
 
 
+# 统计口径：天猫的历史数据里“否”也算未购买/未关注
+STATS_NOT_PURCHASED = {'jd': ('未购买',), 'tmall': ('未购买', '否')}
+STATS_NOT_FOLLOWED = {'jd': ('未关注',), 'tmall': ('未关注', '否')}
+
+
+def summarize_products(products, platform):
+    """由商品列表计算统计磁贴数据（与 /api/jd-stats、/api/tmall-stats 口径一致）"""
+    return {
+        'total': len(products),
+        'purchased': sum(1 for p in products if p['is_purchased'] == '购买'),
+        'not_purchased': sum(1 for p in products if p['is_purchased'] in STATS_NOT_PURCHASED[platform]),
+        'followed': sum(1 for p in products if p['is_followed'] == '关注'),
+        'not_followed': sum(1 for p in products if p['is_followed'] in STATS_NOT_FOLLOWED[platform]),
+    }
+
+
+@app.route('/api/dashboard')
+@cached_json
+def api_dashboard():
+    """首页数据：两个平台的商品列表 + 统计 + 数据版本号
+    
+    在同一个读事务里完成（WAL 下读到的是同一个快照），统计直接由列表结果计算，
+    替代首页加载时的 /api/jd-prices、/api/tmall-prices、/api/jd-stats、/api/tmall-stats 四个请求。
+    """
+    conn = get_db()
+    
+    conn.execute('BEGIN')
+    try:
+        version, _ = read_data_version(conn)
+        result = {'version': version}
+        for platform in PLATFORM_TABLES:
+            products = get_products_with_stats(conn, platform)
+            result[platform] = {
+                'products': products,
+                'stats': summarize_products(products, platform),
+            }
+    finally:
+        conn.rollback()
+    
+    return jsonify(result)
+
+
 @app.route('/api/update-product', methods=['POST'])
 def api_update_product():
     """更新商品状态"""
@@ -365,7 +748,6 @@ def api_update_product():
             WHERE id = ?
         ''', (is_purchased, is_followed, product_id))
         conn.commit()
-        conn.close()
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -380,6 +762,7 @@ def maintain():
 # ============ 总表维护相关API ============
 
 @app.route('/api/summary-list')
+@cached_json
 def api_summary_list():
     """获取总表列表"""
     conn = get_db()
@@ -390,22 +773,18 @@ def api_summary_list():
                tm.id AS tmall_id, tm.product_id AS tmall_product_id, tm.title AS tmall_title, tm.image_url AS tmall_image, tm.price AS tmall_price, tm.latest_date AS tmall_date
         FROM products_summary ps
         LEFT JOIN (
-            SELECT id, product_id, product_url, image_url, title, price, 
-                   (SELECT created_at FROM jd_price_history WHERE product_id = jd_products.id ORDER BY created_at DESC LIMIT 1) AS latest_date,
-                   level
-            FROM jd_products
+            SELECT p.id, p.product_id, p.product_url, p.image_url, p.title, p.price, s.latest_date, p.level
+            FROM jd_products p
+            LEFT JOIN price_stats s ON s.platform = 'jd' AND s.product_row_id = p.id
         ) jd ON ps.jd_product_id = jd.id
         LEFT JOIN (
-            SELECT id, product_id, product_url, image_url, title, price,
-                   (SELECT created_at FROM tmall_price_history WHERE product_id = tmall_products.id ORDER BY created_at DESC LIMIT 1) AS latest_date,
-                   level
-            FROM tmall_products
+            SELECT p.id, p.product_id, p.product_url, p.image_url, p.title, p.price, s.latest_date, p.level
+            FROM tmall_products p
+            LEFT JOIN price_stats s ON s.platform = 'tmall' AND s.product_row_id = p.id
         ) tm ON ps.tmall_product_id = tm.id
         ORDER BY ps.id DESC
     ''').fetchall()
     
-    conn.close()
-    
     result = []
     for p in products:
         result.append({
@@ -455,7 +834,6 @@ def api_summary_create():
         ''', (product_name, product_type, jd_product_id, tmall_product_id))
         conn.commit()
         new_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
-        conn.close()
         return jsonify({'success': True, 'id': new_id})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -484,7 +862,6 @@ def api_summary_update():
             WHERE id = ?
         ''', (product_name, product_type, jd_product_id, tmall_product_id, record_id))
         conn.commit()
-        conn.close()
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -505,26 +882,24 @@ def api_summary_delete():
     try:
         conn.execute('DELETE FROM products_summary WHERE id = ?', (record_id,))
         conn.commit()
-        conn.close()
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/summary-jd-options')
+@cached_json
 def api_summary_jd_options():
     """获取京东商品列表（用于选择）"""
     conn = get_db()
     
     products = conn.execute('''
-        SELECT id, product_id, title, style_name, level, price,
-               (SELECT created_at FROM jd_price_history WHERE product_id = jd_products.id ORDER BY created_at DESC LIMIT 1) AS latest_date
-        FROM jd_products
-        ORDER BY id DESC
+        SELECT p.id, p.product_id, p.title, p.style_name, p.level, p.price, s.latest_date
+        FROM jd_products p
+        LEFT JOIN price_stats s ON s.platform = 'jd' AND s.product_row_id = p.id
+        ORDER BY p.id DESC
     ''').fetchall()
     
-    conn.close()
-    
     result = []
     for p in products:
         result.append({
@@ -541,19 +916,18 @@ def api_summary_jd_options():
 
 
 @app.route('/api/summary-tmall-options')
+@cached_json
 def api_summary_tmall_options():
     """获取天猫商品列表（用于选择）"""
     conn = get_db()
     
     products = conn.execute('''
-        SELECT id, product_id, title, style_name, level, price,
-               (SELECT created_at FROM tmall_price_history WHERE product_id = tmall_products.id ORDER BY created_at DESC LIMIT 1) AS latest_date
-        FROM tmall_products
-        ORDER BY id DESC
+        SELECT p.id, p.product_id, p.title, p.style_name, p.level, p.price, s.latest_date
+        FROM tmall_products p
+        LEFT JOIN price_stats s ON s.platform = 'tmall' AND s.product_row_id = p.id
+        ORDER BY p.id DESC
     ''').fetchall()
     
-    conn.close()
-    
     result = []
     for p in products:
         result.append({
@@ -570,6 +944,8 @@ def api_summary_tmall_options():
 
 
 if __name__ == '__main__':
+    # 启动前检查数据库版本，不要等到第一个请求才报错
+    get_pool()
     print("🚀 Transformers 价格追踪系统")
     print("📍 访问地址: http://localhost:8080")
     app.run(host='0.0.0.0', port=8080, debug=True)
@@ -0,0 +1,67 @@
+"""
+读接口响应缓存
+
+按 (接口路径, 查询参数) 缓存已序列化的响应体，容量有上限（LRU淘汰）。
+每条缓存记录生成时的数据版本号，版本号变化（爬虫写入、POST 修改）后整体失效。
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """进程内 LRU 响应缓存"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(path, args):
+        """缓存键：路径 + 排序后的查询参数"""
+        return (path, tuple(sorted(args.items(multi=True))))
+
+    def get(self, key, version):
+        """命中返回缓存值，否则返回 None"""
+        with self._lock:
+            if version != self._version:
+                # 数据已变化，旧缓存全部作废
+                self._entries.clear()
+                self._version = version
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, version, value):
+        """写入缓存（生成期间版本已变化则丢弃）"""
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+    def stats(self):
+        """命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,79 @@
+"""
+价格走势降采样
+
+Largest-Triangle-Three-Buckets (LTTB)：把 n 个点压缩到约 n_out 个点，尽量保留曲线形状。
+我们最关心最低价，所以在 LTTB 结果之外，所有局部最低点（连续相同价格的一段取首尾两点）一律保留，
+返回的点数可能略多于 n_out。
+"""
+
+import numpy as np
+
+
+def lttb_indices(x, y, n_out):
+    """LTTB 选点，返回被选中点的下标（升序）
+
+    x 需升序。首尾两点固定保留，中间 n-2 个点分成 n_out-2 个桶，每桶选一个点：
+    与上一个选中点、下一个桶平均点组成的三角形面积最大的点。n_out < 3 时只返回首尾两点。
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])
+
+    # n_out-2 个桶的边界：[edges[i], edges[i+1])
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+
+        # 下一个桶的平均点（最后一个桶的下一个就是终点）
+        if i == n_out - 3:
+            avg_x, avg_y = x[-1], y[-1]
+        else:
+            avg_x = x[end:edges[i + 2]].mean()
+            avg_y = y[end:edges[i + 2]].mean()
+
+        # 桶内所有点的三角形面积（整桶向量化计算）
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def local_minima_indices(y):
+    """局部最低点下标
+
+    先把连续相同的价格合并成一段，比前后两段都低的段是局部最低（序列两端只和一侧比较），
+    取该段的第一个和最后一个点。
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n == 0:
+        return np.arange(0)
+
+    change = np.flatnonzero(np.diff(y)) + 1
+    starts = np.concatenate(([0], change))
+    ends = np.concatenate((change - 1, [n - 1]))
+    values = y[starts]
+
+    lower_than_prev = np.concatenate(([True], values[1:] < values[:-1]))
+    lower_than_next = np.concatenate((values[:-1] < values[1:], [True]))
+    is_min = lower_than_prev & lower_than_next
+
+    return np.union1d(starts[is_min], ends[is_min])
+
+
+def downsample_indices(x, y, n_out):
+    """LTTB 选点 + 全部局部最低点，返回升序下标"""
+    n = len(x)
+    if n_out is None or n_out >= n:
+        return np.arange(n)
+    return np.union1d(lttb_indices(x, y, n_out), local_minima_indices(y))
@@ -0,0 +1,185 @@
+"""
+Web 请求指标
+
+记录每个路由的请求耗时、响应大小、每个请求执行的 SQL 条数和耗时、响应缓存命中情况，
+/metrics 以 Prometheus 文本格式输出。超过阈值的慢请求连同执行过的 SQL 写入日志。
+"""
+
+import contextvars
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+
+# 当前请求的 SQL 记录（每个线程/请求独立）
+_current_tracker = contextvars.ContextVar('sql_tracker', default=None)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+
+class QueryTracker:
+    """一次请求内执行的 SQL"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []
+
+    def record(self, sql, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.statements.append((' '.join(sql.split()), seconds))
+
+
+def start_tracking():
+    """开始记录当前请求的 SQL，返回 (tracker, token)"""
+    tracker = QueryTracker()
+    return tracker, _current_tracker.set(tracker)
+
+
+def stop_tracking(token):
+    _current_tracker.reset(token)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """统计 execute/executemany 耗时的连接（通过 sqlite3.connect(factory=...) 使用）"""
+
+    def execute(self, sql, *args, **kwargs):
+        tracker = _current_tracker.get()
+        if tracker is None:
+            return super().execute(sql, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, *args, **kwargs)
+        finally:
+            tracker.record(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, *args, **kwargs):
+        tracker = _current_tracker.get()
+        if tracker is None:
+            return super().executemany(sql, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, *args, **kwargs)
+        finally:
+            tracker.record(sql, time.perf_counter() - start)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.label_names, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        self._values = {}  # labels -> [各桶计数, 总和, 总数]
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    bucket_labels = _format_labels(self.label_names + ('le',), labels + (repr(float(bound)),))
+                    lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+                inf_labels = _format_labels(self.label_names + ('le',), labels + ('+Inf',))
+                lines.append(f'{self.name}_bucket{inf_labels} {count}')
+                lines.append(f'{self.name}_sum{_format_labels(self.label_names, labels)} {total}')
+                lines.append(f'{self.name}_count{_format_labels(self.label_names, labels)} {count}')
+        return lines
+
+
+class WebMetrics:
+    """Web 应用的全部指标"""
+
+    def __init__(self):
+        self.requests = Counter(
+            'http_requests_total', '请求数', ('route', 'method', 'status'))
+        self.latency = Histogram(
+            'http_request_duration_seconds', '请求耗时（秒）', LATENCY_BUCKETS, ('route', 'method'))
+        self.response_size = Histogram(
+            'http_response_size_bytes', '响应体大小（字节）', SIZE_BUCKETS, ('route',))
+        self.sql_count = Histogram(
+            'sql_queries_per_request', '每个请求执行的 SQL 条数', QUERY_COUNT_BUCKETS, ('route',))
+        self.sql_time = Histogram(
+            'sql_seconds_per_request', '每个请求的 SQL 总耗时（秒）', LATENCY_BUCKETS, ('route',))
+        self.slow_requests = Counter(
+            'http_slow_requests_total', '慢请求数', ('route',))
+
+    def observe_request(self, route, method, status, seconds, size, tracker):
+        self.requests.inc((route, method, str(status)))
+        self.latency.observe(seconds, (route, method))
+        if size is not None:
+            self.response_size.observe(size, (route,))
+        if tracker is not None:
+            self.sql_count.observe(tracker.count, (route,))
+            self.sql_time.observe(tracker.seconds, (route,))
+
+    def render(self, cache_stats=None):
+        """Prometheus 文本格式"""
+        lines = []
+        for metric in (self.requests, self.latency, self.response_size, self.sql_count, self.sql_time,
+                       self.slow_requests):
+            lines.extend(metric.render())
+
+        if cache_stats is not None:
+            lines.extend([
+                '# HELP response_cache_hits_total 响应缓存命中数',
+                '# TYPE response_cache_hits_total counter',
+                f"response_cache_hits_total {cache_stats['hits']}",
+                '# HELP response_cache_misses_total 响应缓存未命中数',
+                '# TYPE response_cache_misses_total counter',
+                f"response_cache_misses_total {cache_stats['misses']}",
+                '# HELP response_cache_hit_ratio 响应缓存命中率',
+                '# TYPE response_cache_hit_ratio gauge',
+                f"response_cache_hit_ratio {cache_stats['hit_rate']}",
+                '# HELP response_cache_entries 响应缓存条目数',
+                '# TYPE response_cache_entries gauge',
+                f"response_cache_entries {cache_stats['entries']}",
+            ])
+
+        return '\n'.join(lines) + '\n'